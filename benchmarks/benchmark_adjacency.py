@@ -0,0 +1,56 @@
+"""
+Compares the adjacency engines of `construct_graph_from_df` on a shapefile,
+or on a synthetic grid of squares if no shapefile is given:
+
+    python benchmarks/benchmark_adjacency.py [shapefile] [id_column]
+"""
+import sys
+import time
+
+import geopandas
+from graphmaker.graph.make_graph import construct_graph_from_df
+from graphmaker.utils import infer_id_column
+from shapely.geometry import box
+
+engines = ['pysal', 'sindex', 'topology']
+
+
+def grid(rows=100, columns=100, size=0.001):
+    data = [{'GEOID': f"{i:04}{j:04}",
+             'geometry': box(-84 + j * size, 42 + i * size,
+                             -84 + (j + 1) * size, 42 + (i + 1) * size)}
+            for i in range(rows) for j in range(columns)]
+    return geopandas.GeoDataFrame(data, crs="+init=epsg:4326")
+
+
+def benchmark(df, id_column, adjacency_type):
+    results = dict()
+    for engine in engines:
+        start = time.perf_counter()
+        try:
+            graph = construct_graph_from_df(df, adjacency_type, geoid_col=id_column,
+                                            adjacency_engine=engine)
+        except Exception as error:
+            print(f"{adjacency_type:>5} {engine:>8}: failed ({error!r})")
+            continue
+        seconds = time.perf_counter() - start
+        results[engine] = graph
+        print(f"{adjacency_type:>5} {engine:>8}: {seconds:8.2f}s, "
+              f"{graph.number_of_edges()} edges")
+    return results
+
+
+def main(args):
+    if args:
+        df = geopandas.read_file(args[0])
+        id_column = infer_id_column(df, id_column=args[1] if len(args) > 1 else None)
+    else:
+        df, id_column = grid(), 'GEOID'
+
+    print(f"{len(df)} units")
+    for adjacency_type in ('rook', 'queen'):
+        benchmark(df, id_column, adjacency_type)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
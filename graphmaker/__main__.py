@@ -1,15 +1,15 @@
 import json
 import logging
 import os
-import pandas
-from graphmaker.constants import (fips_to_state_name, graphs_base_path,
-                                  valid_fips_codes)
+from graphmaker.batch import run_for_every_state
+from graphmaker.constants import fips_to_state_name, graphs_base_path
+from graphmaker.crosswalk import crosswalk
 from graphmaker.graph import RookAndQueenGraphs
-from graphmaker.integrate import integrate_over_blocks_in_units
-from graphmaker.match import match
+from graphmaker.match import match_fips
 from graphmaker.reports.column import column_report
 from graphmaker.reports.graph_report import graph_report, rook_vs_queen
-from graphmaker.resources import BlockPopulationShapefile, VTDShapefile
+from graphmaker.resources import (BlockAssignmentFile, BlockPopulationShapefile,
+                                  VTDShapefile)
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.StreamHandler())
@@ -17,57 +17,75 @@ log.setLevel(logging.DEBUG)
 
 
 def get_vtd_data_from_blocks(fips, block_df, columns):
-    # Block population files have block ids under 'BLOCKID10'
-
-    data = pandas.DataFrame({column: integrate_over_blocks_in_units(
-        fips, block_df[column], unit='VTD') for column in columns})
+    # block_df is indexed by block id, like BlockPopulationShapefile.as_df()
+    data = crosswalk(fips, 'VTD').aggregate(block_df[columns])
     return data
 
 
 def vtd_populations_from_blocks(fips):
-    block_df = BlockPopulationShapefile(fips).as_df()
-    block_df = block_df.set_index('BLOCKID10')
+    block_df = BlockPopulationShapefile(fips).as_df(columns=['POP10'], geometry=False)
 
     vtd_populations = get_vtd_data_from_blocks(fips, block_df, ['POP10'])
 
     return vtd_populations
 
-# These functions will add data to every state's graph:
+# These functions will add data to every state's graph, running the states in
+# parallel (see graphmaker.batch):
+
+
+def add_populations_from_blocks_for_fips(fips):
+    state = fips_to_state_name[fips]
 
+    logging.info(
+        'Aggregating block-level population data for ' + state + '.')
 
-def add_populations_from_blocks():
-    for fips in valid_fips_codes():
-        state = fips_to_state_name[fips]
+    vtd_pops = vtd_populations_from_blocks(fips)
+    vtd_pops['geoid'] = vtd_pops.index
 
-        logging.info(
-            'Aggregating block-level population data for ' + state + '.')
+    graphs = RookAndQueenGraphs.load_fips(fips)
 
-        vtd_pops = vtd_populations_from_blocks(fips)
-        vtd_pops['geoid'] = vtd_pops.index
+    graphs.add_columns_from_df(vtd_pops, ['POP10'], 'geoid')
+    graphs.save()
 
-        graphs = RookAndQueenGraphs.load_fips(fips)
+    population_report = column_report(vtd_pops, 'POP10', graphs.rook.graph)
 
-        graphs.add_data_from_dataframe(fips, vtd_pops, ['POP10'])
+    with open(os.path.join(graphs_base_path, fips, 'pop10_report.json'), 'w') as f:
+        f.write(json.dumps(population_report, indent=2, sort_keys=True))
 
-        population_report = column_report(vtd_pops, 'POP10', graphs.rook.graph)
 
-        with open(os.path.join(graphs_base_path, fips, 'pop10_report.json'), 'w') as f:
-            f.write(json.dumps(population_report, indent=2, sort_keys=True))
+def add_populations_from_blocks(workers=None):
+    return run_for_every_state(add_populations_from_blocks_for_fips,
+                               workers=workers, summary_path=summary_path('pop10'),
+                               resources=[BlockPopulationShapefile, BlockAssignmentFile])
 
 
-def add_basic_data_from_census_shapefiles():
+def add_basic_data_from_census_shapefiles_for_fips(fips):
     columns = ['ALAND10', 'AWATER10', 'NAME10', 'COUNTYFP10']
-    for fips in valid_fips_codes():
-        graphs = RookAndQueenGraphs.load_fips(fips)
-        shapefile = VTDShapefile(fips).path()
-        graphs.add_columns_from_shapefile(shapefile, columns, 'GEOID10')
-        graphs.save()
+    graphs = RookAndQueenGraphs.load_fips(fips)
+    shapefile = VTDShapefile(fips).path()
+    graphs.add_columns_from_shapefile(shapefile, columns, 'GEOID10')
+    graphs.save()
+
+
+def add_basic_data_from_census_shapefiles(workers=None):
+    return run_for_every_state(add_basic_data_from_census_shapefiles_for_fips,
+                               workers=workers, summary_path=summary_path('basic_data'),
+                               resources=[VTDShapefile])
 
 
-def create_matchings_for_every_state():
-    for fips in valid_fips_codes():
-        log.info(f"Working on {fips_to_state_name[fips]}")
-        match(fips, 'VTD', 'CD')
+def create_matching_for_fips(fips):
+    log.info(f"Working on {fips_to_state_name[fips]}")
+    match_fips(fips, 'VTD', 'CD')
+
+
+def create_matchings_for_every_state(workers=None):
+    return run_for_every_state(create_matching_for_fips, workers=workers,
+                               summary_path=summary_path('matchings'),
+                               resources=[BlockAssignmentFile])
+
+
+def summary_path(name):
+    return os.path.join('./logs', f"{name}_summary.json")
 
 
 def build_reports(graphs):
@@ -87,7 +105,9 @@ def build_reports(graphs):
 def main(args):
     """
     This function is intended to be used as a command line utility for generating
-    adjacency graphs from a given shapefile path.
+    adjacency graphs from a given shapefile path. The optional third argument
+    builds the graphs in tiles: a column to tile by, or a tile size in meters
+    (see `Graph.from_df`).
     """
     path = args[0]
 
@@ -95,10 +115,14 @@ def main(args):
     if len(args) > 1:
         id_column = args[1]
 
+    tiles = None
+    if len(args) > 2:
+        tiles = args[2]
+
     if not path:
         raise ValueError('Please specify a shapefile to turn into a graph.')
 
-    state_graphs = RookAndQueenGraphs.from_shapefile(path, id_column=id_column)
+    state_graphs = RookAndQueenGraphs.from_shapefile(path, id_column=id_column, tiles=tiles)
 
     result = build_reports(state_graphs)
 
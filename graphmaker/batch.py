@@ -0,0 +1,118 @@
+import json
+import logging
+import multiprocessing
+import pathlib
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .constants import fips_to_state_name, valid_fips_codes
+from .prefetch import Prefetcher
+
+log = logging.getLogger(__name__)
+
+
+def run_for_fips(function, fips):
+    """
+    Calls function(fips) and returns a summary of how it went, instead of
+    raising, so that one state's failure does not stop the others.
+    """
+    start = time.perf_counter()
+    try:
+        function(fips)
+    except Exception:
+        return {'fips': fips, 'succeeded': False,
+                'seconds': time.perf_counter() - start,
+                'error': traceback.format_exc()}
+    return {'fips': fips, 'succeeded': True,
+            'seconds': time.perf_counter() - start, 'error': None}
+
+
+def prefetch_failure(fips, error):
+    """The summary of a state whose downloads failed, so it was not run."""
+    return {'fips': fips, 'succeeded': False, 'seconds': 0.0,
+            'error': ''.join(traceback.format_exception(type(error), error,
+                                                        error.__traceback__))}
+
+
+def run_for_every_state(function, fips_codes=None, workers=None, summary_path=None,
+                        resources=None):
+    """
+    Runs function(fips) for every state in a pool of worker processes, logging
+    progress as each state finishes.
+
+    :function: a module-level function (so that it can be sent to the workers)
+        taking a FIPS code.
+    :fips_codes: (defaults to `valid_fips_codes()`) the states to run.
+    :workers: number of worker processes. Defaults to the number of CPUs;
+        with `workers=1`, everything runs in the calling process.
+    :summary_path: (optional) where to write the summary as JSON.
+    :resources: (optional) the Census resources that :function: reads (see
+        `graphmaker.prefetch.plan`). Their archives are downloaded in the
+        background, and each state starts as soon as its own are ready.
+    :returns: dictionary from FIPS codes to summaries with keys 'succeeded',
+        'seconds' and 'error' (the traceback of a failed state).
+    """
+    if fips_codes is None:
+        fips_codes = valid_fips_codes()
+    fips_codes = list(fips_codes)
+
+    summary = dict()
+
+    def record(result, done):
+        fips = result['fips']
+        summary[fips] = result
+        status = 'succeeded' if result['succeeded'] else 'failed'
+        message = (f"[{done}/{len(fips_codes)}] {fips_to_state_name.get(fips, fips)} "
+                   f"{status} in {result['seconds']:.1f}s")
+        if result['succeeded']:
+            log.info(message)
+        else:
+            log.error(message + '\n' + result['error'])
+
+    prefetcher = Prefetcher(fips_codes, resources) if resources else None
+
+    try:
+        if workers == 1:
+            for done, fips in enumerate(fips_codes, 1):
+                try:
+                    if prefetcher:
+                        prefetcher.wait(fips)
+                except Exception as error:
+                    record(prefetch_failure(fips, error), done)
+                    continue
+                record(run_for_fips(function, fips), done)
+        else:
+            # Forked workers would inherit the prefetch threads' locks and
+            # half-written files, so the workers start fresh interpreters instead
+            context = multiprocessing.get_context('spawn') if prefetcher else None
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                futures, done = dict(), 0
+                ready = prefetcher.ready() if prefetcher else ((fips, None) for fips in fips_codes)
+                for fips, error in ready:
+                    if error is None:
+                        futures[executor.submit(run_for_fips, function, fips)] = fips
+                    else:
+                        done += 1
+                        record(prefetch_failure(fips, error), done)
+                for done, future in enumerate(as_completed(futures), done + 1):
+                    try:
+                        result = future.result()
+                    except Exception:
+                        # e.g. the worker process died
+                        result = {'fips': futures[future], 'succeeded': False,
+                                  'seconds': 0.0, 'error': traceback.format_exc()}
+                    record(result, done)
+    finally:
+        if prefetcher:
+            prefetcher.close()
+
+    failed = [fips for fips, result in summary.items() if not result['succeeded']]
+    log.info(f"Finished {len(fips_codes)} states; {len(failed)} failed: {failed}")
+
+    if summary_path:
+        pathlib.Path(summary_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(summary_path, 'w') as f:
+            f.write(json.dumps(summary, indent=2, sort_keys=True))
+
+    return summary
@@ -0,0 +1,84 @@
+import logging
+from collections import OrderedDict
+
+from .constants import table_cache_megabytes
+
+log = logging.getLogger(__name__)
+
+
+def table_size(table):
+    """The number of bytes used by the DataFrame :table: (or by another
+    cached object, like a `graphmaker.crosswalk.Crosswalk`, that reports its
+    size as `nbytes`)."""
+    if hasattr(table, 'nbytes'):
+        return int(table.nbytes)
+    return int(table.memory_usage(index=True, deep=True).sum())
+
+
+class TableCache:
+    """
+    A least-recently-used cache of parsed tables (DataFrames), shared by
+    everything in the process that reads the same files.
+
+    Each entry is stored under a key (like `('BlockAssignmentFile', '26',
+    path)`) together with a version (the file's modification time), so that an
+    entry is reloaded when its file changes. The least recently used tables are
+    evicted once the cached tables use more than :max_bytes:.
+
+    The tables handed out are shallow copies, so callers can add or replace
+    columns without changing the cached table. Other objects can be cached
+    too, if they have `nbytes` and `copy(deep=False)` like DataFrames do.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, version, load):
+        """
+        Returns the table stored under :key: and :version:, calling :load:
+        (with no arguments) to create it if it is missing or out of date.
+        """
+        if key in self.entries and self.entries[key][0] == version:
+            self.entries.move_to_end(key)
+            return self.entries[key][1].copy(deep=False)
+
+        table = load()
+        self.put(key, version, table)
+        return table.copy(deep=False)
+
+    def put(self, key, version, table):
+        self.evict(key)
+        size = table_size(table)
+        if size > self.max_bytes:
+            log.info(f"Not caching {key}: {size} bytes is over the budget.")
+            return
+        self.entries[key] = (version, table, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            self.evict(next(iter(self.entries)))
+
+    def evict(self, key):
+        """Removes the table stored under :key:, if there is one."""
+        if key in self.entries:
+            _, _, size = self.entries.pop(key)
+            self.size -= size
+
+    def evict_prefix(self, prefix):
+        """Removes every table whose key starts with the tuple :prefix:."""
+        for key in [key for key in self.entries if key[:len(prefix)] == prefix]:
+            self.evict(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+tables = TableCache(table_cache_megabytes * 2**20)
@@ -1,25 +1,46 @@
 import logging
+import multiprocessing.util
+import os
 import pathlib
+import queue
+import threading
+import time
 
+import pandas
 
-def collector(name, fields, filepath, append=False, format_types=None, delimiter='|'):
+log = logging.getLogger(__name__)
+
+
+def collector(name, fields, filepath, append=False, format_types=None, delimiter='|',
+              backend='log', batch_size=1000, flush_interval=1.0):
     """
     Returns a function for collecting rows with fields :fields: (along with
     datetime information) in a CSV log file located at :filepath:.
 
     We often want to collect some data about choices we are making
-    while processing and transforming data. This collector function provides
-    a way to do that using python's logging standard library module.
+    while processing and transforming data. The returned function only puts
+    each row on a queue; a background thread writes the rows in batches, so
+    collecting does not slow down the caller. Every row is written by the time
+    the process exits, or when the collector's `flush` method returns.
 
-    :name: the name to be given to the logger
+    :name: the name to be given to the collector
     :fields: list of fields that you want to collect
     :filepath: target for the logfile
     :append: (default False) if True, will append to the given filepath. Default
         behavior is to overwrite it, with column headings in the first line.
+        Collectors made in a child process (like a spawned worker of
+        `graphmaker.batch`, which imports the modules that make collectors
+        again) always append, so that only the parent starts a new log.
     :format_types: optional dictionary from fields to format-string types
         (like 's' or '.6f') describing how fields should be formatted in the
-        CSV. Any fields not included will default to 'f'.
+        CSV. Any fields not included will default to 's'.
     :delimiter: the delimiter in the CSV. Defaults to '|' to avoid collisions.
+    :backend: 'log' (the default) writes the delimited log described above.
+        'csv' writes the rows (unformatted) with pandas, and 'parquet' writes
+        each batch as a Parquet file in the directory :filepath:.
+    :batch_size: the number of rows to write at once
+    :flush_interval: the longest time (in seconds) that a row waits to be
+        written
     """
     if not format_types:
         format_types = dict()
@@ -27,26 +48,170 @@ def collector(name, fields, filepath, append=False, format_types=None, delimiter
     if 'asctime' not in fields:
         fields = ['asctime'] + fields
 
-    logger = logging.Logger(name)
+    if backend == 'log':
+        writer = LogWriter(filepath, fields, append, format_types, delimiter)
+    elif backend == 'csv':
+        writer = CSVWriter(filepath, fields, append)
+    elif backend == 'parquet':
+        writer = ParquetWriter(filepath, fields, append)
+    else:
+        raise ValueError('The parameter backend must be "log", "csv" or "parquet".')
+
+    return BufferedCollector(name, fields, writer, batch_size, flush_interval)
+
+
+def starts_new_log(append):
+    """Whether a writer should replace the existing log: only if not appending,
+    and only in the top-level process."""
+    return not append and multiprocessing.parent_process() is None
+
+
+def timestamp(seconds):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(seconds))
+
+
+class LogWriter:
+    """Writes rows as lines of the delimited log, formatting each field like
+    `%(field)s` would in a `logging.Formatter`."""
+
+    def __init__(self, filepath, fields, append, format_types, delimiter):
+        self.filepath = filepath
+        self.fields = fields
+        self.delimiter = delimiter
+        types = {**{field: 's' for field in fields}, **format_types}
+        self.formats = ['%' + types[field] for field in fields]
+
+        pathlib.Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+        if starts_new_log(append):
+            with open(filepath, 'w') as f:
+                f.write(delimiter.join(fields) + '\n')
+
+    def write(self, rows):
+        lines = [self.delimiter.join(form % row[field]
+                                     for form, field in zip(self.formats, self.fields))
+                 for row in rows]
+        with open(self.filepath, 'a') as f:
+            f.write(''.join(line + '\n' for line in lines))
+
+
+class CSVWriter:
+    def __init__(self, filepath, fields, append):
+        self.filepath = filepath
+        self.fields = fields
+        pathlib.Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+        if starts_new_log(append):
+            pandas.DataFrame(columns=fields).to_csv(filepath, index=False)
+
+    def write(self, rows):
+        pandas.DataFrame(rows, columns=self.fields).to_csv(
+            self.filepath, mode='a', header=False, index=False)
+
+
+class ParquetWriter:
+    """Writes each batch of rows as its own Parquet file in the directory
+    :filepath:, which can be read back with `pandas.read_parquet(filepath)`."""
+
+    def __init__(self, filepath, fields, append):
+        self.directory = pathlib.Path(filepath)
+        self.fields = fields
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if starts_new_log(append):
+            for chunk in self.directory.glob('*.parquet'):
+                chunk.unlink()
+        self.chunks = 0
+
+    def write(self, rows):
+        path = self.directory / f"part-{os.getpid()}-{self.chunks:05d}.parquet"
+        pandas.DataFrame(rows, columns=self.fields).to_parquet(path, index=False)
+        self.chunks += 1
+
+
+class BufferedCollector:
+    """
+    Collects rows on a queue and writes them with :writer: in batches from a
+    background thread. Calling it works like calling the function returned by
+    `collector` always has: `collect(field=value, ...)`.
+
+    A process forked from the one that made the collector (like a worker of
+    `graphmaker.batch`) starts its own thread the first time it collects.
+    """
+
+    def __init__(self, name, fields, writer, batch_size=1000, flush_interval=1.0):
+        self.name = name
+        self.fields = fields
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def __call__(self, **kwargs):
+        if self.pid != os.getpid():
+            self.start()
+        kwargs.setdefault('asctime', time.time())
+        self.queue.put(kwargs)
+
+    def start(self):
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue()
+            self.thread = threading.Thread(target=self.run, daemon=True,
+                                           name=f"collector-{self.name}")
+            self.thread.start()
+            self.pid = os.getpid()
+            # Runs at exit, including in multiprocessing workers, which skip atexit
+            multiprocessing.util.Finalize(self, self.close, exitpriority=10)
 
-    pathlib.Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+    def run(self):
+        rows, deadline = [], None
+        while True:
+            # Wait for more rows only until the oldest pending row is due
+            timeout = max(0, deadline - time.monotonic()) if rows else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
 
-    if not append:
-        with open(filepath, 'w') as f:
-            f.write(delimiter.join(fields) + '\n')
-    handler = logging.FileHandler(filepath, mode='a')
+            if isinstance(item, dict):
+                if not rows:
+                    deadline = time.monotonic() + self.flush_interval
+                rows.append(self.row(item))
+                if len(rows) < self.batch_size and time.monotonic() < deadline:
+                    continue
+            if rows:
+                self.write(rows)
+                rows = []
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is StopIteration:
+                return
 
-    default_types = {field: 's' for field in fields}
-    types = {**default_types, **format_types}
-    formatted_fields = [f"%({field}){types[field]}" for field in fields]
+    def write(self, rows):
+        try:
+            self.writer.write(rows)
+        except Exception:
+            log.error(f"Could not write {len(rows)} rows for collector {self.name}",
+                      exc_info=True)
 
-    formatter = logging.Formatter(delimiter.join(
-        formatted_fields), "%Y-%m-%d %H:%M:%S")
-    handler.setFormatter(formatter)
-    handler.setLevel(logging.INFO)
-    logger.addHandler(handler)
+    def row(self, record):
+        row = {field: record.get(field) for field in self.fields}
+        if isinstance(row['asctime'], float):
+            row['asctime'] = timestamp(row['asctime'])
+        return row
 
-    def collect(**kwargs):
-        logger.info("Collected data point for {vtd_splits}", extra=kwargs)
+    def flush(self):
+        """Blocks until every row collected so far has been written."""
+        if self.pid != os.getpid():
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
 
-    return collect
+    def close(self):
+        """Writes the remaining rows and stops the background thread."""
+        if self.pid != os.getpid():
+            return
+        self.queue.put(StopIteration)
+        self.thread.join()
+        self.pid = None
@@ -15,11 +15,21 @@ if 'DEV' in os.environ:
     tiger_data_path = 'C:/dev/gerrydb/graphmaker/graphmaker/tiger_data/'
     block_population_path = 'C:/dev/gerrydb/graphmaker/graphmaker/blocks/'
     block_assignment_path = 'C:/dev/gerrydb/block_assignments/block_assignments/'
+    resource_store_path = 'C:/dev/gerrydb/graphmaker/graphmaker/store/'
 else:
     graphs_base_path = os.path.join(GERRY_DATA, 'graphs')
     tiger_data_path = os.path.join(GERRY_DATA, 'tiger_data')
     block_population_path = os.path.join(GERRY_DATA, 'blocks')
     block_assignment_path = os.path.join(GERRY_DATA, 'block_assignments')
+    resource_store_path = os.path.join(GERRY_DATA, 'store')
+
+# Memory budget (in megabytes) for the parsed tables shared by every resource
+# in the process (see graphmaker.cache)
+table_cache_megabytes = int(os.environ.get('GRAPHMAKER_TABLE_CACHE_MB', 2048))
+
+# Disk budget (in megabytes) for the downloaded archives kept in the resource
+# store, or 0 for no limit (see graphmaker.store)
+resource_store_megabytes = int(os.environ.get('GRAPHMAKER_STORE_MB', 0))
 
 fips_to_state_abbreviation = {'01': 'AL', '02': 'AK', '04': 'AZ', '05': 'AR', '06': 'CA',
                               '08': 'CO', '09': 'CT', '10': 'DE', '11': 'DC', '12': 'FL',
@@ -0,0 +1,170 @@
+import logging
+import os
+
+import numpy
+import pandas
+import scipy.sparse
+
+from .cache import tables
+from .resources import BlockAssignmentFile, local_file
+
+log = logging.getLogger(__name__)
+
+
+class Crosswalk:
+    """
+    A sparse (blocks x units) indicator matrix assigning Census blocks to
+    units (like VTDs or congressional districts), with the block and unit ids
+    labelling its rows and columns.
+
+    Block-level data can be aggregated to the units with one sparse
+    matrix-vector product, and two crosswalks over the same blocks can be
+    intersected with one sparse matrix product.
+
+    The entries may also be fractions of blocks, as in the area weights of
+    `graphmaker.interpolate`, which map polygons to the units they overlap.
+    """
+
+    def __init__(self, matrix, blocks, units):
+        self.matrix = scipy.sparse.csr_matrix(matrix)
+        self.blocks = pandas.Index(blocks)
+        self.units = pandas.Index(units)
+
+    @classmethod
+    def from_assignment(cls, blocks, assignment):
+        """
+        :blocks: block ids
+        :assignment: the unit of each block (missing values for blocks that
+            are not in any unit)
+        """
+        codes, units = pandas.factorize(pandas.Series(assignment), sort=True)
+        # Categorical assignments (see BlockAssignmentFile.convert) give
+        # categorical units; the crosswalk labels its units with plain ids.
+        units = numpy.asarray(units)
+        assigned = codes >= 0
+        matrix = scipy.sparse.csr_matrix(
+            (numpy.ones(assigned.sum()), (numpy.flatnonzero(assigned), codes[assigned])),
+            shape=(len(codes), len(units)))
+        return cls(matrix, blocks, units)
+
+    @property
+    def nbytes(self):
+        """The number of bytes used by the matrix and its labels, for
+        `graphmaker.cache.TableCache`."""
+        matrix = self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+        return matrix + self.blocks.memory_usage(deep=True) + self.units.memory_usage(deep=True)
+
+    def copy(self, deep=False):
+        matrix = self.matrix.copy() if deep else self.matrix
+        return Crosswalk(matrix, self.blocks, self.units)
+
+    @classmethod
+    def from_df(cls, df, column, block_column='BLOCKID'):
+        return cls.from_assignment(df[block_column].values, df[column].values)
+
+    def aligned(self, data):
+        """Reorders the block-indexed Series or DataFrame :data: to the rows of
+        the matrix, with 0 for blocks that :data: does not have."""
+        return data.reindex(self.blocks).fillna(0)
+
+    def aggregate(self, data):
+        """
+        Sums the block-level :data: (a Series or DataFrame indexed by block id)
+        over each unit.
+        """
+        values = self.aligned(data)
+        totals = self.matrix.T @ values.to_numpy(dtype=float)
+        if isinstance(data, pandas.DataFrame):
+            totals = pandas.DataFrame(totals, index=self.units, columns=data.columns)
+            integers = [column for column, dtype in data.dtypes.items()
+                        if pandas.api.types.is_integer_dtype(dtype)]
+            totals[integers] = totals[integers].round().astype(numpy.int64)
+            return totals
+        totals = pandas.Series(totals, index=self.units, name=data.name)
+        if pandas.api.types.is_integer_dtype(data.dtype):
+            totals = totals.round().astype(numpy.int64)
+        return totals
+
+    def intersect(self, other, weights=None):
+        """
+        Returns the sparse (units x other units) matrix whose ij-th entry is
+        the total weight (e.g. population, or the number of blocks if
+        :weights: is None) of the blocks in unit i of this crosswalk and unit j
+        of :other:, which must cover the same blocks.
+        """
+        if not self.blocks.equals(other.blocks):
+            other = other.reindexed(self.blocks)
+        if weights is None:
+            return self.matrix.T @ other.matrix
+        diagonal = scipy.sparse.diags(self.aligned(weights).to_numpy(dtype=float))
+        return self.matrix.T @ diagonal @ other.matrix
+
+    def reindexed(self, blocks):
+        positions = self.blocks.get_indexer(blocks)
+        found = positions >= 0
+        rows = scipy.sparse.csr_matrix(
+            (numpy.ones(found.sum()), (numpy.flatnonzero(found), positions[found])),
+            shape=(len(blocks), len(self.blocks)))
+        return Crosswalk(rows @ self.matrix, blocks, self.units)
+
+    def save(self, path, source_mtime=None, fingerprint=''):
+        """Saves the crosswalk to the `.npz` file :path:, along with the
+        modification time of the file it was built from (:source_mtime:) or a
+        :fingerprint: of its sources, for telling later whether it is stale."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        numpy.savez(path, data=self.matrix.data, indices=self.matrix.indices,
+                    indptr=self.matrix.indptr, shape=self.matrix.shape,
+                    blocks=self.blocks.values.astype(str),
+                    units=self.units.values.astype(str),
+                    source_mtime=numpy.nan if source_mtime is None else source_mtime,
+                    fingerprint=fingerprint)
+
+    @classmethod
+    def load(cls, path):
+        with numpy.load(path) as arrays:
+            matrix = scipy.sparse.csr_matrix(
+                (arrays['data'], arrays['indices'], arrays['indptr']),
+                shape=tuple(arrays['shape']))
+            return cls(matrix, arrays['blocks'], arrays['units'])
+
+
+def stored_source_mtime(path):
+    with numpy.load(path) as arrays:
+        return float(arrays['source_mtime'])
+
+
+def stored_fingerprint(path):
+    with numpy.load(path) as arrays:
+        return str(arrays['fingerprint']) if 'fingerprint' in arrays else None
+
+
+def crosswalk(fips, unit, column=None):
+    """
+    Returns the Crosswalk from blocks to :unit: ('VTD', 'CD', 'SLDU', ...)
+    for the state :fips:, built from its block assignment file.
+
+    The matrix is cached on disk next to the block assignment file and in
+    memory (in `graphmaker.cache.tables`, with the parsed tables), and rebuilt
+    only when the block assignment file changes.
+
+    :column: the column of the block assignment file holding the unit ids
+        (defaults to 'VTD' for VTDs and 'DISTRICT' otherwise).
+    """
+    if column is None:
+        column = 'VTD' if unit == 'VTD' else 'DISTRICT'
+
+    resource = BlockAssignmentFile(fips)
+    source_mtime = os.path.getmtime(local_file(resource.path(unit)))
+
+    def load():
+        path = resource.crosswalk_path(unit, column)
+        if os.path.exists(path) and stored_source_mtime(path) == source_mtime:
+            return Crosswalk.load(path)
+        log.info(f"Building the block-to-{unit} crosswalk for {fips}")
+        table = resource.table(unit, [column])
+        result = Crosswalk.from_assignment(table.index, table[column].values)
+        result.save(path, source_mtime)
+        return result
+
+    return tables.get(('Crosswalk', fips, unit, column), source_mtime, load)
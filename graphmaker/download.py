@@ -0,0 +1,154 @@
+"""
+Concurrent, resumable downloads over a pooled HTTP session.
+
+Each file is downloaded to `{path}.part` and renamed to :path: only once it is
+complete (and matches its checksum, if one is given), so an interrupted
+download resumes from where it stopped with an HTTP Range request instead of
+starting over.
+"""
+import hashlib
+import logging
+import os
+import pathlib
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+
+class ChecksumError(ValueError):
+    pass
+
+
+class TransientError(IOError):
+    """A failure worth retrying, like a server error or a dropped connection."""
+
+
+def sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def complete_length(content_range):
+    """The length of the whole file in a Content-Range header (like
+    'bytes */1234' or 'bytes 0-99/1234'), or None if it is not given."""
+    match = re.search(r'/(\d+)\s*$', content_range or '')
+    return int(match.group(1)) if match else None
+
+
+class Downloader:
+    """
+    Downloads files with up to :workers: at a time, sharing one pooled
+    `requests.Session`.
+
+    :retries: how many times to retry a download after a server error, a
+        timeout or a dropped connection, resuming each time
+    :backoff: seconds to wait before the first retry, doubled for each one
+    :timeout: (connect, read) timeouts in seconds for each request
+    """
+
+    def __init__(self, workers=8, retries=5, backoff=0.5, timeout=(10, 60),
+                 chunk_size=1 << 16):
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, url, path, checksum=None):
+        """
+        Downloads :url: to :path:, unless :path: already exists, and returns
+        :path:. A partial download left in `{path}.part` is resumed.
+
+        :checksum: (optional) the SHA-256 hex digest the file must have
+        """
+        if os.path.exists(path):
+            return path
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        partial = path + '.part'
+
+        for attempt in range(self.retries + 1):
+            try:
+                self.fetch_once(url, partial)
+                break
+            except (TransientError, requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as error:
+                if attempt == self.retries:
+                    raise
+                wait = self.backoff * 2 ** attempt
+                log.warning(f"Retrying {url} in {wait}s after: {error}")
+                time.sleep(wait)
+
+        if checksum is not None and sha256(partial) != checksum:
+            os.remove(partial)
+            raise ChecksumError(f"The download of {url} does not match its checksum.")
+        os.replace(partial, path)
+        return path
+
+    def fetch_once(self, url, partial):
+        """Downloads the rest of :url: into the file :partial:."""
+        done = os.path.getsize(partial) if os.path.exists(partial) else 0
+        headers = {'Range': f"bytes={done}-"} if done else {}
+
+        with self.session.get(url, headers=headers, stream=True,
+                              timeout=self.timeout) as response:
+            if response.status_code == 416:
+                total = complete_length(response.headers.get('Content-Range'))
+                if total == done:
+                    # The partial file is already the whole file
+                    return
+                # The partial file is not a prefix of this file (it may be
+                # left over from an older version), so start over
+                log.warning(f"Restarting the download of {url}: the partial file "
+                            f"has {done} bytes, but the file has {total}.")
+                response.close()
+                os.remove(partial)
+                return self.fetch_once(url, partial)
+            if response.status_code >= 500 or response.status_code == 429:
+                raise TransientError(f"{url} returned {response.status_code}")
+            response.raise_for_status()
+
+            resuming = response.status_code == 206
+            expected = int(response.headers.get('Content-Length', -1))
+            written = 0
+            with open(partial, 'ab' if resuming else 'wb') as f:
+                for chunk in response.iter_content(self.chunk_size):
+                    f.write(chunk)
+                    written += len(chunk)
+
+        if expected >= 0 and written < expected:
+            raise TransientError(f"The connection to {url} closed after "
+                                 f"{written} of {expected} bytes.")
+
+    def fetch_all(self, jobs):
+        """
+        Downloads every (url, path) or (url, path, checksum) in :jobs:
+        concurrently. Returns a dictionary from each path to the exception
+        that stopped its download, or None if it succeeded.
+        """
+        def run(job):
+            try:
+                self.fetch(*job)
+            except Exception as error:
+                log.error(f"Could not download {job[0]}", exc_info=True)
+                return error
+
+        jobs = list(jobs)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            errors = list(executor.map(run, jobs))
+        return {job[1]: error for job, error in zip(jobs, errors)}
+
+    def close(self):
+        self.session.close()
@@ -1,21 +1,132 @@
+import weakref
 from collections import Counter
 
 import utm
 
+lonlat_crs = "epsg:4326"
+
+
+def utm_crs(zone):
+    return f"+proj=utm +zone={zone} +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
+
 
 def utm_of_point(point):
     return utm.from_latlon(point.y, point.x)[2]
 
 
+def utm_zones_of_points(points):
+    """
+    Returns an array with the UTM zone number of each point in the GeoSeries
+    :points: (in longitude/latitude), computed all at once rather than point
+    by point. Points in the special Norway and Svalbard zones are passed to
+    the `utm` package one at a time.
+    """
+    longitudes = (points.x.values % 360 + 540) % 360 - 180
+    latitudes = points.y.values
+    zones = ((longitudes + 180) // 6).astype(int) + 1
+
+    special = (latitudes >= 56) & (longitudes >= 0)
+    zones[special] = [utm_of_point(point) for point in points[special]]
+    return zones
+
+
+def is_geographic(df):
+    return getattr(df.crs, 'is_geographic', False)
+
+
+def is_lonlat(df):
+    """Whether :df: is already in longitude/latitude on WGS84 (epsg:4326)."""
+    return df.crs is not None and df.crs == lonlat_crs
+
+
 def identify_utm_zone(df):
-    df = df.to_crs("+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs")
-    utms = map(utm_of_point, df['geometry'].centroid)
-    utm_counts = Counter(utms)
+    if not is_lonlat(df):
+        df = df.to_crs(lonlat_crs)
+    utm_counts = Counter(utm_zones_of_points(df['geometry'].centroid).tolist())
     # most_common returns a list of tuples, and we want the 0,0th entry
     most_common = utm_counts.most_common(1)[0][0]
     return most_common
 
 
-def reprojected(df):
-    utm = identify_utm_zone(df)
-    return df.to_crs(f"+proj=utm +zone={utm} +ellps=WGS84 +datum=WGS84 +units=m +no_defs")
+class ProjectionContext:
+    """
+    Caches the UTM zone and the reprojected copies of the frames used in one
+    build, so that the same frame is never projected or zone-detected twice.
+    Make a new context for each build (like `Graph.from_df` does) and pass it
+    down, so that nothing is cached from one build to the next.
+
+    Frames are remembered by identity for as long as they are alive. A FIPS
+    code can also be given, in which case the zone is remembered for the
+    state and reused for every frame from that state (e.g. VTDs and blocks).
+    Every caller gets its own copy of a cached projection, so changing one in
+    place does not affect the others. Frames are assumed not to be modified
+    in place during the build.
+    """
+
+    def __init__(self):
+        self._zones = dict()
+        self._frames = dict()
+        self._handed_out = dict()
+
+    def _remember(self, df, crs, result):
+        key = (id(df), crs)
+        if key not in self._frames:
+            weakref.finalize(df, self._frames.pop, key, None)
+        self._frames[key] = result
+        return result
+
+    def _hand_out(self, df, crs):
+        """Gives the caller a copy of the projection of :df: to :crs:, and
+        remembers that the copy is already in :crs:."""
+        result = self._frames[(id(df), crs)].copy()
+        weakref.finalize(result, self._handed_out.pop, id(result), None)
+        self._handed_out[id(result)] = crs
+        return result
+
+    def utm_zone(self, df, fips=None):
+        if fips is not None and fips in self._zones:
+            return self._zones[fips]
+        if id(df) in self._zones:
+            return self._zones[id(df)]
+
+        zone = identify_utm_zone(self.lonlat(df))
+
+        if fips is not None:
+            self._zones[fips] = zone
+        else:
+            weakref.finalize(df, self._zones.pop, id(df), None)
+            self._zones[id(df)] = zone
+        return zone
+
+    def to_crs(self, df, crs):
+        if (id(df), crs) not in self._frames:
+            self._remember(df, crs, df.to_crs(crs))
+        return self._hand_out(df, crs)
+
+    def lonlat(self, df):
+        if is_lonlat(df):
+            return df
+        return self.to_crs(df, lonlat_crs)
+
+    def reprojected(self, df, fips=None):
+        # A frame that this context handed out in a UTM projection does not
+        # need to move again
+        if id(df) in self._handed_out and not is_geographic(df):
+            return df
+        return self.to_crs(df, utm_crs(self.utm_zone(df, fips)))
+
+    def clear(self):
+        self._zones.clear()
+        self._frames.clear()
+        self._handed_out.clear()
+
+
+def reprojected(df, fips=None, context=None):
+    """
+    Reprojects :df: to the UTM zone containing most of its units, for accurate
+    areas and perimeters in meters. Zones and projected frames are cached in
+    :context:, the `ProjectionContext` of the current build, if one is given.
+    """
+    if context is None:
+        context = ProjectionContext()
+    return context.reprojected(df, fips=fips)
@@ -0,0 +1,222 @@
+"""
+A compact binary format for adjacency graphs.
+
+The graph is stored in an uncompressed `.npz` archive: the adjacency as CSR
+arrays (`indptr` and `indices`, in terms of node positions), plus one typed
+array per node attribute and per edge attribute. Edge attribute arrays are
+aligned with `indices`. Attributes that some nodes or edges lack get a boolean
+mask array. The graph attributes and the layout of the columns are stored as
+JSON in the `meta` array.
+
+Because the archive is uncompressed, each array is loaded as a read-only
+memory map of its place in the file instead of being read into memory. A
+`BinaryGraph` keeps the graph as those arrays, and only builds the networkx
+graph when it is asked for.
+"""
+import json
+import numbers
+import struct
+import zipfile
+
+import networkx
+import numpy
+
+magic = b'PK\x03\x04'
+
+
+def is_binary(path):
+    with open(path, 'rb') as f:
+        return f.read(len(magic)) == magic
+
+
+def encode_column(values, present=None):
+    """
+    Returns a typed array holding :values: and the kind of the column
+    ('bool', 'int', 'float', 'str' or 'json'). Only the values where
+    :present: is True are considered; the others are filled with a default.
+    """
+    if present is None:
+        present = [True] * len(values)
+    given = [value for value, here in zip(values, present) if here]
+
+    if all(isinstance(value, (bool, numpy.bool_)) for value in given):
+        kind, dtype, default = 'bool', bool, False
+    elif all(isinstance(value, numbers.Integral) for value in given):
+        kind, dtype, default = 'int', numpy.int64, 0
+    elif all(isinstance(value, numbers.Real) for value in given):
+        kind, dtype, default = 'float', numpy.float64, numpy.nan
+    elif all(isinstance(value, str) for value in given):
+        kind, dtype, default = 'str', str, ''
+    else:
+        values = [json.dumps(value) for value in values]
+        kind, dtype, default = 'json', str, ''
+
+    filled = [value if here else default for value, here in zip(values, present)]
+    return numpy.array(filled, dtype=dtype), kind
+
+
+def decode_column(array, kind):
+    values = array.tolist()
+    if kind == 'json':
+        values = [json.loads(value) if value else None for value in values]
+    return values
+
+
+def attribute_columns(prefix, records, arrays, layout):
+    """Adds one column (and a mask, if needed) per attribute of the dicts in
+    :records: to :arrays:, describing them in :layout:."""
+    keys = list(dict.fromkeys(key for record in records for key in record))
+    for number, key in enumerate(keys):
+        name = f"{prefix}_{number}"
+        present = [key in record for record in records]
+        values = [record.get(key) for record in records]
+        arrays[name], kind = encode_column(values, present)
+        column = {'key': key, 'name': name, 'kind': kind, 'masked': False}
+        if not all(present):
+            arrays[name + '_mask'] = numpy.array(present, dtype=bool)
+            column['masked'] = True
+        layout.append(column)
+
+
+def save_binary(graph, filepath):
+    if graph.is_multigraph():
+        raise ValueError('The binary graph format does not support multigraphs.')
+
+    nodes = list(graph.nodes)
+    positions = {node: i for i, node in enumerate(nodes)}
+    arrays = dict()
+
+    arrays['node_ids'], id_kind = encode_column(nodes)
+
+    neighbors = [sorted(positions[neighbor] for neighbor in graph.adj[node])
+                 for node in nodes]
+    arrays['indptr'] = numpy.cumsum([0] + [len(row) for row in neighbors],
+                                    dtype=numpy.int64)
+    arrays['indices'] = numpy.array([j for row in neighbors for j in row],
+                                    dtype=numpy.int64)
+
+    node_columns, edge_columns = [], []
+    attribute_columns('node', [graph.nodes[node] for node in nodes],
+                      arrays, node_columns)
+    attribute_columns('edge', [graph.adj[nodes[i]][nodes[j]]
+                               for i, row in enumerate(neighbors) for j in row],
+                      arrays, edge_columns)
+
+    meta = {'directed': graph.is_directed(), 'graph': graph.graph,
+            'id_kind': id_kind, 'nodes': node_columns, 'edges': edge_columns}
+    arrays['meta'] = numpy.array(json.dumps(meta))
+
+    with open(filepath, 'wb') as f:
+        numpy.savez(f, **arrays)
+
+
+def memory_mapped_arrays(path):
+    """
+    Returns a dictionary of the arrays in the `.npz` file at :path:. Arrays
+    stored uncompressed are memory-mapped in place rather than read.
+    """
+    arrays = dict()
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            name = info.filename[:-len('.npy')]
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = numpy.load(archive.open(info))
+                continue
+
+            # Skip the zip local file header to get to the .npy file
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = numpy.lib.format.read_magic(f)
+            if version == (1, 0):
+                read_header = numpy.lib.format.read_array_header_1_0
+            else:
+                read_header = numpy.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+
+            if dtype.hasobject or 0 in shape or shape == ():
+                arrays[name] = numpy.load(archive.open(info))
+            else:
+                arrays[name] = numpy.memmap(path, dtype=dtype, mode='r', shape=shape,
+                                            order='F' if fortran_order else 'C',
+                                            offset=f.tell())
+    return arrays
+
+
+def attribute_records(arrays, layout, size):
+    records = [dict() for _ in range(size)]
+    for column in layout:
+        values = decode_column(arrays[column['name']], column['kind'])
+        if column['masked']:
+            present = arrays[column['name'] + '_mask'].tolist()
+        else:
+            present = [True] * size
+        key = column['key']
+        for record, value, here in zip(records, values, present):
+            if here:
+                record[key] = value
+    return records
+
+
+class BinaryGraph:
+    """
+    A graph in the binary format, kept as the memory-mapped arrays of the
+    file at :path:. The adjacency (`indptr` and `indices`, in terms of
+    positions in `nodes`) and the node attributes (see `node_attribute`) are
+    read straight from the arrays; `to_networkx` builds the networkx graph.
+    """
+
+    def __init__(self, path):
+        self.arrays = memory_mapped_arrays(path)
+        self.meta = json.loads(str(self.arrays['meta']))
+        self.graph = self.meta['graph']
+        self.nodes = decode_column(self.arrays['node_ids'], self.meta['id_kind'])
+
+    @property
+    def indptr(self):
+        return self.arrays['indptr']
+
+    @property
+    def indices(self):
+        return self.arrays['indices']
+
+    def node_attribute(self, key):
+        """
+        Returns (values, present) for the node attribute :key:: a list of its
+        values in node order, and a boolean array marking the nodes that have
+        it. Returns None if no node has the attribute.
+        """
+        for column in self.meta['nodes']:
+            if column['key'] != key:
+                continue
+            values = decode_column(self.arrays[column['name']], column['kind'])
+            if column['masked']:
+                present = numpy.asarray(self.arrays[column['name'] + '_mask'])
+            else:
+                present = numpy.ones(len(self.nodes), dtype=bool)
+            return values, present
+        return None
+
+    def to_networkx(self):
+        meta, nodes = self.meta, self.nodes
+        graph = networkx.DiGraph() if meta['directed'] else networkx.Graph()
+        graph.graph.update(meta['graph'])
+
+        graph.add_nodes_from(zip(nodes, attribute_records(self.arrays, meta['nodes'],
+                                                          len(nodes))))
+
+        sources = numpy.repeat(numpy.arange(len(nodes)), numpy.diff(self.indptr)).tolist()
+        targets = numpy.asarray(self.indices).tolist()
+        edge_data = attribute_records(self.arrays, meta['edges'], len(targets))
+
+        graph.add_edges_from(
+            (nodes[i], nodes[j], data)
+            for i, j, data in zip(sources, targets, edge_data)
+            # An undirected edge appears once in each of its nodes' rows
+            if meta['directed'] or i <= j)
+        return graph
+
+
+def load_binary(path):
+    return BinaryGraph(path).to_networkx()
@@ -0,0 +1,134 @@
+import numpy
+import pandas
+
+
+def align_to_nodes(data, ids, nodes):
+    """
+    Aligns the rows of the DataFrame :data: to the node order :nodes: (a
+    pandas Index) with one join, where :ids: gives the node of each row.
+    Returns (aligned, present), where aligned is a DataFrame indexed by
+    :nodes: and present is a boolean array marking the nodes that have a row.
+    As with `dict(zip(ids, values))`, the last row wins when an id is repeated.
+
+    Columns that have to leave some nodes empty are kept as python objects,
+    so that integers stay integers instead of becoming floats next to NaN.
+    """
+    data = data.set_axis(pandas.Index(ids), axis=0)
+    data = data[~data.index.duplicated(keep='last')]
+    present = nodes.isin(data.index)
+    if not present.all():
+        data = data.astype(object)
+    return data.reindex(nodes), present
+
+
+def write_to_nodes(graph, aligned, present):
+    """
+    Writes the DataFrame :aligned: (indexed by node) into the networkx node
+    dicts of :graph:, with one dict update per node. :present: is a boolean
+    DataFrame of the same shape marking the cells to write.
+    """
+    columns = list(aligned.columns)
+    rows = aligned.itertuples(index=False, name=None)
+
+    if present.values.all():
+        for node, row in zip(aligned.index, rows):
+            graph.nodes[node].update(zip(columns, row))
+    else:
+        masks = present.itertuples(index=False, name=None)
+        for node, row, mask in zip(aligned.index, rows, masks):
+            graph.nodes[node].update(
+                (column, value) for column, value, here in zip(columns, row, mask)
+                if here)
+
+
+class NodeColumns:
+    """
+    Node attributes stored as columns aligned to a fixed node order, so that
+    many columns can be added, replaced or selected at once.
+
+    Columns added here are only copied into the networkx node dicts when they
+    are needed there (see `flush`), with one dict update per node rather than
+    one write per cell. Nodes added to or removed from the networkx graph
+    afterwards are picked up by `sync`.
+    """
+
+    def __init__(self, nodes):
+        self.index = pandas.Index(list(nodes))
+        self.frame = pandas.DataFrame(index=self.index)
+        self.present = pandas.DataFrame(index=self.index)
+        self.pending = []
+
+    def __contains__(self, column):
+        return column in self.frame.columns
+
+    def sync(self, nodes):
+        """Aligns the columns to :nodes:, the current nodes of the networkx
+        graph. New nodes start out with no values, and the rows of removed
+        nodes are dropped."""
+        nodes = pandas.Index(list(nodes))
+        if nodes.equals(self.index):
+            return
+        frame = self.frame
+        if not nodes.isin(self.index).all():
+            # Keep integers as integers next to the empty cells of new nodes
+            frame = frame.astype(object)
+        self.frame = frame.reindex(nodes)
+        self.present = self.present.reindex(nodes, fill_value=False)
+        self.index = nodes
+
+    def add(self, table, columns, id_column):
+        """Adds (or replaces) :columns: from :table:, matching the values in
+        :id_column: to the nodes. Nodes without a row are left alone."""
+        aligned, present = align_to_nodes(table[list(columns)],
+                                          table[id_column].values, self.index)
+        self.set(aligned, {column: present for column in columns})
+
+    def replace(self, column, values):
+        """Replaces :column: with :values:, a mapping (or Series) from nodes
+        to values, or a sequence in node order."""
+        if isinstance(values, (dict, pandas.Series)):
+            values = pandas.Series(values)
+            table = pandas.DataFrame({'node': values.index, column: values.values})
+            self.add(table, [column], 'node')
+        else:
+            aligned = pandas.DataFrame({column: list(values)}, index=self.index)
+            self.set(aligned, {column: numpy.ones(len(self.index), dtype=bool)})
+
+    def set(self, aligned, present, pending=True):
+        """Stores the columns of :aligned: with the masks :present:. With
+        pending=False, they are values the networkx graph already has, so
+        they are not written to it by `flush`."""
+        columns = list(aligned.columns)
+        self.frame = self.frame.drop(columns=columns, errors='ignore').join(aligned)
+        self.present = self.present.drop(columns=columns, errors='ignore').join(
+            pandas.DataFrame(present, index=self.index))
+        self.pending = [column for column in self.pending
+                        if column not in columns] + (columns if pending else [])
+
+    def pull(self, graph, column):
+        """Copies :column: out of the networkx node dicts of :graph:."""
+        present = numpy.array([column in graph.nodes[node] for node in self.index])
+        values = [graph.nodes[node].get(column) for node in self.index]
+        self.frame[column] = pandas.Series(values, index=self.index,
+                                           dtype=None if present.all() else object)
+        self.present[column] = present
+
+    def select(self, columns, graph=None):
+        """Returns a DataFrame of :columns:, indexed by node. Columns that are
+        only in the networkx node dicts are read from :graph: first."""
+        if graph is not None:
+            self.sync(graph.nodes)
+        for column in columns:
+            if column not in self and graph is not None:
+                self.pull(graph, column)
+        return self.frame[list(columns)].where(self.present[list(columns)])
+
+    def flush(self, graph):
+        """Writes the columns added since the last flush into the networkx
+        node dicts of :graph:."""
+        if not self.pending:
+            return
+        self.sync(graph.nodes)
+        columns = self.pending
+        write_to_nodes(graph, self.frame[columns], self.present[columns])
+        self.pending = []
@@ -1,39 +1,101 @@
 import datetime
-import json
 import logging
 import os
 
 import geopandas
 import networkx
+import numpy
 import pandas
 
 from ..constants import graphs_base_path
-from ..utils import find_column_with, generate_id, infer_id_column
-from .make_graph import construct_graph_from_df
+from ..geospatial import ProjectionContext
+from ..interpolate import interpolate
+from ..utils import (find_column_with, generate_id, infer_id_column,
+                     read_attributes)
+from .binary import BinaryGraph, is_binary, save_binary
+from .columns import NodeColumns
+from .make_graph import (construct_graph_from_df,
+                         construct_rook_and_queen_graphs_from_df)
+from .streaming import read_adjacency_json, write_adjacency_json
+from .tiles import (construct_tiled_graph_from_df,
+                    construct_tiled_rook_and_queen_graphs_from_df, tile_options)
 
 log = logging.getLogger(__name__)
 
+extensions = {'json': '.json', 'binary': '.npz'}
+
+
+def attribute_fields(columns, id_column):
+    """The fields to read to add :columns:, or None (all of them) if the id
+    column still has to be inferred."""
+    if columns is None or id_column is None:
+        return None
+    return [id_column] + [column for column in columns if column != id_column]
+
 
 class Graph:
+    """
+    An adjacency graph. Node data added through this class is kept in a
+    columnar store (`self.columns`, see `NodeColumns`) and copied into the
+    networkx graph the next time `self.graph` is used.
+
+    A graph loaded from the binary format stays in its memory-mapped arrays
+    (see `BinaryGraph`) until `self.graph` is first used, so adding and
+    selecting columns does not build the networkx graph.
+    """
+
     def __init__(self, graph, path=None):
         self.graph = graph
         self.path = path
 
+    @property
+    def graph(self):
+        """The networkx view of the graph, with every column added so far."""
+        if self._graph is None:
+            self._graph = self.binary.to_networkx()
+            self.binary = None
+        self.columns.flush(self._graph)
+        return self._graph
+
+    @graph.setter
+    def graph(self, graph):
+        if isinstance(graph, BinaryGraph):
+            self._graph, self.binary = None, graph
+        else:
+            self._graph, self.binary = graph, None
+        self.columns = NodeColumns(graph.nodes)
+
+    @property
+    def metadata(self):
+        """The graph attributes (like 'state'), without building the
+        networkx graph of a binary graph."""
+        return self._graph.graph if self._graph is not None else self.binary.graph
+
     @classmethod
     def load(cls, path):
-        with open(path, 'r') as document:
-            data = json.load(document)
-        graph = networkx.readwrite.json_graph.adjacency_graph(data)
+        """Loads a graph saved in either the JSON or the binary format."""
+        if is_binary(path):
+            graph = BinaryGraph(path)
+        else:
+            with open(path, 'r') as document:
+                graph = read_adjacency_json(document)
         return cls(graph, path=path)
 
-    def save(self, filepath=None):
+    def save(self, filepath=None, format=None):
+        """Saves the graph as adjacency JSON, or in the binary format if
+        :format: is 'binary' (the default for paths ending in '.npz')."""
         if not filepath:
             filepath = self.path
-
-        data = json.dumps(
-            networkx.readwrite.json_graph.adjacency_data(self.graph))
-        with open(filepath, 'w') as f:
-            f.write(data)
+        if not format:
+            format = 'binary' if str(filepath).endswith('.npz') else 'json'
+
+        if format == 'binary':
+            save_binary(self.graph, filepath)
+        elif format == 'json':
+            with open(filepath, 'w') as f:
+                write_adjacency_json(self.graph, f)
+        else:
+            raise ValueError('The parameter format must be "json" or "binary".')
         log.info(f"Saved the graph to {filepath}")
 
     def add_columns_from_csv(self, csv_path, columns=None, id_column=None):
@@ -41,7 +103,7 @@ class Graph:
         self.add_columns_from_df(table, columns, id_column)
 
     def add_columns_from_shapefile(self, shapefile, columns=None, id_column=None):
-        df = geopandas.read_file(shapefile)
+        df = read_attributes(shapefile, attribute_fields(columns, id_column))
         return self.add_columns_from_df(df, columns, id_column)
 
     def add_columns_from_df(self, table, columns=None, id_column=None):
@@ -51,26 +113,70 @@ class Graph:
             columns = [column for column in table.columns
                        if column != id_column]
 
-        for column in columns:
-            data = map_ids_to_column_entries(table, id_column, column)
-            add_column_to_graph(self.graph, data, column)
+        if self._graph is not None:
+            self.columns.sync(self._graph.nodes)
+        self.columns.add(table, columns, id_column)
+
+    def add_columns_from_interpolation(self, source_df, target_df, columns,
+                                       id_column=None, weights_path=None):
+        """
+        Adds :columns: of the GeoDataFrame :source_df: (like precinct
+        election results) by areal interpolation onto :target_df:, the
+        GeoDataFrame of this graph's units. See `graphmaker.interpolate`.
+        """
+        table = interpolate(source_df, target_df, columns, id_column,
+                            weights_path).reset_index()
+        self.add_columns_from_df(table, columns, table.columns[0])
+
+    def select(self, columns):
+        """Returns a DataFrame of the node attributes :columns:, indexed by node."""
+        if self._graph is None:
+            # Read the missing columns straight from the binary arrays
+            for column in columns:
+                if column in self.columns:
+                    continue
+                values, present = self.binary.node_attribute(column) or (
+                    [None] * len(self.columns.index), numpy.zeros(len(self.columns.index), bool))
+                aligned = pandas.DataFrame(
+                    {column: pandas.Series(values, index=self.columns.index,
+                                           dtype=None if present.all() else object)})
+                self.columns.set(aligned, {column: present}, pending=False)
+        return self.columns.select(columns, graph=self._graph)
 
     @classmethod
-    def from_shapefile(cls, shapefile, adjacency_type, data_columns=None, id_column=None):
+    def from_shapefile(cls, shapefile, adjacency_type, data_columns=None, id_column=None,
+                       tiles=None, workers=None):
         log.info('Constructing adjacency graph from shapefile ' + str(shapefile))
         df = geopandas.read_file(shapefile)
-        return cls.from_df(df, adjacency_type=adjacency_type,
-                           data_columns=data_columns, id_column=id_column)
+        return cls.from_df(df, adjacency_type=adjacency_type, data_columns=data_columns,
+                           id_column=id_column, tiles=tiles, workers=workers)
 
     @classmethod
-    def from_df(cls, df, adjacency_type, data_columns=None, id_column=None):
-        df = df.to_crs({'init': 'epsg:4326'})
-
-        id_column = infer_id_column(df, id_column)
-
-        log.info('Constructing graph.')
-        graph = construct_graph_from_df(df, adjacency_type=adjacency_type,
-                                        geoid_col=id_column, cols_to_add=data_columns)
+    def from_df(cls, df, adjacency_type, data_columns=None, id_column=None,
+                tiles=None, workers=None):
+        """
+        :tiles: (optional) build the graph tile by tile in :workers: parallel
+            processes (see `graphmaker.graph.tiles`): either a column to tile
+            by, like 'COUNTYFP10', or the side of square tiles in meters. The
+            neighbors are found like the 'sindex' adjacency engine finds them,
+            instead of with pysal, and the boundary perimeters with the
+            'topology' method.
+        """
+        context = ProjectionContext()
+        df = context.lonlat(df)
+
+        id_column = infer_id_column(df, id_column=id_column)
+
+        if tiles is None:
+            log.info('Constructing graph.')
+            graph = construct_graph_from_df(df, adjacency_type=adjacency_type,
+                                            geoid_col=id_column, cols_to_add=data_columns,
+                                            context=context)
+        else:
+            log.info('Constructing graph in tiles.')
+            graph = construct_tiled_graph_from_df(
+                df, adjacency_type, geoid_col=id_column, cols_to_add=data_columns,
+                workers=workers, **tile_options(tiles))
 
         add_metadata(graph, df, type=adjacency_type)
 
@@ -81,45 +187,63 @@ class RookAndQueenGraphs:
     def __init__(self, rook, queen):
         self.rook = rook
         self.queen = queen
-        self.fips = rook.graph.graph['state']
+        self.fips = rook.metadata['state']
 
     @classmethod
-    def load_fips(cls, fips):
-        rook = Graph.load(cls.path(fips, 'rook'))
-        queen = Graph.load(cls.path(fips, 'queen'))
+    def load_fips(cls, fips, format='json'):
+        rook = Graph.load(cls.path(fips, 'rook', format))
+        queen = Graph.load(cls.path(fips, 'queen', format))
         return cls(rook, queen)
 
     @classmethod
-    def from_shapefile(cls, shapefile, data_columns=None,  id_column=None):
+    def from_shapefile(cls, shapefile, data_columns=None,  id_column=None,
+                       tiles=None, workers=None):
         log.info(
             'Constructing adjacency graphs from shapefile ' + str(shapefile))
         df = geopandas.read_file(shapefile)
+        return cls.from_df(df, data_columns=data_columns, id_column=id_column,
+                           tiles=tiles, workers=workers)
 
-        log.info('Constructing rook graph.')
-        rook = Graph.from_df(
-            df, adjacency_type='rook', cols_to_add=data_columns, id_column=id_column)
+    @classmethod
+    def from_df(cls, df, data_columns=None, id_column=None, tiles=None, workers=None):
+        """See `Graph.from_df` for :tiles: and :workers:."""
+        context = ProjectionContext()
+        df = context.lonlat(df)
 
-        log.info('Constructing queen graph.')
-        queen = Graph.from_df(
-            df, adjacency_type='queen', cols_to_add=data_columns, id_column=id_column)
+        id_column = infer_id_column(df, id_column=id_column)
 
-        return cls(rook, queen)
+        if tiles is None:
+            log.info('Constructing rook and queen graphs.')
+            rook, queen = construct_rook_and_queen_graphs_from_df(
+                df, geoid_col=id_column, cols_to_add=data_columns, context=context)
+        else:
+            log.info('Constructing rook and queen graphs in tiles.')
+            rook, queen = construct_tiled_rook_and_queen_graphs_from_df(
+                df, geoid_col=id_column, cols_to_add=data_columns,
+                workers=workers, **tile_options(tiles))
+
+        add_metadata(rook, df, type='rook')
+        add_metadata(queen, df, type='queen')
+
+        return cls(Graph(rook), Graph(queen))
 
     # Should maybe move all the path configuration to a separate module?
     @classmethod
-    def path(cls, fips, adjacency=None):
+    def path(cls, fips, adjacency=None, format='json'):
         if adjacency not in ('rook', 'queen'):
             raise ValueError(
                 'The parameter adjacency must be "rook" or "queen".')
-        return os.path.join(graphs_base_path, fips, adjacency + '.json')
+        if format not in extensions:
+            raise ValueError('The parameter format must be "json" or "binary".')
+        return os.path.join(graphs_base_path, fips, adjacency + extensions[format])
 
     def add_columns_from_df(self, df, columns=None, id_column=None):
         self.rook.add_columns_from_df(df,  columns, id_column)
         self.queen.add_columns_from_df(df, columns, id_column)
 
     def add_columns_from_shapefile(self, shapefile_path, columns=None, id_column=None):
-        df = geopandas.read_file(shapefile_path)
-        self.add_data_from_df(df, columns, id_column)
+        df = read_attributes(shapefile_path, attribute_fields(columns, id_column))
+        self.add_columns_from_df(df, columns, id_column)
 
     def by_adjacency(self, adjacency):
         if adjacency == 'rook':
@@ -1,13 +1,20 @@
-import json
+import logging
 
 import geopandas as gp
 import networkx
+import numpy
 import pandas as pd
 import pysal as ps
-from graphmaker.geospatial import reprojected
+from graphmaker.geospatial import ProjectionContext, reprojected
 from networkx.readwrite import json_graph
 from shapely.ops import cascaded_union
 
+from .columns import align_to_nodes, write_to_nodes
+from .streaming import read_adjacency_json
+from .topology import ArcTable
+
+log = logging.getLogger(__name__)
+
 
 def get_list_of_data(filepath, col_name, geoid=None):
     """Pull a column data from a shape or CSV file.
@@ -35,7 +42,7 @@ def get_list_of_data(filepath, col_name, geoid=None):
     return data
 
 
-def add_data_to_graph(df, graph, col_names, id_col=None):
+def add_data_to_graph(df, graph, col_names, id_col=None, unmatched='raise'):
     """Add columns of a dataframe to a graph based on ids.
 
     :df: Dataframe containing given column.
@@ -45,36 +52,184 @@ def add_data_to_graph(df, graph, col_names, id_col=None):
              be assigned to the corresponding node in the graph. If `None`,
              then the data is assigned to consecutive integer labels 0, 1, ...,
              len(graph) - 1.
+    :unmatched: What to do with ids that are not nodes of the graph. 'raise'
+             (the default) raises a KeyError before anything is written;
+             'report' adds the rows that do match and logs the rest.
+    :returns: A dictionary listing the 'ids_not_in_graph' and the
+             'nodes_without_data'.
+
+    """
+    ids = df[id_col].values if id_col else numpy.arange(len(df))
+    return attach_columns(graph, df[list(col_names)], ids, unmatched)
+
+
+def attach_columns(graph, data, ids, unmatched='raise'):
+    """Add every column of the dataframe :data: to the nodes of :graph: in one
+    pass, where :ids: gives the node for each row of :data:. See
+    `add_data_to_graph` for :unmatched: and the return value.
+    """
+    if unmatched not in ('raise', 'report'):
+        raise ValueError('unmatched must be raise or report.')
+
+    nodes = pd.Index(list(graph.nodes))
+    ids = pd.Index(ids)
+    report = {'ids_not_in_graph': ids[~ids.isin(nodes)].tolist(),
+              'nodes_without_data': nodes[~nodes.isin(ids)].tolist()}
+
+    not_in_graph = report['ids_not_in_graph']
+    if not_in_graph:
+        message = (f"{len(not_in_graph)} ids are not nodes of the graph, "
+                   f"for example {not_in_graph[:5]}")
+        if unmatched == 'raise':
+            raise KeyError(message)
+        log.warning(message)
+
+    aligned, present = align_to_nodes(data, ids, nodes)
+    write_to_nodes(graph, aligned,
+                   pd.DataFrame({column: present for column in aligned.columns},
+                                index=nodes))
+    return report
+
+
+def intersecting_pairs(df):
+    """Find the pairs of units whose geometries intersect, using the STRtree
+    spatial index of :df:.
+
+    :df: Geopandas dataframe.
+    :returns: Two aligned arrays of row positions, one entry per undirected
+        pair, with left < right.
+    """
+    left, right = df.sindex.query(df.geometry, predicate='intersects')
+    once = left < right
+    return left[once], right[once]
+
 
+def positional_pairs(neighbors, index):
+    """Convert neighbor lists keyed by the labels of :index: into aligned arrays
+    of row positions, keeping each undirected pair once (with left < right).
+    Raises a KeyError if a neighbor list mentions a label that is not in :index:.
     """
-    if id_col:
-        for row in df.itertuples():
-            node = getattr(row, id_col)
-            for name in col_names:
-                data = getattr(row, name)
-                graph.nodes[node][name] = data
+    sources = [node for node in neighbors for _ in neighbors[node]]
+    targets = [neighbor for node in neighbors for neighbor in neighbors[node]]
+    if not sources:
+        empty = numpy.array([], dtype=int)
+        return empty, empty
+
+    pairs = numpy.column_stack((index.get_indexer(sources),
+                                index.get_indexer(targets)))
+    if (pairs == -1).any():
+        labels = numpy.column_stack((sources, targets))[pairs == -1]
+        unknown = pd.unique(labels).tolist()
+        raise KeyError(f"{len(unknown)} neighbors are not in the index, "
+                       f"for example {unknown[:5]}")
+    pairs.sort(axis=1)
+    pairs = numpy.unique(pairs[pairs[:, 0] != pairs[:, 1]], axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def shared_perimeters(geometries, left, right, batch_size=100000):
+    """Compute the length of the boundary shared by geometries[left[k]] and
+    geometries[right[k]] for every k, intersecting :batch_size: pairs at a time.
+
+    :geometries: array of geometries (e.g. `df.geometry.values`).
+    :left: array of positions in :geometries:.
+    :right: array of positions in :geometries:, aligned with :left:.
+    :returns: numpy array of lengths, aligned with :left: and :right:.
+    """
+    lengths = numpy.zeros(len(left))
+    for start in range(0, len(left), batch_size):
+        stop = start + batch_size
+        sources = gp.GeoSeries(geometries[left[start:stop]])
+        targets = gp.GeoSeries(geometries[right[start:stop]])
+        lengths[start:stop] = sources.intersection(
+            targets, align=False).length.values
+    return lengths
+
+
+def shared_perimeter_edges(df, neighbors=None):
+    """Compute the shared perimeter of each undirected edge exactly once.
+
+    :df: Geopandas dataframe.
+    :neighbors: (optional) neighbor lists keyed by the index of :df:. If
+        `None`, every pair of intersecting units found by the spatial index
+        is used, including pairs that only meet at a point.
+    :returns: Aligned arrays (left, right, shared_perim), where left and right
+        are row positions in :df:.
+    """
+    if neighbors is None:
+        left, right = intersecting_pairs(df)
     else:
-        for i, row in enumerate(df.itertuples()):
-            for name in col_names:
-                data = getattr(row, name)
-                graph.nodes[i][name] = data
+        left, right = positional_pairs(neighbors, df.index)
+    lengths = shared_perimeters(df.geometry.values, left, right)
+    return left, right, lengths
 
 
 def neighbors_with_shared_perimeters(neighbors, df):
-    vtds = {}
+    vtds = {node: {} for node in neighbors}
 
-    for shape in neighbors:
-        vtds[shape] = {}
-
-        for neighbor in neighbors[shape]:
-            shared_perim = df.loc[shape, "geometry"].intersection(
-                df.loc[neighbor, "geometry"]).length
-            vtds[shape][neighbor] = {'shared_perim': shared_perim}
+    left, right, lengths = shared_perimeter_edges(df, neighbors)
+    for shape, neighbor, shared_perim in zip(df.index[left], df.index[right],
+                                             lengths.tolist()):
+        data = {'shared_perim': shared_perim}
+        vtds.setdefault(shape, {})[neighbor] = data
+        vtds.setdefault(neighbor, {})[shape] = data
 
     return vtds
 
 
-def add_boundary_perimeters(graph, neighbors, df):
+def add_boundary_perimeters(graph, neighbors, df, method='union'):
+    """Set the 'boundary_node' attribute of each node, and the 'boundary_perim'
+    attribute of the nodes on the exterior boundary.
+
+    :method: 'union' (default) intersects each unit with the boundary of the
+        union of all the units. 'topology' derives the boundary from the
+        shared perimeters already on the edges of :graph:, which is much
+        faster. The two agree on 'boundary_perim', but with 'topology' a unit
+        that touches the exterior boundary only at a point is not a
+        boundary node.
+    """
+    if method == 'topology':
+        return add_boundary_perimeters_from_edges(graph, neighbors, df)
+    elif method == 'union':
+        return add_boundary_perimeters_from_union(graph, neighbors, df)
+    else:
+        raise ValueError('method must be topology or union.')
+
+
+def add_boundary_perimeters_from_edges(graph, neighbors, df):
+    """The exterior boundary of a unit is the part of its perimeter that it
+    does not share with any neighbor, so its length is the unit's perimeter
+    minus the 'shared_perim' of each of its edges. Unlike the union-based
+    method, a unit that touches the exterior boundary only at a point is not a
+    boundary node.
+    """
+    return add_boundary_perimeters_from_lengths(graph, neighbors, df['geometry'].length)
+
+
+def add_boundary_perimeters_from_lengths(graph, neighbors, perimeters):
+    """Like `add_boundary_perimeters_from_edges`, with the perimeter of each
+    unit given by the Series :perimeters: (indexed by node) instead of being
+    measured from the geometries."""
+    shared = dict(graph.degree(weight='shared_perim'))
+    boundary_perims = {node: perimeters[node] - shared.get(node, 0)
+                       for node in neighbors}
+    return set_boundary_perimeters(graph, boundary_perims, perimeters)
+
+
+def set_boundary_perimeters(graph, boundary_perims, perimeters, tolerance=1e-6):
+    """Sets 'boundary_node' and 'boundary_perim' from the exterior boundary
+    lengths in the dict :boundary_perims:. Lengths smaller than :tolerance:
+    (relative to the unit's perimeter in :perimeters:) are treated as rounding.
+    """
+    for node, boundary_perim in boundary_perims.items():
+        is_boundary = boundary_perim > tolerance * perimeters[node]
+        graph.nodes[node]['boundary_node'] = bool(is_boundary)
+        if is_boundary:
+            graph.nodes[node]['boundary_perim'] = float(boundary_perim)
+    return graph
+
+
+def add_boundary_perimeters_from_union(graph, neighbors, df):
     all_units = df['geometry']
     # creates one shape of the entire state to compare outer boundaries against
     inter = gp.GeoSeries(cascaded_union(all_units).boundary)
@@ -84,16 +239,16 @@ def add_boundary_perimeters(graph, neighbors, df):
     # if it is set to true, it also adds how much shared
     # perimiter they have to a 'boundary_perim' attribute
     for node in neighbors:
-        graph.node[node]['boundary_node'] = inter.intersects(
+        graph.nodes[node]['boundary_node'] = inter.intersects(
             df.loc[node, "geometry"]).bool()
         if inter.intersects(df.loc[node, "geometry"]).bool():
-            graph.node[node]['boundary_perim'] = float(
+            graph.nodes[node]['boundary_perim'] = float(
                 inter.intersection(df.loc[node, "geometry"]).length)
     return graph
 
 
-def add_areas(graph, df):
-    df = reprojected(df)
+def add_areas(graph, df, context=None):
+    df = reprojected(df, context=context)
     for node in graph.nodes:
         graph.nodes[node]['area'] = df.loc[node, "geometry"].area
     return graph
@@ -117,39 +272,136 @@ def get_neighbors(df, adjacency_type):
 
 def add_columns(graph, cols_to_add, df, geoid_col):
     if cols_to_add is not None:
-        data = pd.DataFrame({x: df[x] for x in cols_to_add})
         if geoid_col is not None:
-            data[geoid_col] = df.index
-        add_data_to_graph(data, graph, cols_to_add, id_col=geoid_col)
+            ids = df.index.values
+        else:
+            ids = numpy.arange(len(df))
+        attach_columns(graph, df[list(cols_to_add)], ids)
 
 
-def construct_graph_from_df(df,  adjacency_type, geoid_col=None, cols_to_add=None):
+def construct_graph_from_df(df,  adjacency_type, geoid_col=None, cols_to_add=None,
+                            boundary_method='union', adjacency_engine='pysal', context=None):
     """Construct initial graph from information about neighboring VTDs.
 
     :df: Geopandas dataframe.
+    :boundary_method: 'union' (default) or 'topology'; see
+        `add_boundary_perimeters`.
+    :adjacency_engine: how to find neighbors and shared perimeters:
+        'pysal' (default) uses pysal's contiguity weights, 'sindex' uses the
+        STRtree spatial index, and 'topology' decomposes the polygon rings
+        into shared arcs (see `graphmaker.graph.topology.ArcTable`).
+    :context: (optional) the `ProjectionContext` of the build, if the caller
+        has already projected :df: with it
     :returns: NetworkX Graph.
     """
-    # reproject to a UTM projection for accurate areas and perimeters in meters
-    df = reprojected(df)
+    context = context or ProjectionContext()
 
     if geoid_col is not None:
         df = df.set_index(geoid_col)
 
-    # Generate rook or queen neighbor lists from dataframe.
-    neighbors = get_neighbors(df, adjacency_type)
+    # reproject to a UTM projection for accurate areas and perimeters in meters
+    df = reprojected(df, context=context)
+
+    if adjacency_engine == 'pysal':
+        # Generate rook or queen neighbor lists from dataframe.
+        neighbors = get_neighbors(df, adjacency_type)
+
+        vtds = neighbors_with_shared_perimeters(neighbors, df)
+        graph = networkx.from_dict_of_dicts(vtds)
+
+        add_boundary_perimeters(graph, neighbors, df, method=boundary_method)
+    elif adjacency_engine == 'sindex':
+        edges = select_adjacency(adjacency_type, *shared_perimeter_edges(df))
+        graph = graph_from_edges(df.index, *edges)
+
+        add_boundary_perimeters(graph, df.index, df, method=boundary_method)
+    elif adjacency_engine == 'topology':
+        arcs = ArcTable(df.geometry.values)
+        graph = graph_from_edges(df.index, *arcs.edges(adjacency_type))
+
+        if boundary_method == 'topology':
+            boundary_perims = dict(zip(df.index, arcs.exterior_perimeters()))
+            set_boundary_perimeters(graph, boundary_perims,
+                                    df['geometry'].length)
+        else:
+            add_boundary_perimeters(graph, df.index, df, method=boundary_method)
+    else:
+        raise ValueError('adjacency_engine must be pysal, sindex or topology.')
+
+    add_areas(graph, df, context=context)
 
-    vtds = neighbors_with_shared_perimeters(neighbors, df)
-    graph = networkx.from_dict_of_dicts(vtds)
+    add_columns(graph, cols_to_add, df, geoid_col)
 
-    add_boundary_perimeters(graph, neighbors, df)
+    return graph
 
-    add_areas(graph, df)
 
-    add_columns(graph, cols_to_add, df, geoid_col)
+def select_adjacency(adjacency_type, left, right, shared_perims):
+    """Keeps the rook or queen edges among intersecting pairs of units: queen
+    keeps them all, and rook drops the point-only contacts."""
+    if adjacency_type == 'rook':
+        rook_edges = shared_perims > 0
+        return left[rook_edges], right[rook_edges], shared_perims[rook_edges]
+    elif adjacency_type == 'queen':
+        return left, right, shared_perims
+    else:
+        raise ValueError('adjacency_type must be rook or queen.')
 
+
+def graph_from_edges(nodes, left, right, shared_perims):
+    """Construct a graph on :nodes: with an edge between nodes[left[k]] and
+    nodes[right[k]] carrying the 'shared_perim' attribute shared_perims[k].
+    The edges are added in sorted order, so that the result does not depend on
+    the order in which they were found.
+    """
+    order = numpy.lexsort((right, left))
+    left, right, shared_perims = left[order], right[order], shared_perims[order]
+
+    graph = networkx.Graph()
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(
+        (source, target, {'shared_perim': shared_perim})
+        for source, target, shared_perim in zip(nodes[left], nodes[right],
+                                                shared_perims.tolist()))
     return graph
 
 
+def construct_rook_and_queen_graphs_from_df(df, geoid_col=None, cols_to_add=None,
+                                            boundary_method='union', context=None):
+    """Construct the rook and queen graphs of the same units in a single pass.
+
+    Queen adjacency is a superset of rook adjacency, so one spatial join finds
+    every queen edge, and the edges with a positive shared perimeter (i.e. not
+    a point-only contact) are the rook edges. Reprojection, perimeters,
+    boundary detection and areas are computed once and shared by both graphs.
+
+    :df: Geopandas dataframe.
+    :boundary_method: 'union' (default) or 'topology'; see
+        `add_boundary_perimeters`.
+    :context: (optional) the `ProjectionContext` of the build
+    :returns: tuple (rook, queen) of NetworkX Graphs.
+    """
+    context = context or ProjectionContext()
+
+    if geoid_col is not None:
+        df = df.set_index(geoid_col)
+
+    df = reprojected(df, context=context)
+
+    edges = shared_perimeter_edges(df)
+
+    queen = graph_from_edges(df.index, *edges)
+    rook = graph_from_edges(df.index, *select_adjacency('rook', *edges))
+
+    add_boundary_perimeters(queen, queen.nodes, df, method=boundary_method)
+    add_areas(queen, df, context=context)
+    add_columns(queen, cols_to_add, df, geoid_col)
+
+    # Both graphs have the same nodes, so they can share the node attributes
+    rook.add_nodes_from(queen.nodes(data=True))
+
+    return rook, queen
+
+
 def construct_graph_from_json(jsonData):
     """Construct initial graph from networkx.json_graph adjacency json format
 
@@ -173,8 +425,8 @@ def construct_graph_from_file(filename, adjacency_type=None, geoid_col=None, col
     :returns: networkx graph
     """
     if filename.split('.')[-1] == "json":
-        mydata = json.loads(open(filename).read())
-        graph = construct_graph_from_json(mydata)
+        with open(filename) as f:
+            graph = read_adjacency_json(f)
         return graph
     elif filename.split('.')[-1] == "shp":
         df = gp.read_file(filename)
@@ -0,0 +1,164 @@
+"""
+Incremental reading and writing of graphs in networkx's adjacency JSON format
+(`networkx.readwrite.json_graph.adjacency_data`).
+
+The writer writes the document node by node to the file, and the reader
+builds the graph while it reads, so neither holds the whole document in memory.
+"""
+import json
+
+import networkx
+
+
+def write_adjacency_json(graph, f):
+    """Writes :graph: to the file :f: as the same text that
+    `json.dumps(adjacency_data(graph))` would produce."""
+    multigraph = graph.is_multigraph()
+    f.write('{"directed": ' + json.dumps(graph.is_directed()) +
+            ', "multigraph": ' + json.dumps(multigraph) +
+            ', "graph": ' + json.dumps(list(graph.graph.items())) +
+            ', "nodes": [')
+    for i, (node, data) in enumerate(graph.nodes(data=True)):
+        if i:
+            f.write(', ')
+        f.write(json.dumps({**data, 'id': node}))
+
+    f.write('], "adjacency": [')
+    for i, (node, neighbors) in enumerate(graph.adjacency()):
+        if multigraph:
+            row = [{**data, 'id': neighbor, 'key': key}
+                   for neighbor, keys in neighbors.items()
+                   for key, data in keys.items()]
+        else:
+            row = [{**data, 'id': neighbor}
+                   for neighbor, data in neighbors.items()]
+        if i:
+            f.write(', ')
+        f.write(json.dumps(row))
+    f.write(']}')
+
+
+class JSONStream:
+    """Reads the JSON document in the file :f: one value at a time, keeping
+    only a small buffer of text in memory."""
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        self.finished = False
+        self.decoder = json.JSONDecoder()
+
+    def read_more(self, size=None):
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.finished = True
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def peek(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.finished:
+                raise ValueError('Unexpected end of JSON document.')
+            self.read_more()
+
+    def expect(self, characters):
+        character = self.peek()
+        if character not in characters:
+            raise ValueError(f"Expected one of {characters!r} in JSON document "
+                             f"but found {character!r}.")
+        self.position += 1
+        return character
+
+    def value(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.finished:
+                    raise
+            else:
+                # A value that ends with the buffer (like a number) might
+                # continue in the next chunk.
+                if end < len(self.buffer) or self.finished:
+                    self.position = end
+                    return value
+            self.read_more(size)
+            size *= 2
+
+    def items(self):
+        """Yields the values of the array that starts here, one at a time."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+    def members(self):
+        """Yields the keys of the object that starts here. After each key,
+        the caller must read the corresponding value."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.position += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+
+def read_adjacency_json(f, chunk_size=1 << 16):
+    """Builds a graph from the adjacency JSON document in the file :f: while
+    reading it. Like networkx's `adjacency_graph`, this expects the 'directed'
+    and 'multigraph' flags before the nodes, as `write_adjacency_json` and
+    `adjacency_data` both write them."""
+    stream = JSONStream(f, chunk_size)
+    flags = {'directed': False, 'multigraph': False}
+    graph = None
+    nodes = []
+
+    def new_graph():
+        if flags['multigraph']:
+            return networkx.MultiDiGraph() if flags['directed'] else networkx.MultiGraph()
+        return networkx.DiGraph() if flags['directed'] else networkx.Graph()
+
+    for key in stream.members():
+        if key in flags:
+            flags[key] = stream.value()
+        elif key == 'graph':
+            graph = graph if graph is not None else new_graph()
+            graph.graph.update(dict(stream.value()))
+        elif key == 'nodes':
+            graph = graph if graph is not None else new_graph()
+            for data in stream.items():
+                node = data.pop('id')
+                nodes.append(node)
+                graph.add_node(node, **data)
+        elif key == 'adjacency':
+            graph = graph if graph is not None else new_graph()
+            for position, row in enumerate(stream.items()):
+                if position >= len(nodes):
+                    raise ValueError('The adjacency lists must come after the nodes.')
+                source = nodes[position]
+                for data in row:
+                    target = data.pop('id')
+                    if flags['multigraph']:
+                        graph.add_edge(source, target, key=data.pop('key'), **data)
+                    elif flags['directed'] or not graph.has_edge(source, target):
+                        graph.add_edge(source, target, **data)
+        else:
+            stream.value()
+
+    return graph if graph is not None else new_graph()
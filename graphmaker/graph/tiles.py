@@ -0,0 +1,220 @@
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import geopandas as gp
+import numpy
+import pandas
+from graphmaker.geospatial import identify_utm_zone, utm_crs
+from shapely.geometry import box
+
+from .make_graph import (add_boundary_perimeters_from_lengths, add_columns,
+                         graph_from_edges, select_adjacency,
+                         shared_perimeter_edges)
+
+log = logging.getLogger(__name__)
+
+
+def centroid_utm_zone(df):
+    """The UTM zone of :df:, found from the centroids of its units alone, so
+    that the whole frame is never reprojected at once."""
+    return identify_utm_zone(gp.GeoDataFrame(geometry=df.geometry.centroid, crs=df.crs))
+
+
+def assign_tiles(df, tile_by=None, tile_size=None, crs=None):
+    """
+    Returns an array assigning each unit of :df: to a tile: either the value
+    of the column :tile_by: (e.g. the county), or the square grid cell of side
+    :tile_size: (in the units of :crs:, or of the CRS of :df: if not given)
+    containing the unit's representative point.
+    """
+    if tile_by is not None:
+        return df[tile_by].values
+    if tile_size is None:
+        raise ValueError('Please specify either tile_by or tile_size.')
+    points = df.geometry.representative_point()
+    if crs is not None:
+        points = points.to_crs(crs)
+    columns = numpy.floor(points.x.values / tile_size).astype(int)
+    rows = numpy.floor(points.y.values / tile_size).astype(int)
+    return numpy.array([f"{row}_{column}" for row, column in zip(rows, columns)])
+
+
+def seam_units(df, tiles):
+    """
+    Returns a boolean array marking the units whose bounding box meets the
+    bounding box of some other tile. If two units in different tiles touch,
+    each one meets the other's tile bounds, so every edge between tiles joins
+    two seam units.
+    """
+    bounds = df.geometry.bounds
+    bounds['tile'] = tiles
+    tile_bounds = bounds.groupby('tile').agg(
+        {'minx': 'min', 'miny': 'min', 'maxx': 'max', 'maxy': 'max'})
+    tile_boxes = gp.GeoSeries([box(*row) for row in tile_bounds.itertuples(index=False)])
+    unit_boxes = gp.GeoSeries([box(*row) for row in
+                               bounds[['minx', 'miny', 'maxx', 'maxy']].itertuples(index=False)])
+
+    units, tile_positions = tile_boxes.sindex.query(unit_boxes, predicate='intersects')
+    other_tile = tile_bounds.index.values[tile_positions] != tiles[units]
+
+    seam = numpy.zeros(len(df), dtype=bool)
+    seam[units[other_tile]] = True
+    return seam
+
+
+def measure_tile(geometries, positions, crs):
+    """
+    Projects the units at :positions: (with geometries :geometries:) to
+    :crs: and measures them. Returns :positions:, the shared perimeter edges
+    among them (left, right and shared_perim, in terms of :positions:), and
+    their perimeters and areas. This is the work done for one tile.
+    """
+    frame = gp.GeoDataFrame(geometry=gp.GeoSeries(geometries).to_crs(crs))
+    left, right, shared_perims = shared_perimeter_edges(frame)
+    return (positions, positions[left], positions[right], shared_perims,
+            frame.geometry.length.values, frame.geometry.area.values)
+
+
+def bounded_map(function, jobs, workers):
+    """
+    Yields function(*job) for each of :jobs: (in no particular order) from a
+    pool of :workers: processes, keeping at most twice as many jobs in flight
+    as there are workers, so that only that many tiles are in memory at once.
+    """
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        while True:
+            for job in jobs:
+                pending.add(executor.submit(function, *job))
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def measure_in_tiles(df, tiles, crs, workers=None):
+    """
+    Computes the same (left, right, shared_perim) arrays as
+    `shared_perimeter_edges` would for :df: projected to :crs:, one tile at a
+    time in a pool of :workers: processes, and then stitches the tiles
+    together by looking for edges only among the units along the seams
+    between tiles. Each tile is projected by its worker, so the whole frame is
+    never projected at once.
+
+    :returns: tuple (edges, perimeters, areas), where edges are the
+        (left, right, shared_perim) arrays and perimeters and areas are arrays
+        in the order of the rows of :df:.
+    """
+    geometries = df.geometry.values
+    codes, _ = pandas.factorize(tiles)
+    order = numpy.argsort(codes, kind='stable')
+    groups = numpy.split(order, numpy.cumsum(numpy.bincount(codes))[:-1])
+    jobs = ((geometries[positions], positions, crs) for positions in groups)
+    log.info(f"Computing adjacencies within {len(groups)} tiles.")
+
+    if workers == 1:
+        results = (measure_tile(*job) for job in jobs)
+    else:
+        results = bounded_map(measure_tile, jobs, workers or os.cpu_count())
+
+    edges, perimeters, areas = [], numpy.zeros(len(df)), numpy.zeros(len(df))
+    for positions, left, right, shared_perims, tile_perimeters, tile_areas in results:
+        edges.append((left, right, shared_perims))
+        perimeters[positions], areas[positions] = tile_perimeters, tile_areas
+
+    seam = numpy.flatnonzero(seam_units(df, tiles))
+    log.info(f"Stitching tiles along seams with {len(seam)} units.")
+    _, left, right, shared_perims, _, _ = measure_tile(geometries[seam], seam, crs)
+    between_tiles = tiles[left] != tiles[right]
+    edges.append((left[between_tiles], right[between_tiles], shared_perims[between_tiles]))
+
+    edges = tuple(numpy.concatenate(arrays) for arrays in zip(*edges))
+    return edges, perimeters, areas
+
+
+def tiled_build(df, geoid_col=None, tile_by=None, tile_size=None, workers=None):
+    """
+    The work shared by the tiled builders: returns (df, edges, perimeters,
+    areas), where df is :df: indexed by :geoid_col: and the rest is as in
+    `measure_in_tiles`, in the UTM zone of :df:.
+    """
+    if geoid_col is not None:
+        df = df.set_index(geoid_col)
+
+    crs = utm_crs(centroid_utm_zone(df))
+    tiles = assign_tiles(df, tile_by, tile_size, crs)
+    edges, perimeters, areas = measure_in_tiles(df, tiles, crs, workers)
+    return df, edges, pandas.Series(perimeters, index=df.index), areas
+
+
+def add_tiled_areas(graph, nodes, areas):
+    for node, area in zip(nodes, areas.tolist()):
+        graph.nodes[node]['area'] = area
+
+
+def construct_tiled_graph_from_df(df, adjacency_type, geoid_col=None, cols_to_add=None,
+                                  tile_by=None, tile_size=None, workers=None):
+    """Construct the same graph as `construct_graph_from_df` with the 'sindex'
+    adjacency engine and the 'topology' boundary method, computing adjacencies
+    tile by tile in parallel. Each tile is projected and measured by its own
+    worker, and the boundary perimeters are derived from the shared
+    perimeters, so no step works on the whole state's geometry at once.
+
+    :df: Geopandas dataframe.
+    :tile_by: (optional) column to tile by, e.g. the county FIPS code.
+    :tile_size: (optional) side length in meters of a square grid of tiles,
+        used if :tile_by: is not given.
+    :workers: number of worker processes (defaults to the number of CPUs).
+    :returns: NetworkX Graph.
+    """
+    df, edges, perimeters, areas = tiled_build(df, geoid_col, tile_by, tile_size, workers)
+
+    graph = graph_from_edges(df.index, *select_adjacency(adjacency_type, *edges))
+    add_boundary_perimeters_from_lengths(graph, df.index, perimeters)
+    add_tiled_areas(graph, df.index, areas)
+    add_columns(graph, cols_to_add, df, geoid_col)
+
+    return graph
+
+
+def construct_tiled_rook_and_queen_graphs_from_df(df, geoid_col=None, cols_to_add=None,
+                                                  tile_by=None, tile_size=None, workers=None):
+    """Construct the same graphs as `construct_rook_and_queen_graphs_from_df`
+    with the 'topology' boundary method, computing the adjacencies once, tile
+    by tile in parallel. See `construct_tiled_graph_from_df`.
+
+    :returns: tuple (rook, queen) of NetworkX Graphs.
+    """
+    df, edges, perimeters, areas = tiled_build(df, geoid_col, tile_by, tile_size, workers)
+
+    queen = graph_from_edges(df.index, *edges)
+    rook = graph_from_edges(df.index, *select_adjacency('rook', *edges))
+
+    add_boundary_perimeters_from_lengths(queen, df.index, perimeters)
+    add_tiled_areas(queen, df.index, areas)
+    add_columns(queen, cols_to_add, df, geoid_col)
+
+    # Both graphs have the same nodes, so they can share the node attributes
+    rook.add_nodes_from(queen.nodes(data=True))
+
+    return rook, queen
+
+
+def tile_options(tiles):
+    """
+    Turns the :tiles: option of the graph builders (see `Graph.from_df`) into
+    keyword arguments for the tiled builders: a column name to tile by (like
+    'COUNTYFP10'), or a number (or numeric string, as from the command line)
+    for the side of square tiles in meters.
+    """
+    if isinstance(tiles, (int, float)):
+        return {'tile_size': tiles}
+    try:
+        return {'tile_size': float(tiles)}
+    except ValueError:
+        return {'tile_by': tiles}
@@ -0,0 +1,129 @@
+import numpy
+import pandas
+
+
+def rings(geometry):
+    """Yields the coordinates of every exterior and interior ring of the
+    (Multi)Polygon :geometry: as (n, 2) numpy arrays."""
+    if geometry is None or geometry.is_empty:
+        return
+    for polygon in getattr(geometry, 'geoms', [geometry]):
+        yield numpy.asarray(polygon.exterior.coords)[:, :2]
+        for interior in polygon.interiors:
+            yield numpy.asarray(interior.coords)[:, :2]
+
+
+def pairs_sharing(table, key):
+    """Self-joins :table: (with an 'owner' column) on :key: and returns the
+    rows of distinct owners that share a key, once per undirected pair."""
+    joined = table.merge(table, on=key, suffixes=('_left', '_right'))
+    return joined[joined['owner_left'] < joined['owner_right']]
+
+
+def identify_rows(array):
+    """Returns an integer id for each row of :array:, equal for equal rows."""
+    _, ids = numpy.unique(array, axis=0, return_inverse=True)
+    return ids.reshape(-1)
+
+
+class ArcTable:
+    """
+    A TopoJSON-style decomposition of polygon rings into arcs, built in one
+    pass over the geometries.
+
+    Every ring is cut into its segments, and each segment is identified by its
+    (unordered) endpoints. Arcs are stored segment by segment: a segment owned
+    by two units is part of the arc between them, and a segment owned by only
+    one unit is part of the exterior boundary. Units that share only a vertex
+    are point (queen-only) contacts.
+
+    This assumes the input is topologically clean, i.e. that neighboring units
+    use the same vertices along their common boundary, as Census TIGER/Line
+    geometries do. Coordinates can be snapped to a grid of size :precision:
+    to absorb rounding in the input.
+    """
+
+    def __init__(self, geometries, precision=None):
+        starts, ends, owners = [], [], []
+        for owner, geometry in enumerate(geometries):
+            for ring in rings(geometry):
+                starts.append(ring[:-1])
+                ends.append(ring[1:])
+                owners.append(numpy.full(len(ring) - 1, owner))
+
+        self.number_of_units = len(geometries)
+
+        if not owners:
+            starts, ends = [numpy.empty((0, 2))], [numpy.empty((0, 2))]
+            owners = [numpy.array([], dtype=int)]
+        starts, ends = numpy.concatenate(starts), numpy.concatenate(ends)
+        owners = numpy.concatenate(owners)
+
+        if precision:
+            starts = numpy.round(starts / precision) * precision
+            ends = numpy.round(ends / precision) * precision
+        # adding 0.0 turns -0.0 into 0.0, so that equal points have equal bytes
+        starts, ends = starts + 0.0, ends + 0.0
+
+        lengths = numpy.hypot(*(ends - starts).T)
+        keep = lengths > 0
+        starts, ends = starts[keep], ends[keep]
+        owners, lengths = owners[keep], lengths[keep]
+
+        # Orient every segment the same way, so that both sides of a shared
+        # segment get the same key
+        flip = (starts[:, 0] > ends[:, 0]) | (
+            (starts[:, 0] == ends[:, 0]) & (starts[:, 1] > ends[:, 1]))
+        starts[flip], ends[flip] = ends[flip], starts[flip]
+
+        arcs = identify_rows(numpy.hstack([starts, ends]))
+        vertices = identify_rows(numpy.vstack([starts, ends]))
+
+        self.segments = pandas.DataFrame(
+            {'arc': arcs, 'owner': owners, 'length': lengths}
+        ).drop_duplicates(['arc', 'owner'])
+        self.vertices = pandas.DataFrame(
+            {'vertex': vertices, 'owner': numpy.concatenate([owners, owners])}
+        ).drop_duplicates()
+
+    def shared_perimeters(self):
+        """Returns aligned arrays (left, right, shared_perim) with one entry
+        for every pair of units that share at least one segment."""
+        shared = pairs_sharing(self.segments, 'arc')
+        totals = shared.groupby(['owner_left', 'owner_right'])[
+            'length_left'].sum()
+        return (totals.index.get_level_values(0).values,
+                totals.index.get_level_values(1).values, totals.values)
+
+    def point_contacts(self):
+        """Returns aligned arrays (left, right) with one entry for every pair
+        of units that share at least one vertex."""
+        shared = pairs_sharing(self.vertices, 'vertex')
+        pairs = shared[['owner_left', 'owner_right']].drop_duplicates()
+        return pairs['owner_left'].values, pairs['owner_right'].values
+
+    def edges(self, adjacency_type):
+        """Returns aligned arrays (left, right, shared_perim) of the rook or
+        queen edges. Queen edges between units that share only a vertex have a
+        shared perimeter of 0."""
+        left, right, lengths = self.shared_perimeters()
+        if adjacency_type == 'rook':
+            return left, right, lengths
+        elif adjacency_type != 'queen':
+            raise ValueError('adjacency_type must be rook or queen.')
+
+        rook = pandas.Series(lengths, index=pandas.MultiIndex.from_arrays(
+            [left, right]))
+        queen = pandas.MultiIndex.from_arrays(self.point_contacts())
+        queen = rook.reindex(queen.union(rook.index), fill_value=0.0)
+        return (queen.index.get_level_values(0).values,
+                queen.index.get_level_values(1).values, queen.values)
+
+    def exterior_perimeters(self):
+        """Returns an array with the length of each unit's exterior boundary,
+        i.e. the total length of its segments that no other unit shares."""
+        owners_per_arc = self.segments.groupby('arc')['owner'].transform('size')
+        exterior = self.segments[owners_per_arc.values == 1]
+        return numpy.bincount(exterior['owner'].values,
+                              weights=exterior['length'].values,
+                              minlength=self.number_of_units)
@@ -1,25 +1,36 @@
-import geopandas
 import numpy
 import pandas
+import scipy.sparse
+from graphmaker.crosswalk import crosswalk
 from graphmaker.graph import RookAndQueenGraphs
-from graphmaker.resources import BlockAssignmentFile
-from graphmaker.utils import infer_id_column
+from graphmaker.resources import BlockPopulationShapefile
+from graphmaker.utils import infer_id_column, read_attributes
 
 
 def integrate(blocks_filepath, columns, unit):
     blocks_df = load_df(blocks_filepath)
-    totals = pandas.DataFrame(data={column:
-                                    integrate_over_blocks_in_units(
-                                        blocks_df, blocks_df[column], unit)
-                                    for column in columns})
-    return totals
+    return aggregate(blocks_df, columns, unit)
+
 
+def integrate_fips(fips, columns, unit, save=True, blocks_filepath=None):
+    """
+    Aggregates the block-level :columns: to :unit: for the state :fips:,
+    using the state's cached block-to-unit crosswalk.
+
+    :blocks_filepath: (optional) file with the block-level data, indexed by
+        block id. Defaults to the state's block population shapefile.
+    """
+    if blocks_filepath:
+        blocks_df = load_df(blocks_filepath)
+    else:
+        blocks_df = BlockPopulationShapefile(fips).as_df(columns=columns, geometry=False)
+
+    totals = crosswalk(fips, unit).aggregate(blocks_df[columns])
+    totals.index.name = unit
 
-def integrate_fips(fips, columns, unit, save=True):
-    totals = integrate(BlockAssignmentFile(fips).path(), columns, unit)
     if save:
         graphs = RookAndQueenGraphs.load_fips(fips)
-        graphs.add_columns_from_df(totals, columns, unit)
+        graphs.add_columns_from_df(totals.reset_index(), columns, unit)
         graphs.save()
     return totals
 
@@ -29,7 +40,7 @@ def load_df(filepath, id_column=None):
     if extension == 'csv' or extension == 'txt':
         df = pandas.read_csv(filepath)
     elif extension == 'shp':
-        df = geopandas.read_file(filepath)
+        df = read_attributes(filepath)
     else:
         raise ValueError(
             'Unrecognized file extension. I know csv, txt, and shp.')
@@ -46,11 +57,63 @@ def integrate_over_blocks_in_units(blocks, series, unit, function=numpy.sum):
     Integrates the block-level values in :series: to produce vtd-level
     aggregate values.
 
-    :fips: state fips code
+    :blocks: dataframe of blocks, indexed by Census block GEOID, with a column
+        assigning each block to a :unit:
     :series: pandas Series, assumed to be indexed by Census block GEOID
     :function: (defaults to sum) the function to use for aggregation
     """
-    blocks['data'] = series
-    grouped_by_vtd = blocks.groupby(unit)
-    vtd_totals = grouped_by_vtd['data'].aggregate(function)
-    return vtd_totals
+    data = pandas.DataFrame({'data': series.reindex(blocks.index)})
+    data[unit] = blocks[unit]
+    return aggregate(data, ['data'], unit, function)['data']
+
+
+def aggregate(blocks, columns, units, function=numpy.sum):
+    """
+    Aggregates every column in :columns: of the :blocks: dataframe over each
+    unit in :units:, factorizing each unit's key once and reducing all the
+    columns together.
+
+    :blocks: dataframe with the data :columns: and a column for each unit
+    :units: a unit column (like 'VTD') or a list of them (like
+        ['VTD', 'CD', 'SLDU', 'SLDL'])
+    :function: (defaults to `numpy.sum`) the reducer: any function or name
+        that pandas' `aggregate` accepts, or a dict from columns to reducers.
+        Sums are computed with a single sparse matrix product.
+    :returns: a dataframe indexed by unit with one column per data column, or
+        a dictionary of them keyed by unit if :units: is a list.
+    """
+    columns = list(columns)
+    values = blocks[columns]
+
+    totals = dict()
+    for unit in ([units] if isinstance(units, str) else units):
+        codes, labels = pandas.factorize(blocks[unit], sort=True)
+        index = pandas.Index(labels, name=unit)
+
+        if function is numpy.sum and all(
+                pandas.api.types.is_numeric_dtype(dtype) for dtype in values.dtypes):
+            totals[unit] = sum_by_codes(values, codes, index)
+        else:
+            grouped = values[codes >= 0].groupby(codes[codes >= 0])
+            result = grouped.aggregate(function)
+            result.index = index[result.index]
+            totals[unit] = result
+
+    return totals[units] if isinstance(units, str) else totals
+
+
+def sum_by_codes(values, codes, index):
+    """Sums the rows of :values: with the same code, as one product of a
+    (units x blocks) sparse indicator matrix with the (blocks x columns) data.
+    Blocks with code -1 (no unit) and missing values are skipped."""
+    assigned = codes >= 0
+    indicator = scipy.sparse.csr_matrix(
+        (numpy.ones(assigned.sum()), (codes[assigned], numpy.flatnonzero(assigned))),
+        shape=(len(index), len(values)))
+    data = numpy.nan_to_num(values.to_numpy(dtype=float))
+    sums = pandas.DataFrame(indicator @ data, index=index, columns=values.columns)
+
+    for column, dtype in values.dtypes.items():
+        if pandas.api.types.is_integer_dtype(dtype) or pandas.api.types.is_bool_dtype(dtype):
+            sums[column] = sums[column].round().astype(numpy.int64)
+    return sums
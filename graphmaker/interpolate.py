@@ -0,0 +1,123 @@
+"""
+Areal interpolation of data from one set of polygons (like precincts with
+election results) onto another (like the units of a graph), for data that no
+block assignment file can aggregate.
+
+Each source polygon's values are split among the targets it overlaps, in
+proportion to the area of the overlap. The weights are kept as a `Crosswalk`
+from sources to targets, so they can be computed once and reused for any
+number of columns and elections.
+"""
+import hashlib
+import logging
+import os
+
+import geopandas as gp
+import numpy
+import scipy.sparse
+
+from .crosswalk import Crosswalk, stored_fingerprint
+from .geospatial import ProjectionContext
+
+log = logging.getLogger(__name__)
+
+
+def overlapping_pairs(source_df, target_df):
+    """Find the (source, target) pairs of polygons that overlap, using the
+    STRtree spatial index of :source_df:. Returns two aligned arrays of row
+    positions."""
+    targets, sources = source_df.sindex.query(target_df.geometry, predicate='intersects')
+    return sources, targets
+
+
+def intersection_areas(sources, targets, batch_size=100000):
+    """Compute the area of the intersection of sources[k] and targets[k] for
+    every k, intersecting :batch_size: pairs at a time."""
+    areas = numpy.zeros(len(sources))
+    for start in range(0, len(sources), batch_size):
+        stop = start + batch_size
+        areas[start:stop] = gp.GeoSeries(sources[start:stop]).intersection(
+            gp.GeoSeries(targets[start:stop]), align=False).area.values
+    return areas
+
+
+def area_weights(source_df, target_df, batch_size=100000):
+    """
+    Returns the Crosswalk from the rows of :source_df: to the rows of
+    :target_df: whose ij-th entry is the fraction of the area of source i that
+    lies in target j. Both are reprojected to the UTM zone of :target_df: to
+    measure areas.
+    """
+    context = ProjectionContext()
+    target_df = context.reprojected(target_df)
+    source_df = context.to_crs(source_df, target_df.crs)
+
+    sources, targets = overlapping_pairs(source_df, target_df)
+    log.info(f"Intersecting {len(sources)} overlapping pairs of polygons.")
+    areas = intersection_areas(source_df.geometry.values[sources],
+                               target_df.geometry.values[targets], batch_size)
+
+    source_areas = source_df.geometry.area.values[sources]
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        fractions = numpy.where(source_areas > 0, areas / source_areas, 0)
+
+    keep = fractions > 0
+    matrix = scipy.sparse.csr_matrix(
+        (fractions[keep], (sources[keep], targets[keep])),
+        shape=(len(source_df), len(target_df)))
+    return Crosswalk(matrix, source_df.index, target_df.index)
+
+
+def geometry_fingerprint(*frames):
+    """A digest of the CRS and the geometry (as WKB) of each of :frames:, which
+    changes whenever any of the polygons do, even if their ids stay the same."""
+    digest = hashlib.sha256()
+    for df in frames:
+        digest.update(str(df.crs).encode())
+        for wkb in df.geometry.to_wkb():
+            digest.update(wkb or b'')
+    return digest.hexdigest()
+
+
+def cached_area_weights(source_df, target_df, weights_path=None):
+    """
+    Like `area_weights`, but saves the weights to :weights_path: and loads
+    them from there next time, as long as they were computed for the same
+    source and target ids and the same polygons (see `geometry_fingerprint`).
+    """
+    if not weights_path:
+        return area_weights(source_df, target_df)
+
+    fingerprint = geometry_fingerprint(source_df, target_df)
+    if os.path.exists(weights_path):
+        weights = Crosswalk.load(weights_path)
+        if (list(weights.blocks) == list(source_df.index.astype(str)) and
+                list(weights.units) == list(target_df.index.astype(str)) and
+                stored_fingerprint(weights_path) == fingerprint):
+            return Crosswalk(weights.matrix, source_df.index, target_df.index)
+        log.info(f"The weights in {weights_path} are for different polygons; "
+                 "computing them again.")
+
+    weights = area_weights(source_df, target_df)
+    weights.save(weights_path, fingerprint=fingerprint)
+    return weights
+
+
+def interpolate(source_df, target_graph_df, columns, id_column=None, weights_path=None):
+    """
+    Interpolates the :columns: of :source_df: (counts, like votes or
+    population) onto the polygons of :target_graph_df: by area.
+
+    :source_df: GeoDataFrame of the polygons with the data
+    :target_graph_df: GeoDataFrame of the units of the graph
+    :id_column: (optional) column of :target_graph_df: with the ids of the
+        graph's nodes. Defaults to the index.
+    :weights_path: (optional) `.npz` file for caching the area weights
+        between calls (see `cached_area_weights`)
+    :returns: a DataFrame indexed by the targets' ids, with one column per
+        interpolated column, ready for `Graph.add_columns_from_df`.
+    """
+    if id_column is not None:
+        target_graph_df = target_graph_df.set_index(id_column)
+    weights = cached_area_weights(source_df, target_graph_df, weights_path)
+    return weights.aggregate(source_df[list(columns)].astype(float))
@@ -1,7 +1,10 @@
 import logging
 from collections import Counter
 
+import networkx
+import numpy
 import pandas
+import scipy.sparse
 
 from .collect import collector
 from .graph import RookAndQueenGraphs
@@ -14,7 +17,7 @@ log.addHandler(logging.StreamHandler())
 collect = collector('vtd_splits',
                     ['fips', 'node', 'best_guess_match',
                      'percent_match'], './logs/vtd_splits.csv',
-                    {'percent_match': '.4f'})
+                    format_types={'percent_match': '.4f'})
 
 # VTDs have GEOIDs of this form:
 # {2-digit state FIPS}{3-digit county code}{>=2-digit VTD code}
@@ -45,29 +48,56 @@ def patch_value_from_neighbors(node, series, graph):
     return best_guess
 
 
-def most_common_values(series):
-    counts = series.value_counts(dropna=True)
-    if len(counts.index) == 0:
-        counts = series.value_counts(dropna=False)
-    return counts
+def crosstab(unit_codes, part_codes):
+    """
+    The unit x part crosstab of the blocks, in long form: one row for each
+    (unit, part) pair that some block has, with the number of such blocks and
+    the position of the first one. Blocks missing a unit or a part are left out.
+    """
+    assigned = (unit_codes >= 0) & (part_codes >= 0)
+    pairs = pandas.DataFrame({'unit': unit_codes[assigned],
+                              'part': part_codes[assigned],
+                              'position': numpy.flatnonzero(assigned)})
+    grouped = pairs.groupby(['unit', 'part'], sort=False)['position']
+    return grouped.agg(count='size', first='min').reset_index()
 
 
-def check_for_splits(value_counts, graph, unit, part):
-    fips = graph.graph.get('state', '')
+def best_matches(unit_codes, part_codes, number_of_units):
+    """
+    Returns, for each unit, the code of the part containing the most of its
+    blocks (-1 if none of its blocks has a part), the fraction of its blocks
+    in that part, and the number of different parts its blocks are in.
+    Ties go to the part that comes first among the unit's blocks.
+    """
+    table = crosstab(unit_codes, part_codes)
+    totals = numpy.bincount(table['unit'], weights=table['count'],
+                            minlength=number_of_units)
+    number_of_parts = numpy.bincount(table['unit'], minlength=number_of_units)
+
+    best = table.sort_values(['unit', 'count', 'first'],
+                             ascending=[True, False, True]).drop_duplicates('unit')
+    best_parts = numpy.full(number_of_units, -1)
+    best_parts[best['unit'].values] = best['part'].values
+    best_counts = numpy.zeros(number_of_units)
+    best_counts[best['unit'].values] = best['count'].values
 
-    for node, counts in value_counts.items():
-        common = counts.index
-        most_common = common[0]
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        percentages = best_counts / totals
+    return best_parts, percentages, number_of_parts
 
-        if len(common) > 1:
-            log.warn(
-                f"More than one {part} assigned to the blocks in {unit} {node}!")
-            percentage = counts[most_common] / sum(counts)
-            log.warn(
-                f"{round(percentage*100, 2)}% were assigned to {part} {most_common}")
-            # the first two digits of a block_id is the state fips code
-            collect(fips=fips, node=node, best_guess_match=most_common,
-                    percent_match=percentage)
+
+def check_for_splits(matched, percentages, number_of_parts, unit, part, fips=''):
+    split = numpy.flatnonzero(number_of_parts > 1)
+
+    for node, most_common, percentage in zip(matched.index[split],
+                                             matched.values[split],
+                                             percentages[split]):
+        log.warn(
+            f"More than one {part} assigned to the blocks in {unit} {node}!")
+        log.warn(
+            f"{round(percentage*100, 2)}% were assigned to {part} {most_common}")
+        collect(fips=fips, node=node, best_guess_match=most_common,
+                percent_match=percentage)
 
 
 def keys_with_na_values(mapping):
@@ -76,88 +106,224 @@ def keys_with_na_values(mapping):
             yield key
 
 
+def match_units_to_parts(blocks, unit, parts, fips=''):
+    """
+    Matches each unit to the part containing the most of its blocks, for
+    every part type in :parts: at once, and logs the units that are split
+    between parts.
+
+    :blocks: dataframe of blocks with columns for :unit: and :parts: assignments
+    :parts: a part column (like 'CD') or a list of them (like
+        ['CD', 'SLDU', 'SLDL'])
+    :returns: a dataframe indexed by unit with one column per part. Units
+        with no blocks in any part are NA (see `patch_missing_values`).
+    """
+    parts = [parts] if isinstance(parts, str) else list(parts)
+    unit_codes, units = pandas.factorize(blocks[unit], sort=True)
+    units = pandas.Index(numpy.asarray(units))
+    matching = pandas.DataFrame(index=units)
+
+    for part in parts:
+        part_codes, labels = pandas.factorize(blocks[part])
+        best, percentages, number_of_parts = best_matches(
+            unit_codes, part_codes, len(units))
+
+        # The extra NA label at the end is picked by the code -1
+        labels = numpy.append(numpy.asarray(labels, dtype=object), numpy.nan)
+        matched = pandas.Series(labels[best], index=units)
+
+        check_for_splits(matched, percentages, number_of_parts, unit, part, fips)
+        matching[part] = matched.infer_objects()
+
+    return matching
+
+
+def sparse_argmax(votes):
+    """Returns the column of the largest entry in each row of the sparse
+    matrix :votes: (the first such column, if there are ties) and a boolean
+    array marking the rows with any positive entry."""
+    votes = scipy.sparse.csr_matrix(votes)
+    votes.sort_indices()
+    return numpy.asarray(votes.argmax(axis=1)).ravel(), votes.max(axis=1).toarray().ravel() > 0
+
+
+def propagate_labels(series, graph, weight=None):
+    """
+    Fills in the NA values of :series: (indexed by the nodes of :graph:) by
+    plurality vote among each node's neighbors, repeating until every NA that
+    is connected to a labelled node has a value.
+
+    All the votes of a round are counted at once, with one product of the
+    graph's sparse adjacency matrix and the labels, and only neighbors that
+    already have a value vote. Ties go to the smallest label, so the result
+    does not depend on the order of the nodes.
+
+    :weight: (optional) edge attribute (like 'shared_perim') to weight the
+        votes by. Nodes whose labelled neighbors all have zero weight fall back
+        to counting neighbors.
+    """
+    nodes = pandas.Index(list(graph.nodes))
+    codes, labels = pandas.factorize(series.reindex(nodes), sort=True)
+
+    adjacency = networkx.to_scipy_sparse_array(graph, nodelist=nodes, weight=None,
+                                               format='csr')
+    weighted = (adjacency if weight is None else
+                networkx.to_scipy_sparse_array(graph, nodelist=nodes, weight=weight,
+                                               format='csr'))
+
+    rounds = 0
+    while (codes < 0).any():
+        unknown = numpy.flatnonzero(codes < 0)
+        known = numpy.flatnonzero(codes >= 0)
+        one_hot = scipy.sparse.csr_matrix(
+            (numpy.ones(len(known)), (known, codes[known])),
+            shape=(len(nodes), len(labels)))
+
+        choices, voted = sparse_argmax(weighted[unknown] @ one_hot)
+        if weight is not None:
+            counted, has_neighbors = sparse_argmax(adjacency[unknown] @ one_hot)
+            choices = numpy.where(voted, choices, counted)
+            voted = voted | has_neighbors
+
+        if not voted.any():
+            break
+        codes[unknown[voted]] = choices[voted]
+        rounds += 1
+
+    # The extra NA label at the end is picked by the code -1
+    labels = numpy.append(numpy.asarray(labels, dtype=object), numpy.nan)
+    filled = series.astype(object).fillna(pandas.Series(labels[codes], index=nodes))
+
+    log.info(f"Filled in {series.isna().sum() - filled.isna().sum()} missing "
+             f"values by label propagation in {rounds} rounds.")
+    return filled.infer_objects()
+
+
+def patch_missing_values(matching, graph, method='neighbors', weight=None):
+    """
+    Fills in the NA entries of :matching: (see `match_units_to_parts`) using
+    the values of each unit's neighbors in :graph:.
+
+    :method: 'neighbors' (the default) patches one node at a time with the
+        most common value among its neighbors. 'propagate' runs batched label
+        propagation instead (see `propagate_labels`), optionally weighted by
+        the edge attribute :weight:.
+    """
+    patched = matching.copy()
+    for part in matching.columns:
+        if not matching[part].isna().any():
+            continue
+        if method == 'propagate':
+            patched[part] = propagate_labels(matching[part], graph, weight)
+            continue
+        elif method != 'neighbors':
+            raise ValueError('The parameter method must be "propagate" or "neighbors".')
+
+        units_to_parts = matching[part].to_dict()
+        # For values that are still NA, use the graph structure
+        # to infer a reasonable choice
+        for node in keys_with_na_values(units_to_parts):
+            units_to_parts[node] = patch_value_from_neighbors(
+                node, units_to_parts, graph)
+        patched[part] = pandas.Series(units_to_parts).infer_objects()
+    return patched
+
+
 def map_units_to_parts_via_blocks(blocks, graph, unit='VTD', part='CD'):
     """
     :blocks: dataframe of blocks with columns for :unit: and :part: assignments
     :graph: networkx adjacency graph with units as nodes
     """
-    grouped_by_unit = blocks.groupby(unit)
+    fips = graph.graph.get('state', '')
+    matching = match_units_to_parts(blocks, unit, [part], fips)
+    return patch_missing_values(matching, graph)[part].to_dict()
 
-    value_counts = {node: group[part].agg(most_common_values)
-                    for node, group in grouped_by_unit}
 
-    check_for_splits(value_counts, graph, unit, part)
+def load_blocks(fips, unit, parts, part_name='DISTRICT', download=False):
+    """
+    Returns the dataframe of the blocks of the state :fips:, indexed by block
+    id, with a column assigning each block to :unit: and one for each part.
+    """
+    resource = BlockAssignmentFile(fips)
+    units = [unit] + list(parts)
+    if download and not all(resource.exists(u) for u in units):
+        resource.download(units=units)
 
-    units_to_parts = {node: counts.idxmax()
-                      for node, counts in value_counts.items()}
+    blocks = resource.table(unit)
 
-    # For values that are still NA, use the graph structure
-    # to infer a reasonable choice
-    for node in keys_with_na_values(units_to_parts):
-        units_to_parts[node] = patch_value_from_neighbors(
-            node, units_to_parts, graph)
+    for part in parts:
+        blocks[part] = resource.table(part, [part_name])[part_name]
+    return blocks
 
-    return units_to_parts
 
+def add_matching_to_graph(fips, matching, graph, unit):
+    for part in matching.columns:
+        check_for_missing_values(fips, matching[part].to_dict())
 
-def match(graph, unit, part, part_name='DISTRICT'):
+    log.info(f"Adding assignment columns {list(matching.columns)} to the graph")
+
+    graph.add_columns_from_df(matching.rename_axis(unit).reset_index(),
+                              list(matching.columns), unit)
+
+
+def match(graph, unit, part, part_name='DISTRICT', method='neighbors', weight=None):
+    """
+    Adds to :graph: (a Graph with units as nodes) the part that each unit
+    belongs to. :part: can be one part column (like 'CD') or a list of them.
+
+    :method: how to fill in units with no assigned blocks (see
+        `patch_missing_values`)
+    :weight: (optional) with method='propagate', the edge attribute (like
+        'shared_perim') to weight the neighbors' votes by (see
+        `propagate_labels`).
+    """
     adjacency_graph = graph.graph
     fips = adjacency_graph.graph['state']
+    parts = [part] if isinstance(part, str) else list(part)
 
-    blocks_to_parts = BlockAssignmentFile(fips, download=True).as_df(unit=part)
-    blocks_to_parts = blocks_to_parts.set_index('BLOCKID')
-
-    blocks_to_units = BlockAssignmentFile(fips, download=True).as_df(unit=unit)
-    blocks_to_units = blocks_to_units.set_index('BLOCKID')
-    blocks_to_units[part] = blocks_to_parts[part_name]
+    blocks = load_blocks(fips, unit, parts, part_name, download=True)
 
     log.info(
         'Matching each unit to the most common part assignment '
         'of the blocks in the unit.')
 
-    units_to_parts = map_units_to_parts_via_blocks(
-        blocks_to_units, adjacency_graph, unit, part)
+    matching = patch_missing_values(
+        match_units_to_parts(blocks, unit, parts, fips), adjacency_graph,
+        method=method, weight=weight)
 
     log.info(
-        f"Created a matching of {unit}s to {part}s for the adjacency graph.")
-
-    check_for_missing_values(fips, units_to_parts)
-
-    log.info(f"Adding assignment column {part} to the graph")
+        f"Created a matching of {unit}s to {parts} for the adjacency graph.")
 
-    units_to_parts_df = pandas.DataFrame(
-        list(units_to_parts.items()), columns=[unit, part])
+    add_matching_to_graph(fips, matching, graph, unit)
 
-    graph.add_columns_from_df(units_to_parts_df, [part], unit)
 
+def match_fips(fips, unit, part, part_name='DISTRICT', method='neighbors', weight=None):
+    """
+    Matches the units of the state :fips: to the part :part: (or to each
+    of a list of parts), and adds the matching to both of the state's graphs.
+    See `match` for :method: and :weight:.
+    """
+    parts = [part] if isinstance(part, str) else list(part)
 
-def match_fips(fips, unit, part, part_name='DISTRICT'):
     log.info(f"Loading blocks for fips code {fips}")
+    blocks = load_blocks(fips, unit, parts, part_name)
 
-    blocks_to_parts = BlockAssignmentFile(fips).as_df(unit=part)
-    blocks_to_parts = blocks_to_parts.set_index('BLOCKID')
-
-    blocks_to_units = BlockAssignmentFile(fips).as_df(unit=unit)
-    blocks_to_units = blocks_to_units.set_index('BLOCKID')
-    blocks_to_units[part] = blocks_to_parts[part_name]
+    log.info(
+        'Matching each unit to the most common part assignment '
+        'of the blocks in the unit.')
+    matching = match_units_to_parts(blocks, unit, parts, fips)
 
     graphs = RookAndQueenGraphs.load_fips(fips)
 
     for adjacency in ('rook', 'queen'):
         graph = graphs.by_adjacency(adjacency)
-        log.info(
-            'Matching each unit to the most common part assignment'
-            'of the blocks in the unit.')
 
-        units_to_parts = map_units_to_parts_via_blocks(
-            blocks_to_units, graph.graph, unit, part)
+        patched = patch_missing_values(matching, graph.graph, method=method, weight=weight)
 
         log.info(
-            f"Created a matching of {unit}s to {part}s for the {adjacency}-adjacency graph.")
-
-        check_for_missing_values(fips, units_to_parts)
+            f"Created a matching of {unit}s to {parts} for the {adjacency}-adjacency graph.")
 
-        graph.add_columns_from_df(units_to_parts, [part], unit)
+        add_matching_to_graph(fips, patched, graph, unit)
 
     graphs.save()
 
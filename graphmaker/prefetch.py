@@ -0,0 +1,163 @@
+"""
+Prefetching of the Census archives that a pipeline will need, so that the
+downloads overlap with the work on the files that have already arrived.
+
+A `Prefetcher` is given the FIPS codes to run and the resources that each of
+them needs (like `BlockAssignmentFile` or `Tiger(2016).tract`). It works out
+every archive to download up front and downloads them in the background, in
+the order the pipeline will use them. Each stage calls `get` for the resource
+it needs next, which blocks only until that one archive is ready:
+
+    with Prefetcher(['21', '26'], [VTDShapefile, BlockAssignmentFile]) as prefetcher:
+        for fips in ['21', '26']:
+            shapefile = prefetcher.get(VTDShapefile, fips).path()
+            ...
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .constants import tiger_data_path
+from .download import Downloader
+from .resources import ResourceType, ZippedCensusResource
+from .utils import extract
+
+log = logging.getLogger(__name__)
+
+
+class Fetch:
+    """One archive to fetch into the resource store (and maybe extract) for
+    one FIPS code."""
+
+    def __init__(self, key, resource, url, vintage, target, done=False, unzip=False):
+        self.key = key
+        self.resource = resource
+        self.url = url
+        self.vintage = vintage
+        self.target = target
+        self.done = done
+        self.unzip = unzip
+
+
+def resource_name(spec):
+    """The name that :spec: (see `plan`) is known by in a `Prefetcher`."""
+    if isinstance(spec, ResourceType):
+        return f"Tiger{spec.tiger.year}.{spec.res_type}"
+    return spec.__name__
+
+
+def plan(fips_codes, resources, unzip=False, tiger_target=tiger_data_path):
+    """
+    Resolves every archive needed for running the FIPS codes :fips_codes: in
+    order, where each one needs every resource in :resources:. Returns the
+    list of `Fetch`es in the order that they will be needed.
+
+    :resources: a list of `ZippedCensusResource` subclasses (like
+        `BlockAssignmentFile`) and Tiger resource types (like
+        `Tiger(2016).tract`). A resource can also be given as a pair of the
+        resource and a dictionary of keyword arguments for its `url`, like
+        `(VTDShapefile, {'year': '2016'})`.
+    :unzip: (default False) whether to extract the archives of
+        `ZippedCensusResource`s, which can be read without extracting them.
+        Tiger resources are always extracted.
+    :tiger_target: the folder in which each FIPS code's Tiger files are kept
+        (in a subfolder named after the FIPS code)
+    """
+    fetches = []
+    for fips in fips_codes:
+        for spec in resources:
+            spec, kwargs = spec if isinstance(spec, tuple) else (spec, dict())
+            key = (resource_name(spec), fips)
+
+            if isinstance(spec, ResourceType):
+                resource = spec[fips]
+                fetches.append(Fetch(key, resource, resource.url, resource.vintage,
+                                     os.path.join(tiger_target, fips), unzip=True))
+            elif isinstance(spec, type) and issubclass(spec, ZippedCensusResource):
+                resource = spec(fips)
+                fetches.append(Fetch(key, resource, resource.url(**kwargs),
+                                     resource.vintage(**kwargs), resource.target_folder(),
+                                     done=resource.exists(**kwargs), unzip=unzip))
+            else:
+                raise TypeError(f"Cannot prefetch {spec!r}; expected a "
+                                "ZippedCensusResource subclass or a Tiger resource type.")
+    return fetches
+
+
+class Prefetcher:
+    """
+    Downloads the archives planned by `plan` in the background, :workers: at
+    a time, starting as soon as it is made. See `plan` for :fips_codes:,
+    :resources:, :unzip: and :tiger_target:.
+
+    :downloader: (optional) the `graphmaker.download.Downloader` to use
+    """
+
+    def __init__(self, fips_codes, resources, workers=4, downloader=None, unzip=False,
+                 tiger_target=tiger_data_path):
+        self.fetches = plan(fips_codes, resources, unzip, tiger_target)
+        self.downloader = downloader or Downloader(workers=workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='prefetch')
+
+        pending = [fetch for fetch in self.fetches if not fetch.done]
+        log.info(f"Prefetching {len(pending)} of the {len(self.fetches)} archives "
+                 "in the plan")
+        # The executor starts its jobs in the order they are submitted, which
+        # is the order the pipeline needs them in.
+        self.futures = {fetch.key: self.executor.submit(self.run, fetch)
+                        for fetch in self.fetches}
+
+    def run(self, fetch):
+        if not fetch.done:
+            archive = fetch.resource.store.fetch(fetch.url, fetch.vintage, self.downloader)
+            if fetch.unzip:
+                extract(archive, fetch.target)
+        return fetch.resource
+
+    def get(self, resource, fips):
+        """
+        Blocks until the archive of :resource: (as it was given to the
+        Prefetcher) for :fips: is ready, and returns the resource for that
+        FIPS code. Raises the error that stopped the download, if any.
+        """
+        return self.futures[(resource_name(resource), fips)].result()
+
+    def wait(self, fips):
+        """Blocks until every archive for :fips: is ready, raising the first
+        error that stopped one of them."""
+        for (name, key_fips), future in self.futures.items():
+            if key_fips == fips:
+                future.result()
+
+    def ready(self):
+        """
+        Yields (fips, error) for each FIPS code as soon as all of its archives
+        have been fetched, where error is the first exception that stopped one
+        of them (or None).
+        """
+        remaining, errors, by_future = dict(), dict(), dict()
+        for (name, fips), future in self.futures.items():
+            remaining[fips] = remaining.get(fips, 0) + 1
+            errors.setdefault(fips, None)
+            by_future[future] = fips
+
+        for future in as_completed(by_future):
+            fips = by_future[future]
+            if errors[fips] is None and future.exception() is not None:
+                errors[fips] = future.exception()
+            remaining[fips] -= 1
+            if remaining[fips] == 0:
+                yield fips, errors[fips]
+
+    def close(self):
+        """Cancels the downloads that have not started yet and waits for the
+        rest to finish."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.downloader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
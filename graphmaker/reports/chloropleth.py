@@ -9,7 +9,7 @@ import matplotlib.pyplot as plt  # noqa: E402
 
 def chloropleth(fips, column, filepath='./output.png'):
     df = VTDShapefile(fips).as_df()
-    df = reprojected(df)
+    df = reprojected(df, fips=fips)
 
     if isinstance(column, str):
         column_name = column
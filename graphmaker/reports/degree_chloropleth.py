@@ -23,7 +23,7 @@ def degree_chloropleth(fips, id_column='GEOID10'):
     queen = load_graph(queen_path)
 
     df = gp.read_file(get_shape_path(fips))
-    df = reprojected(df)
+    df = reprojected(df, fips=fips)
 
     rook_degrees = [degree(rook, df.iloc[i][id_column]) for i in df.index]
     queen_degrees = [degree(queen, df.iloc[i][id_column]) for i in df.index]
@@ -1,39 +1,58 @@
 import numpy
 from graphmaker.constants import fips_to_state_name
+from graphmaker.crosswalk import crosswalk
 from graphmaker.resources import BlockAssignmentFile, BlockPopulationShapefile
 
 
 def splitting_report_for_fips(fips, unit, part, function_for_splitting_energy=numpy.log):
-    df = load_matching_dataframe(fips, unit, part)
-    return splitting_report(df, unit, part, function_for_splitting_energy)
+    matrix, units = crosswalk_splitting_matrix(fips, unit, part)
+    return report_for_matrix(matrix, units, unit, part, function_for_splitting_energy)
 
 
 def splitting_report(df, unit, part, function_for_splitting_energy=numpy.log):
     matrix, indices = splitting_matrix(df, unit, part, 'population')
+    unit_indices = {u: i for (u, p), (i, j) in indices.items()}
+    units = sorted(unit_indices, key=unit_indices.get)
+    return report_for_matrix(matrix, units, unit, part, function_for_splitting_energy)
+
 
+def report_for_matrix(matrix, units, unit, part, function_for_splitting_energy=numpy.log):
+    """
+    :matrix: the (units x parts) matrix of population in each unit and part
+    :units: the unit ids labelling the rows of :matrix:
+    """
     information_distance = float(
         splitting_energy(matrix, function=function_for_splitting_energy))
 
     splitting_confidence_vector = splitting_confidence(
         matrix).flatten().tolist()
-    unit_indices = {u: i for (u, p), (i, j) in indices.items()}
-    confidences = {
-        u: splitting_confidence_vector[i] for u, i in unit_indices.items()}
+    confidences = dict(zip(units, splitting_confidence_vector))
 
     return {'unit': unit, 'partitioned_by': part,
             'splitting_energy': information_distance,
             'splitting_confidences': confidences}
 
 
+def crosswalk_splitting_matrix(fips, unit, part):
+    """
+    Computes the (units x parts) population matrix for the state :fips: as
+    one sparse product of the state's cached block crosswalks.
+    Returns the dense matrix and the unit ids labelling its rows.
+    """
+    units = crosswalk(fips, unit)
+    populations = BlockPopulationShapefile(fips).as_df(
+        columns=['POP10'], geometry=False)['POP10']
+    matrix = units.intersect(crosswalk(fips, part), weights=populations)
+    return matrix.toarray(), list(units.units)
+
+
 def load_matching_dataframe(fips, unit, part, part_name='DISTRICT'):
-    blocks_to_parts = BlockAssignmentFile(fips).as_df(part)
-    blocks_to_parts = blocks_to_parts.set_index('BLOCKID')
+    blocks_to_parts = BlockAssignmentFile(fips).table(part, [part_name])
 
-    blocks_to_units = BlockAssignmentFile(fips).as_df(unit)
-    blocks_to_units = blocks_to_units.set_index('BLOCKID')
+    blocks_to_units = BlockAssignmentFile(fips).table(unit)
     blocks_to_units[part] = blocks_to_parts[part_name]
 
-    block_pops = BlockPopulationShapefile(fips).as_df()
+    block_pops = BlockPopulationShapefile(fips).as_df(columns=['POP10'], geometry=False)
     blocks_to_units['population'] = block_pops['POP10']
 
     return blocks_to_units
@@ -48,7 +67,7 @@ def splitting_matrix(df, unit, part, weight_column):
 
     matrix = numpy.zeros((len(units), len(parts)))
 
-    grouped = df.groupby([unit, part])
+    grouped = df.groupby([unit, part], observed=True)
 
     for label, group in grouped:
         matrix[indices[label]] = numpy.sum(group[weight_column].values)
@@ -1,27 +1,93 @@
 import logging
 import os
 import pathlib
+import posixpath
+import urllib.parse
+import zipfile
 
 import geopandas as gp
 import pandas
 
+from .cache import tables
 from .constants import (block_assignment_path, block_population_path,
-                        fips_to_state_abbreviation, tiger_data_path,
-                        valid_fips_codes)
-from .utils import download_and_unzip, resolve_fips
+                        fips_to_state_abbreviation, resource_store_megabytes,
+                        resource_store_path, tiger_data_path, valid_fips_codes)
+from .store import Store
+from .utils import extract, read_attributes, resolve_fips
 
 log = logging.getLogger(__name__)
 
+# The downloaded archives of every resource (see graphmaker.store)
+store = Store(resource_store_path, resource_store_megabytes * 2**20 or None)
+
+
+def has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def zip_path(archive, member):
+    """The path of :member: inside the zip file :archive:, in the zip:// form
+    that geopandas (and GDAL) can read without extracting it."""
+    return f"zip://{os.path.abspath(archive)}!{member}"
+
+
+def split_zip_path(path):
+    """Returns the (archive, member) of a zip:// path, or (None, :path:) for
+    a plain path."""
+    if not path.startswith('zip://'):
+        return None, path
+    archive, member = path[len('zip://'):].split('!', 1)
+    return archive, member
+
+
+def local_file(path):
+    """The file on disk that holds :path: (the archive, for a zip:// path)."""
+    archive, member = split_zip_path(path)
+    return archive or member
+
+
+def open_file(path):
+    """Opens the file at :path: for reading bytes, streaming it out of its
+    archive if it is a zip:// path."""
+    archive, member = split_zip_path(path)
+    if archive is None:
+        return open(path, 'rb')
+    with zipfile.ZipFile(archive) as z:
+        # The member stream keeps its own handle on the archive
+        return z.open(member)
+
+
+def is_fresh(path, source_path):
+    """Whether the file at :path: exists and is at least as new as the file
+    at :source_path: that it was made from."""
+    return (os.path.exists(path) and
+            os.path.getmtime(path) >= os.path.getmtime(local_file(source_path)))
+
+
+def columnar_path(path):
+    """Where the Parquet copy of the data file at :path: is stored."""
+    return os.path.splitext(path)[0] + '.parquet'
+
 
 class Resource:
-    def __init__(self, url):
+    store = store
+
+    def __init__(self, url, vintage=None):
         self.url = url
+        self.vintage = vintage
 
-    def download(self, target=None):
+    def download(self, target=None, members=None, downloader=None):
+        """Fetches the archive into the resource store (unless it is already
+        there) and extracts it, or just the :members: given, into :target:."""
         if not target:
             raise ValueError(
                 'Please specific a target folder for your download.')
-        download_and_unzip(self.url, target)
+        archive = self.store.fetch(self.url, self.vintage, downloader)
+        extract(archive, target, members)
 
 
 class ResourceType:
@@ -32,7 +98,8 @@ class ResourceType:
 
     def _get(self, fips_or_state):
         fips = resolve_fips(fips_or_state)
-        return Resource(url=f"{self.url}tl_{self.tiger.year}_{fips}_{self.res_type.lower()}.zip")
+        return Resource(url=f"{self.url}tl_{self.tiger.year}_{fips}_{self.res_type.lower()}.zip",
+                        vintage=str(self.tiger.year))
 
     def __getattr__(self, *args, **kwargs):
         return self._get(*args, **kwargs)
@@ -52,17 +119,75 @@ class Tiger:
 
 class ZippedCensusResource:
     base_path = ''
+    store = store
 
     def __init__(self, fips, download=False):
         self.fips = fips
-        if download and not os.path.exists(self.path()):
+        if download and not self.exists():
             self.download()
 
-    def download(self, target=None, *args, **kwargs):
-        if target:
-            self._target = target
-            target = self.target_folder(*args, **kwargs)
-        download_and_unzip(self.url(*args, **kwargs), target)
+    def download(self, target=None, *args, downloader=None, members=None, unzip=True,
+                 **kwargs):
+        """
+        Fetches the resource's zip archive into the resource store (resuming a
+        partial download), unless it is already there, and extracts it into
+        :target: (the resource's target folder by default).
+
+        :downloader: (optional) the `graphmaker.download.Downloader` to use
+        :members: (optional) the members of the archive to extract (see
+            `graphmaker.utils.extract`)
+        :unzip: (default True) whether to extract the archive at all. The
+            resource can be read straight from the archive (see `in_archive`).
+        """
+        archive = self.store.fetch(self.url(*args, **kwargs), self.vintage(*args, **kwargs),
+                                   downloader)
+        if unzip:
+            extract(archive, target or self.target_folder(), members)
+
+    def exists(self, *args, **kwargs):
+        """Whether the resource's file is on disk, extracted or not."""
+        return os.path.exists(local_file(self.path(*args, **kwargs)))
+
+    def in_archive(self, path, *args, **kwargs):
+        """
+        Returns :path: if that file has been extracted, or else the zip:// path
+        of the same file inside the resource's downloaded archive, if there is
+        one. :args: and :kwargs: are passed on to `url`.
+        """
+        if os.path.exists(path):
+            return path
+        archive = self.archive_path(*args, **kwargs)
+        if archive is None:
+            return path
+        return zip_path(archive, os.path.basename(path))
+
+    def archive_path(self, *args, **kwargs):
+        """
+        The path of the resource's downloaded zip archive, after checking its
+        integrity (see `graphmaker.store.Store.path`), or None if it has not
+        been downloaded. An archive left in the target folder by an older
+        version of graphmaker is used if the store does not have one.
+        """
+        url = self.url(*args, **kwargs)
+        archive = self.store.path(url)
+        if archive is None:
+            name = posixpath.basename(urllib.parse.urlparse(url).path)
+            legacy = os.path.join(self.target_folder(), name)
+            archive = legacy if os.path.exists(legacy) else None
+        return archive
+
+    def vintage(self, *args, **kwargs):
+        """The release of the Census data, like '2010', recorded in the
+        resource store's manifest."""
+        return None
+
+    def columnar_path(self, path):
+        """Where the Parquet copy of :path: is stored: next to the file, or in
+        the target folder for a file read from an archive."""
+        archive, member = split_zip_path(path)
+        if archive is not None:
+            path = os.path.join(self.target_folder(), os.path.basename(member))
+        return columnar_path(path)
 
     def target_folder(self):
         return os.path.join(self.base_path, self.fips)
@@ -70,17 +195,50 @@ class ZippedCensusResource:
     def url(self):
         raise NotImplementedError('ZippedCensusResources must implement url')
 
-    @classmethod
-    def download_all(cls, iterable=valid_fips_codes(), **kwargs):
-        pathlib.Path(cls.base_path).mkdir(parents=True, exist_ok=True)
+    def cached_table(self, path, read, variant=None):
+        """Returns the table that :read: parses from the file at :path:,
+        shared with the rest of the process through `graphmaker.cache.tables`
+        and parsed again only when the file changes. :variant: tells apart
+        different reads of the same file (like projections onto columns)."""
+        key = (type(self).__name__, self.fips, path, variant)
+        return tables.get(key, os.path.getmtime(local_file(path)), read)
+
+    def evict(self):
+        """Drops this resource's parsed tables from the shared cache."""
+        tables.evict_prefix((type(self).__name__, self.fips))
 
-        for fips in iterable:
-            log.info(f"Downloading {cls.__name__} for {fips}")
-            try:
-                cls(fips).download(**kwargs)
-            except Exception:
-                log.error(
-                    f"An error occurred for FIPS code {fips}", exc_info=True)
+    @classmethod
+    def download_all(cls, iterable=valid_fips_codes(), workers=8, downloader=None,
+                     unzip=True, **kwargs):
+        """
+        Fetches the resource for every FIPS code in :iterable: into the resource
+        store, up to :workers: archives at a time, and extracts them. A failure for one FIPS
+        code is logged and does not stop the others.
+
+        :returns: a dictionary from FIPS codes to the exception that stopped
+            them, or None for the ones that succeeded
+        """
+        resources = [cls(fips) for fips in iterable]
+        log.info(f"Downloading {cls.__name__} for {len(resources)} FIPS codes")
+        errors = cls.store.fetch_all(
+            ((resource.url(**kwargs), resource.vintage(**kwargs)) for resource in resources),
+            workers, downloader)
+
+        results = dict()
+        for resource in resources:
+            error = errors[resource.url(**kwargs)]
+            if error is None and unzip:
+                try:
+                    pathlib.Path(resource.target_folder()).mkdir(parents=True, exist_ok=True)
+                    extract(resource.archive_path(**kwargs), resource.target_folder())
+                except Exception as extract_error:
+                    log.error(f"An error occurred for FIPS code {resource.fips}",
+                              exc_info=True)
+                    error = extract_error
+            elif error is not None:
+                log.error(f"An error occurred for FIPS code {resource.fips}: {error}")
+            results[resource.fips] = error
+        return results
 
 
 class CensusShapefileResource(ZippedCensusResource):
@@ -90,27 +248,77 @@ class CensusShapefileResource(ZippedCensusResource):
         raise NotImplementedError('CensusShapefileResources must specify their '
                                   'file_stem.')
 
-    def as_df(self):
-        return gp.read_file(self.path())
+    # The column that as_df indexes the table by, if any
+    id_column = None
+
+    def read(self, columns=None, geometry=True):
+        """
+        Reads the shapefile, or its Parquet copy if that is up to date. The
+        Parquet copy is written the first time the whole shapefile is read.
+
+        :columns: (optional) the attribute columns to read
+        :geometry: if False, only the attribute table is read, without
+            building any geometries
+        """
+        path = self.path()
+        if columns is not None and self.id_column is not None:
+            columns = [self.id_column] + [column for column in columns
+                                          if column != self.id_column]
+
+        if is_fresh(self.columnar_path(path), path):
+            if geometry:
+                df = gp.read_parquet(self.columnar_path(path), columns=None if columns is None
+                                     else columns + ['geometry'])
+            else:
+                df = pandas.read_parquet(self.columnar_path(path), columns=columns)
+                df = df.drop(columns='geometry', errors='ignore')
+        elif not geometry:
+            df = read_attributes(path, columns)
+        else:
+            df = gp.read_file(path, include_fields=columns)
+            if columns is None and has_pyarrow():
+                log.info(f"Converting {path} to Parquet")
+                out = self.columnar_path(path)
+                # The target folder is missing when the archive was never extracted
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+                df.to_parquet(out)
+
+        if self.id_column is not None:
+            df = df.set_index(self.id_column)
+        return df
+
+    def as_df(self, columns=None, geometry=True):
+        """
+        Returns the shapefile's table, shared with the rest of the process
+        (see `cached_table`).
+
+        :columns: (optional) the attribute columns to read
+        :geometry: (default True) whether to read the geometries. With
+            geometry=False, this is a plain DataFrame of the attributes.
+        """
+        variant = (None if columns is None else tuple(columns), geometry)
+        return self.cached_table(self.path(), lambda: self.read(columns, geometry),
+                                 variant)
 
     def path(self):
-        return os.path.join(self.target_folder(), self.file_stem() + '.shp')
+        return self.in_archive(os.path.join(self.target_folder(), self.file_stem() + '.shp'))
 
     def url(self):
         return self.base_url + self.file_stem() + '.zip'
 
+    def vintage(self):
+        return '2010'
+
 
 class BlockPopulationShapefile(CensusShapefileResource):
     base_path = block_population_path
     base_url = "http://www2.census.gov/geo/tiger/TIGER2010BLKPOPHU/"
 
+    id_column = 'BLOCKID10'
+
     def file_stem(self):
         return 'tabblock2010_' + self.fips + '_pophu'
 
-    def as_df(self):
-        df = super().as_df()
-        return df.set_index('BLOCKID10')
-
 
 class VTDShapefile(CensusShapefileResource):
     base_path = tiger_data_path
@@ -119,9 +327,12 @@ class VTDShapefile(CensusShapefileResource):
         base = "https://www2.census.gov/geo/tiger/TIGER"
         return base + year + "/VTD/tl_" + year + "_" + self.fips + "_vtd10.zip"
 
+    def vintage(self, year='2012'):
+        return year
+
     def path(self, year='2012'):
         shapefile_name = "tl_" + year + "_" + self.fips + "_vtd10.shp"
-        return os.path.join(self.target_folder(), shapefile_name)
+        return self.in_archive(os.path.join(self.target_folder(), shapefile_name), year)
 
 
 class CensusTractShapefile(CensusShapefileResource):
@@ -131,28 +342,85 @@ class CensusTractShapefile(CensusShapefileResource):
         base = "https://www2.census.gov/geo/tiger/TIGER"
         return base + year + "/VTD/tl_" + year + "_" + self.fips + "_tract10.zip"
 
+    def vintage(self, year='2012'):
+        return year
+
     def path(self, year='2012'):
         shapefile_name = "tl_" + year + "_" + self.fips + "_tract10.shp"
-        return os.path.join(self.target_folder(), shapefile_name)
+        return self.in_archive(os.path.join(self.target_folder(), shapefile_name), year)
 
 
 class BlockAssignmentFile(ZippedCensusResource):
-    _base_path = block_assignment_path
+    base_path = block_assignment_path
 
     def url(self):
         abbrev = fips_to_state_abbreviation[self.fips]
         return "http://www2.census.gov/geo/docs/maps-data/data/baf/" \
             f"BlockAssign_ST{self.fips}_{abbrev}.zip"
 
+    def vintage(self):
+        return '2010'
+
+    def download(self, target=None, units=None, **kwargs):
+        """Downloads the block assignment files, extracting only the ones for
+        :units: (like ['VTD', 'CD']) if they are given."""
+        if units is not None:
+            kwargs['members'] = [os.path.basename(self.path(unit)) for unit in units]
+        super().download(target, **kwargs)
+
     def path(self, unit='VTD'):
         """The units are all-caps: 'VTD' or 'CD'"""
         fips = self.fips
         abbrev = fips_to_state_abbreviation[fips]
-        return os.path.join(self.base_path, fips,
-                            f"BlockAssign_ST{fips}_{abbrev}_{unit}.txt")
+        return self.in_archive(os.path.join(self.base_path, fips,
+                                            f"BlockAssign_ST{fips}_{abbrev}_{unit}.txt"))
+
+    def crosswalk_path(self, unit='VTD', column='VTD'):
+        """Where the cached block-to-unit crosswalk matrix is stored
+        (see `graphmaker.crosswalk`)."""
+        return os.path.join(self.target_folder(), f"crosswalk_{unit}_{column}.npz")
 
-    def as_df(self, unit='VTD'):
-        df = pandas.read_csv(self.path(unit), dtype=str)
+    def read_text(self, unit='VTD'):
+        with open_file(self.path(unit)) as f:
+            df = pandas.read_csv(f, dtype=str)
         if unit == 'VTD':
             df['VTD'] = self.fips + df['COUNTYFP'] + df['DISTRICT']
+        return df.set_index('BLOCKID')
+
+    def convert(self, unit='VTD'):
+        """
+        Converts the block assignment file for :unit: to Parquet, once, with
+        the assignment columns (and the VTD keys) stored as categoricals.
+        Later reads load the Parquet copy instead of parsing the text.
+        """
+        df = self.read_text(unit).astype('category')
+        out = self.columnar_path(self.path(unit))
+        # The target folder is missing when the archive was never extracted
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        df.to_parquet(out)
         return df
+
+    def read(self, unit='VTD', columns=None):
+        path = self.path(unit)
+        if is_fresh(self.columnar_path(path), path):
+            return pandas.read_parquet(self.columnar_path(path), columns=columns)
+
+        if has_pyarrow():
+            log.info(f"Converting {path} to Parquet")
+            df = self.convert(unit)
+        else:
+            df = self.read_text(unit)
+        return df if columns is None else df[list(columns)]
+
+    def table(self, unit='VTD', columns=None):
+        """The block assignments for :unit:, indexed by 'BLOCKID', with just
+        :columns: if they are given. The parsed table is shared with the rest
+        of the process (see `cached_table`).
+
+        The assignment columns are categoricals when they come from the
+        Parquet copy (see `convert`)."""
+        return self.cached_table(self.path(unit), lambda: self.read(unit, columns),
+                                 None if columns is None else tuple(columns))
+
+    def as_df(self, unit='VTD', columns=None):
+        return self.table(unit, columns).reset_index()
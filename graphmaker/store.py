@@ -0,0 +1,302 @@
+"""
+A content-addressed store for downloaded Census archives.
+
+Each archive is kept once under `objects/`, named by the SHA-256 of its
+contents. The manifest (`manifest.json`) records, for every source URL, the
+digest and size of its archive, its vintage (like the Tiger year), when it was
+fetched and when it was last used. An archive is checked against the manifest
+whenever it is opened, so a truncated or corrupted file is downloaded again
+instead of being reused, and the least recently used archives are evicted
+once the store is larger than its disk budget.
+"""
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import posixpath
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from .download import Downloader, sha256
+
+log = logging.getLogger(__name__)
+
+
+def extension(url):
+    return posixpath.splitext(urllib.parse.urlparse(url).path)[1]
+
+
+class Store:
+    """
+    The archives stored in the folder :root:.
+
+    :max_bytes: (optional) the disk budget. After each download, the least
+        recently used archives are deleted until the store fits in it.
+    :touch_interval: how many seconds to let pass before recording another
+        use of the same archive in the manifest
+    """
+
+    def __init__(self, root, max_bytes=None, touch_interval=60):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.lock = threading.RLock()
+        self.fetching = dict()
+        self._entries = None
+        self._mtime = None
+        self._changed = set()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, 'manifest.json')
+
+    def read_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return dict()
+        except ValueError:
+            log.warning(f"The manifest {self.manifest_path} is corrupt; starting a new one.")
+            return dict()
+
+    def manifest_mtime(self):
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def entries(self):
+        """The manifest, as a dictionary from URLs to their entries."""
+        with self.lock:
+            if self._entries is None:
+                self.refresh(force=True)
+            return self._entries
+
+    def merged(self):
+        """The manifest saved by every process, with this store's unsaved
+        changes applied to it."""
+        entries = self.read_manifest()
+        for url in self._changed:
+            if url in self._entries:
+                entries[url] = self._entries[url]
+            else:
+                entries.pop(url, None)
+        return entries
+
+    def refresh(self, force=False):
+        """
+        Reads the manifest again if another process (like the `Prefetcher`
+        of a batch run, whose workers share the store) has saved it since it
+        was read, or always if :force:. Unsaved changes are kept.
+        """
+        with self.lock:
+            # The mtime is read first, so a save that races the read is seen next time
+            mtime = self.manifest_mtime()
+            if not force and self._entries is not None and mtime == self._mtime:
+                return
+            self._entries = self.merged() if self._entries is not None else self.read_manifest()
+            self._mtime = mtime
+
+    def save(self):
+        """
+        Writes the manifest, merging in the changes that other processes have
+        saved since it was read. The new manifest replaces the old one
+        atomically, so a reader never sees half of it.
+        """
+        with self.lock:
+            self.entries()
+            entries = self.merged()
+            self._entries, self._changed = entries, set()
+
+            pathlib.Path(self.root).mkdir(parents=True, exist_ok=True)
+            partial = f"{self.manifest_path}.{os.getpid()}.{threading.get_ident()}"
+            with open(partial, 'w') as f:
+                json.dump(entries, f, indent=2, sort_keys=True)
+            os.replace(partial, self.manifest_path)
+            self._mtime = self.manifest_mtime()
+
+    def object_path(self, digest, url):
+        """Where the archive with the SHA-256 :digest: is kept."""
+        return os.path.join(self.root, 'objects', digest[:2], digest + extension(url))
+
+    def intact(self, path, entry):
+        """
+        Whether the file at :path: is the archive described by :entry:. The
+        size is always checked; the digest is computed again only when the
+        file has been modified since it was last checked.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime != entry['mtime']:
+            if sha256(path) != entry['sha256']:
+                return False
+            entry['mtime'] = stat.st_mtime
+        return True
+
+    def path(self, url, verify=True):
+        """
+        Returns the path of the stored archive downloaded from :url:, or None
+        if it is not in the store. An archive that fails its integrity check
+        (see `intact`) is removed, and None is returned. The manifest is read
+        again if it has changed, or if :url: is not in it.
+        """
+        with self.lock:
+            self.refresh()
+            entry = self.entries().get(url)
+            if entry is None:
+                self.refresh(force=True)
+                entry = self.entries().get(url)
+            if entry is None:
+                return None
+            path = self.object_path(entry['sha256'], url)
+            checked = entry['mtime']
+            if verify and not self.intact(path, entry):
+                log.warning(f"The stored archive for {url} is damaged; removing it.")
+                self.remove(url)
+                self.save()
+                return None
+
+            now = time.time()
+            if now - entry['last_access'] >= self.touch_interval or entry['mtime'] != checked:
+                entry['last_access'] = now
+                self._changed.add(url)
+                self.save()
+            return path
+
+    def __contains__(self, url):
+        return self.path(url) is not None
+
+    def fetch(self, url, vintage=None, downloader=None):
+        """
+        Returns the path of the archive downloaded from :url:, downloading it
+        into the store first if it is not already there (or is damaged).
+
+        :vintage: (optional) the vintage to record for the archive, like the
+            year of a Tiger release
+        :downloader: (optional) the `graphmaker.download.Downloader` to use
+        """
+        with self.lock:
+            url_lock = self.fetching.setdefault(url, threading.Lock())
+
+        with url_lock:
+            path = self.path(url)
+            if path is not None:
+                return path
+
+            downloader = downloader or Downloader(workers=1)
+            # A partial download is resumed from here (see Downloader.fetch)
+            name = hashlib.sha1(url.encode()).hexdigest() + extension(url)
+            staged = downloader.fetch(url, os.path.join(self.root, 'downloads', name))
+            digest, size = sha256(staged), os.path.getsize(staged)
+
+            path = self.object_path(digest, url)
+            pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+            if os.path.exists(path) and sha256(path) == digest:
+                os.remove(staged)
+            else:
+                os.replace(staged, path)
+
+            now = time.time()
+            with self.lock:
+                self.entries()[url] = {'sha256': digest, 'size': size, 'vintage': vintage,
+                                       'fetched': now, 'last_access': now,
+                                       'mtime': os.stat(path).st_mtime}
+                self._changed.add(url)
+                self.evict(keep={digest})
+                self.save()
+            return path
+
+    def fetch_all(self, jobs, workers=8, downloader=None):
+        """
+        Fetches every (url, vintage) in :jobs: concurrently. Returns a
+        dictionary from each URL to the exception that stopped its download,
+        or None if it succeeded.
+        """
+        downloader = downloader or Downloader(workers=workers)
+
+        def run(job):
+            try:
+                self.fetch(*job, downloader=downloader)
+            except Exception as error:
+                log.error(f"Could not download {job[0]}", exc_info=True)
+                return error
+
+        jobs = list(jobs)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            errors = list(executor.map(run, jobs))
+        return {job[0]: error for job, error in zip(jobs, errors)}
+
+    def remove(self, url):
+        """Drops :url: from the manifest, and deletes its archive unless
+        another URL has the same contents."""
+        with self.lock:
+            entry = self.entries().pop(url, None)
+            self._changed.add(url)
+            if entry is None:
+                return
+            if not any(other['sha256'] == entry['sha256']
+                       for other in self.entries().values()):
+                try:
+                    os.remove(self.object_path(entry['sha256'], url))
+                except FileNotFoundError:
+                    pass
+
+    def size(self):
+        """The number of bytes used by the stored archives."""
+        sizes = {entry['sha256']: entry['size'] for entry in self.entries().values()}
+        return sum(sizes.values())
+
+    def evict(self, max_bytes=None, keep=()):
+        """
+        Removes the least recently used archives until the store uses at most
+        :max_bytes: (the store's budget by default), except for the archives
+        whose digests are in :keep:. Returns the URLs that were removed.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        if max_bytes is None:
+            return []
+
+        with self.lock:
+            # Archives shared by several URLs count as used when any of them was
+            last_access = dict()
+            for entry in self.entries().values():
+                digest = entry['sha256']
+                last_access[digest] = max(last_access.get(digest, 0), entry['last_access'])
+
+            removed, total = [], self.size()
+            for digest in sorted(last_access, key=last_access.get):
+                if total <= max_bytes:
+                    break
+                if digest in keep:
+                    continue
+                urls = [url for url, entry in self.entries().items()
+                        if entry['sha256'] == digest]
+                total -= self.entries()[urls[0]]['size']
+                for url in urls:
+                    log.info(f"Evicting the stored archive for {url}")
+                    self.remove(url)
+                removed.extend(urls)
+            return removed
+
+    def verify(self):
+        """Checks the digest of every stored archive, removing the damaged
+        ones. Returns the URLs that were removed."""
+        with self.lock:
+            damaged = []
+            for url, entry in list(self.entries().items()):
+                path = self.object_path(entry['sha256'], url)
+                if not os.path.exists(path) or sha256(path) != entry['sha256']:
+                    log.warning(f"The stored archive for {url} is damaged; removing it.")
+                    self.remove(url)
+                    damaged.append(url)
+            if damaged:
+                self.save()
+            return damaged
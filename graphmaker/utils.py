@@ -1,11 +1,14 @@
-import io
 import logging
+import os
+import posixpath
+import tempfile
 import uuid
 import zipfile
 
-import requests
+import geopandas
 
 from graphmaker.constants import state_name_to_fips, state_abbrevation_to_fips
+from graphmaker.download import Downloader
 
 log = logging.getLogger(__name__)
 
@@ -19,10 +22,51 @@ def resolve_fips(state):
         return state
 
 
-def download_and_unzip(url, target):
-    response = requests.get(url)
-    z = zipfile.ZipFile(io.BytesIO(response.content))
-    z.extractall(target)
+def download_and_unzip(url, target, members=None, downloader=None):
+    """
+    Downloads the zip file at :url: to a temporary file, in chunks, and
+    extracts it into the folder :target:.
+
+    :members: (optional) the members to extract (see `extract`)
+    :downloader: (optional) the `graphmaker.download.Downloader` to use
+    """
+    downloader = downloader or Downloader(workers=1)
+    with tempfile.TemporaryDirectory() as folder:
+        archive = downloader.fetch(url, os.path.join(folder, 'download.zip'))
+        extract(archive, target, members)
+
+
+def selected_members(names, members=None):
+    """The names in :names: picked out by :members: (see `extract`)."""
+    if members is None:
+        return list(names)
+    if callable(members):
+        return [name for name in names if members(name)]
+    members = set(members)
+    return [name for name in names
+            if name in members or posixpath.basename(name) in members]
+
+
+def extract(archive, target, members=None):
+    """
+    Extracts the zip file at :archive: into the folder :target:.
+
+    :members: (optional) which members to extract: either a list of names
+        (with or without their folders in the archive), or a function that
+        takes a member's name and returns whether to extract it
+    """
+    with zipfile.ZipFile(archive) as z:
+        z.extractall(target, selected_members(z.namelist(), members))
+
+
+def read_attributes(path, columns=None):
+    """
+    Reads the attribute table of the shapefile at :path: as a DataFrame,
+    without building its geometries.
+
+    :columns: (optional) the attribute columns to read
+    """
+    return geopandas.read_file(path, ignore_geometry=True, include_fields=columns)
 
 
 def infer_id_column(dataframe, patterns=None, id_column=None):
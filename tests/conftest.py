@@ -0,0 +1,12 @@
+import pytest
+from graphmaker.resources import Resource, ZippedCensusResource
+from graphmaker.store import Store
+
+
+@pytest.fixture(autouse=True)
+def resource_store(tmpdir_factory, monkeypatch):
+    """Keeps the archives downloaded by tests out of the real resource store."""
+    store = Store(str(tmpdir_factory.mktemp('store')))
+    monkeypatch.setattr(Resource, 'store', store)
+    monkeypatch.setattr(ZippedCensusResource, 'store', store)
+    return store
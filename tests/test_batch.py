@@ -0,0 +1,29 @@
+import json
+
+from graphmaker.batch import run_for_every_state
+
+
+def fails_for_alaska(fips):
+    if fips == '02':
+        raise ValueError('No VTDs here')
+
+
+def test_run_for_every_state_isolates_failures(tmpdir):
+    summary_path = str(tmpdir.join('summary.json'))
+
+    summary = run_for_every_state(fails_for_alaska, ['01', '02', '04'],
+                                  workers=2, summary_path=summary_path)
+
+    assert set(summary) == {'01', '02', '04'}
+    assert summary['01']['succeeded'] and summary['04']['succeeded']
+    assert not summary['02']['succeeded']
+    assert 'No VTDs here' in summary['02']['error']
+    assert all(result['seconds'] >= 0 for result in summary.values())
+
+    with open(summary_path) as f:
+        assert json.load(f) == summary
+
+
+def test_run_for_every_state_in_process():
+    summary = run_for_every_state(fails_for_alaska, ['02', '04'], workers=1)
+    assert [summary[fips]['succeeded'] for fips in ('02', '04')] == [False, True]
@@ -0,0 +1,101 @@
+import numpy
+import pandas
+from graphmaker.cache import TableCache, table_size, tables
+from graphmaker.crosswalk import Crosswalk, crosswalk
+from graphmaker.resources import BlockAssignmentFile
+
+
+def table(n=10):
+    return pandas.DataFrame({'a': range(n)})
+
+
+def test_cache_loads_each_version_once():
+    cache = TableCache(max_bytes=10**6)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return table()
+
+    cache.get('key', 1, load)
+    cache.get('key', 1, load)
+    assert len(loads) == 1
+
+    cache.get('key', 2, load)
+    assert len(loads) == 2
+    assert len(cache) == 1
+
+
+def test_cache_evicts_least_recently_used_tables_over_budget():
+    cache = TableCache(max_bytes=2 * table_size(table()))
+
+    cache.get('a', 1, table)
+    cache.get('b', 1, table)
+    cache.get('a', 1, table)
+    cache.get('c', 1, table)
+
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+    assert cache.size <= cache.max_bytes
+
+
+def test_cache_explicit_eviction():
+    cache = TableCache(max_bytes=10**6)
+    cache.get(('BlockAssignmentFile', '26', 'x'), 1, table)
+    cache.get(('BlockAssignmentFile', '26', 'y'), 1, table)
+    cache.get(('BlockAssignmentFile', '27', 'x'), 1, table)
+
+    cache.evict_prefix(('BlockAssignmentFile', '26'))
+
+    assert len(cache) == 1
+    cache.evict(('BlockAssignmentFile', '27', 'x'))
+    assert len(cache) == 0 and cache.size == 0
+
+
+def test_adding_columns_does_not_change_the_cached_table():
+    cache = TableCache(max_bytes=10**6)
+    df = cache.get('key', 1, table)
+    df['b'] = 1
+
+    assert 'b' not in cache.get('key', 1, table).columns
+
+
+def test_block_assignment_tables_are_shared(tmpdir, monkeypatch):
+    monkeypatch.setattr(BlockAssignmentFile, 'base_path', str(tmpdir))
+    tmpdir.mkdir('26').join('BlockAssign_ST26_MI_VTD.txt').write(
+        'BLOCKID,COUNTYFP,DISTRICT\n260010001001000,001,000010\n')
+    reads = []
+    read = BlockAssignmentFile.read
+    monkeypatch.setattr(BlockAssignmentFile, 'read',
+                        lambda self, *args: reads.append(args) or read(self, *args))
+
+    first = BlockAssignmentFile('26').table('VTD')
+    BlockAssignmentFile('26').table('VTD')
+
+    assert len(reads) == 1
+    assert first.index.name == 'BLOCKID'
+    assert list(first['VTD']) == ['26001000010']
+    assert list(BlockAssignmentFile('26').as_df('VTD').columns) == [
+        'BLOCKID', 'COUNTYFP', 'DISTRICT', 'VTD']
+    BlockAssignmentFile('26').evict()
+
+
+def test_crosswalks_are_kept_in_the_shared_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(BlockAssignmentFile, 'base_path', str(tmpdir))
+    tmpdir.mkdir('26').join('BlockAssign_ST26_MI_VTD.txt').write(
+        'BLOCKID,COUNTYFP,DISTRICT\n260010001001000,001,000010\n')
+    builds = []
+    from_assignment = Crosswalk.from_assignment.__func__
+    monkeypatch.setattr(Crosswalk, 'from_assignment', classmethod(
+        lambda cls, *args: builds.append(args) or from_assignment(cls, *args)))
+
+    first = crosswalk('26', 'VTD')
+    second = crosswalk('26', 'VTD')
+
+    assert len(builds) == 1
+    assert ('Crosswalk', '26', 'VTD', 'VTD') in tables
+    assert numpy.shares_memory(second.matrix.data, first.matrix.data)
+    assert list(second.units) == ['26001000010']
+    assert table_size(first) == first.nbytes > 0
+    tables.evict_prefix(('Crosswalk', '26'))
+    BlockAssignmentFile('26').evict()
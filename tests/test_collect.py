@@ -0,0 +1,83 @@
+import multiprocessing
+import subprocess
+import sys
+
+import pandas
+import pytest
+from graphmaker.collect import collector
+
+
+def test_collector_writes_the_delimited_log(tmpdir):
+    path = str(tmpdir.join('splits.csv'))
+    collect = collector('test_log', ['node', 'percent'], path,
+                        format_types={'percent': '.2f'})
+
+    collect(node='a', percent=0.5)
+    collect(node='b', percent=1)
+    collect.flush()
+
+    lines = open(path).read().splitlines()
+    assert lines[0] == 'asctime|node|percent'
+    assert [line.split('|')[1:] for line in lines[1:]] == [['a', '0.50'], ['b', '1.00']]
+
+
+def test_collector_writes_in_batches(tmpdir):
+    path = str(tmpdir.join('rows.csv'))
+    collect = collector('test_csv', ['node'], path, backend='csv', batch_size=2)
+    writes = []
+    write = collect.writer.write
+    collect.writer.write = lambda rows: writes.append(len(rows)) or write(rows)
+
+    for node in range(5):
+        collect(node=node)
+    collect.close()
+
+    assert sum(writes) == 5 and max(writes) <= 2
+    assert list(pandas.read_csv(path)['node']) == [0, 1, 2, 3, 4]
+
+
+def test_collector_writes_parquet_chunks(tmpdir):
+    pytest.importorskip('pyarrow')
+    path = str(tmpdir.join('rows'))
+    collect = collector('test_parquet', ['node'], path, backend='parquet')
+
+    collect(node='a')
+    collect.flush()
+    collect(node='b')
+    collect.flush()
+
+    assert list(pandas.read_parquet(path)['node']) == ['a', 'b']
+
+
+def test_collector_flushes_at_exit(tmpdir):
+    path = str(tmpdir.join('exit.csv'))
+    script = ("from graphmaker.collect import collector\n"
+              f"collect = collector('test_exit', ['node'], {path!r}, flush_interval=60)\n"
+              "collect(node='a')\n")
+
+    subprocess.run([sys.executable, '-c', script], check=True)
+
+    assert open(path).read().splitlines()[1].endswith('|a')
+
+
+def collect_in_child(path):
+    collect = collector('test_child', ['node'], path)
+    collect(node='b')
+    collect.close()
+
+
+def test_collectors_in_spawned_workers_append_to_the_log(tmpdir):
+    path = str(tmpdir.join('shared.csv'))
+    collect = collector('test_parent', ['node'], path)
+    collect(node='a')
+    collect.flush()
+
+    context = multiprocessing.get_context('spawn')
+    for _ in range(2):
+        child = context.Process(target=collect_in_child, args=(path,))
+        child.start()
+        child.join()
+
+    lines = open(path).read().splitlines()
+    assert lines[0] == 'asctime|node'
+    assert [line.split('|')[1] for line in lines[1:]] == ['a', 'b', 'b']
@@ -0,0 +1,59 @@
+import numpy
+import pandas
+from graphmaker.crosswalk import Crosswalk, stored_source_mtime
+
+
+def blocks():
+    return pandas.DataFrame({'BLOCKID': ['b1', 'b2', 'b3', 'b4', 'b5'],
+                             'VTD': ['v1', 'v1', 'v2', 'v2', numpy.nan],
+                             'CD': ['1', '1', '1', '2', '2']})
+
+
+def test_aggregate_sums_blocks_over_units():
+    crosswalk = Crosswalk.from_df(blocks(), 'VTD')
+    data = pandas.DataFrame({'POP10': [1, 2, 3, 4, 5]},
+                            index=['b1', 'b2', 'b3', 'b4', 'b5'])
+
+    totals = crosswalk.aggregate(data)
+
+    assert totals['POP10'].to_dict() == {'v1': 3, 'v2': 7}
+    assert totals['POP10'].dtype == numpy.int64
+
+
+def test_aggregate_treats_missing_blocks_as_zero():
+    crosswalk = Crosswalk.from_df(blocks(), 'VTD')
+    data = pandas.Series([1.5, 2.0], index=['b4', 'b1'])
+
+    assert crosswalk.aggregate(data).to_dict() == {'v1': 2.0, 'v2': 1.5}
+
+
+def test_intersect_weights_blocks_in_both_units():
+    vtds = Crosswalk.from_df(blocks(), 'VTD')
+    districts = Crosswalk.from_df(blocks(), 'CD')
+    populations = pandas.Series([1, 2, 3, 4, 5], index=vtds.blocks)
+
+    assert numpy.array_equal(vtds.intersect(districts).toarray(),
+                             [[2, 0], [1, 1]])
+    assert numpy.array_equal(vtds.intersect(districts, weights=populations).toarray(),
+                             [[3, 0], [3, 4]])
+
+
+def test_intersect_aligns_different_block_orders():
+    vtds = Crosswalk.from_df(blocks(), 'VTD')
+    districts = Crosswalk.from_df(blocks().iloc[::-1], 'CD')
+
+    assert numpy.array_equal(vtds.intersect(districts).toarray(),
+                             [[2, 0], [1, 1]])
+
+
+def test_save_and_load_round_trip(tmpdir):
+    crosswalk = Crosswalk.from_df(blocks(), 'VTD')
+    path = str(tmpdir.join('crosswalk.npz'))
+
+    crosswalk.save(path, source_mtime=12.5)
+    loaded = Crosswalk.load(path)
+
+    assert stored_source_mtime(path) == 12.5
+    assert list(loaded.blocks) == list(crosswalk.blocks)
+    assert list(loaded.units) == list(crosswalk.units)
+    assert (loaded.matrix != crosswalk.matrix).nnz == 0
@@ -0,0 +1,196 @@
+import hashlib
+import http.server
+import io
+import threading
+import zipfile
+
+import pytest
+from graphmaker.download import ChecksumError, Downloader
+from graphmaker.resources import BlockAssignmentFile
+from graphmaker.utils import download_and_unzip
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Serves the bytes in `files`, with support for Range requests. Each
+    path in `failures` fails that many times first, with a 503 or (for
+    'drop') by closing the connection halfway through the body."""
+
+    files = dict()
+    failures = dict()
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get('Range')))
+        if self.path not in self.files:
+            self.send_error(404)
+            return
+        body = self.files[self.path]
+
+        failure = self.failures.get(self.path)
+        if failure and failure[1] > 0:
+            failure[1] -= 1
+            if failure[0] == 503:
+                self.send_error(503)
+                return
+
+        start = 0
+        if self.headers.get('Range'):
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(body)}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.end_headers()
+
+        if failure and failure[0] == 'drop' and failure[1] >= 0 and start == 0:
+            failure[1] = -1
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.files, Handler.failures, Handler.requests = dict(), dict(), []
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_downloads_and_checks_the_checksum(server, tmpdir):
+    Handler.files['/a.zip'] = b'x' * 1000
+    path = str(tmpdir.join('a.zip'))
+
+    Downloader().fetch(server + '/a.zip', path,
+                       checksum=hashlib.sha256(b'x' * 1000).hexdigest())
+
+    assert open(path, 'rb').read() == b'x' * 1000
+
+
+def test_fetch_rejects_a_bad_checksum(server, tmpdir):
+    Handler.files['/a.zip'] = b'x' * 1000
+    path = tmpdir.join('a.zip')
+
+    with pytest.raises(ChecksumError):
+        Downloader().fetch(server + '/a.zip', str(path), checksum='0' * 64)
+    assert not path.exists()
+
+
+def test_fetch_retries_server_errors(server, tmpdir):
+    Handler.files['/a.zip'] = b'abc'
+    Handler.failures['/a.zip'] = [503, 2]
+    path = str(tmpdir.join('a.zip'))
+
+    Downloader(backoff=0).fetch(server + '/a.zip', path)
+
+    assert open(path, 'rb').read() == b'abc'
+    assert len(Handler.requests) == 3
+
+
+def test_fetch_resumes_dropped_downloads(server, tmpdir):
+    body = bytes(range(256)) * 40
+    Handler.files['/a.zip'] = body
+    Handler.failures['/a.zip'] = ['drop', 1]
+    path = str(tmpdir.join('a.zip'))
+
+    Downloader(backoff=0, chunk_size=1024).fetch(server + '/a.zip', path)
+
+    assert open(path, 'rb').read() == body
+    assert Handler.requests[-1][1] == f"bytes={len(body) // 2}-"
+
+
+def test_fetch_resumes_partial_files(server, tmpdir):
+    Handler.files['/a.zip'] = b'0123456789'
+    tmpdir.join('a.zip.part').write_binary(b'01234')
+
+    Downloader().fetch(server + '/a.zip', str(tmpdir.join('a.zip')))
+
+    assert tmpdir.join('a.zip').read_binary() == b'0123456789'
+    assert Handler.requests == [('/a.zip', 'bytes=5-')]
+
+
+def test_fetch_finishes_partial_files_that_are_already_complete(server, tmpdir):
+    Handler.files['/a.zip'] = b'0123456789'
+    tmpdir.join('a.zip.part').write_binary(b'0123456789')
+
+    Downloader().fetch(server + '/a.zip', str(tmpdir.join('a.zip')))
+
+    assert tmpdir.join('a.zip').read_binary() == b'0123456789'
+    assert Handler.requests == [('/a.zip', 'bytes=10-')]
+
+
+def test_fetch_restarts_partial_files_longer_than_the_file(server, tmpdir):
+    Handler.files['/a.zip'] = b'0123456789'
+    tmpdir.join('a.zip.part').write_binary(b'an older and longer version')
+
+    Downloader(retries=0).fetch(server + '/a.zip', str(tmpdir.join('a.zip')))
+
+    assert tmpdir.join('a.zip').read_binary() == b'0123456789'
+    assert Handler.requests == [('/a.zip', 'bytes=27-'), ('/a.zip', None)]
+
+
+def test_fetch_all_reports_each_failure(server, tmpdir):
+    Handler.files['/a.zip'] = b'a'
+    jobs = [(server + '/a.zip', str(tmpdir.join('a.zip'))),
+            (server + '/missing.zip', str(tmpdir.join('missing.zip')))]
+
+    errors = Downloader(workers=2, retries=0).fetch_all(jobs)
+
+    assert errors[str(tmpdir.join('a.zip'))] is None
+    assert errors[str(tmpdir.join('missing.zip'))] is not None
+
+
+def zipped(name, text):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        z.writestr(name, text)
+    return buffer.getvalue()
+
+
+def test_download_all_fetches_and_extracts_every_state(server, tmpdir, monkeypatch):
+    monkeypatch.setattr(BlockAssignmentFile, 'base_path', str(tmpdir))
+    monkeypatch.setattr(BlockAssignmentFile, 'url',
+                        lambda self: f"{server}/BlockAssign_ST{self.fips}.zip")
+    Handler.files['/BlockAssign_ST26.zip'] = zipped('26.txt', 'BLOCKID\n')
+    Handler.files['/BlockAssign_ST27.zip'] = zipped('27.txt', 'BLOCKID\n')
+
+    results = BlockAssignmentFile.download_all(['26', '27', '28'], workers=3,
+                                               downloader=Downloader(retries=0))
+
+    assert results['26'] is None and results['27'] is None
+    assert results['28'] is not None
+    assert tmpdir.join('26', '26.txt').exists()
+    assert tmpdir.join('27', '27.txt').exists()
+
+
+def test_download_and_unzip_extracts_only_the_selected_members(server, tmpdir):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        for name in ['BlockAssign_ST26_MI_VTD.txt', 'BlockAssign_ST26_MI_CD.txt',
+                     'BlockAssign_ST26_MI_AIANNH.txt']:
+            z.writestr(name, 'BLOCKID\n')
+    Handler.files['/baf.zip'] = buffer.getvalue()
+
+    download_and_unzip(server + '/baf.zip', str(tmpdir.mkdir('list')),
+                       members=['BlockAssign_ST26_MI_VTD.txt'])
+    download_and_unzip(server + '/baf.zip', str(tmpdir.mkdir('function')),
+                       members=lambda name: name.endswith('_CD.txt'))
+
+    assert [path.basename for path in tmpdir.join('list').listdir()] == [
+        'BlockAssign_ST26_MI_VTD.txt']
+    assert [path.basename for path in tmpdir.join('function').listdir()] == [
+        'BlockAssign_ST26_MI_CD.txt']
@@ -1,5 +1,8 @@
+from unittest.mock import patch
+
 import geopandas
-from graphmaker.geospatial import identify_utm_zone, reprojected, utm_of_point
+from graphmaker.geospatial import (ProjectionContext, identify_utm_zone, reprojected,
+                                   utm_crs, utm_of_point, utm_zones_of_points)
 from shapely.geometry import Point
 
 
@@ -29,3 +32,74 @@ def test_reprojected():
 def test_utm_of_point():
     point = example_point()
     assert utm_of_point(point) == 17
+
+
+def test_utm_zones_of_points_agrees_with_utm_of_point():
+    points = geopandas.GeoSeries([example_point(), Point(-122.4, 37.8),
+                                  Point(5.3, 60.4), Point(15.6, 78.2)])
+    zones = utm_zones_of_points(points)
+    assert zones.tolist() == [utm_of_point(point) for point in points]
+
+
+def test_projection_context_projects_each_frame_once():
+    data = [{'name': 'example point', 'geometry': example_point()}]
+    df = geopandas.GeoDataFrame(data, crs="+init=epsg:4326")
+    context = ProjectionContext()
+
+    with patch.object(geopandas.GeoDataFrame, 'to_crs', autospec=True,
+                      side_effect=geopandas.GeoDataFrame.to_crs) as to_crs:
+        projected = context.reprojected(df)
+        again = context.reprojected(df)
+
+    # once to longitude/latitude for the zone, and once to the zone
+    assert to_crs.call_count == 2
+    assert again.geometry.equals(projected.geometry)
+    assert context.reprojected(projected) is projected
+    assert context.reprojected(projected.set_index('name')).crs == projected.crs
+    assert context.utm_zone(df) == 17
+
+
+def test_frames_in_another_zone_are_reprojected():
+    context = ProjectionContext()
+    michigan = geopandas.GeoDataFrame([{'geometry': example_point()}], crs="epsg:4326")
+    context.reprojected(michigan)
+    california = geopandas.GeoDataFrame([{'geometry': Point(-122.4, 37.8)}],
+                                        crs="epsg:4326").to_crs(utm_crs(17))
+
+    assert context.reprojected(california).crs == utm_crs(10)
+
+
+def test_reprojected_does_not_cache_between_calls():
+    df = geopandas.GeoDataFrame([{'geometry': example_point()}], crs="epsg:4326")
+    reprojected(df)
+    df['POP'] = [10]
+
+    assert reprojected(df).loc[0, 'POP'] == 10
+
+
+def test_projection_context_hands_out_copies():
+    data = [{'name': 'example point', 'geometry': example_point()}]
+    df = geopandas.GeoDataFrame(data, crs="epsg:4326")
+    context = ProjectionContext()
+
+    context.reprojected(df)['name'] = 'changed'
+
+    assert context.reprojected(df).loc[0, 'name'] == 'example point'
+
+
+def test_lonlat_converts_other_geographic_crs_to_wgs84():
+    data = [{'name': 'example point', 'geometry': example_point()}]
+    df = geopandas.GeoDataFrame(data, crs="epsg:4269")
+
+    assert ProjectionContext().lonlat(df).crs == "epsg:4326"
+
+
+def test_projection_context_remembers_zones_by_fips():
+    data = [{'name': 'example point', 'geometry': example_point()}]
+    df = geopandas.GeoDataFrame(data, crs="+init=epsg:4326")
+    context = ProjectionContext()
+
+    assert context.utm_zone(df, fips='26') == 17
+    other = geopandas.GeoDataFrame([{'geometry': Point(-122.4, 37.8)}],
+                                   crs="+init=epsg:4326")
+    assert context.utm_zone(other, fips='26') == 17
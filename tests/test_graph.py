@@ -1,3 +1,148 @@
+import geopandas
+import networkx
+import numpy
+import pandas
+from graphmaker.graph import Graph, RookAndQueenGraphs
+from graphmaker.graph.binary import memory_mapped_arrays, save_binary
+from shapely.geometry import box
+
 
 class TestGraph:
     pass
+
+
+def lonlat_grid(rows=3, columns=3):
+    # Small squares in Michigan, labelled by GEOID
+    size = 0.01
+    data = [{'GEOID': f"{i}{j}", 'STATEFP': '26',
+             'geometry': box(-84 + j * size, 42 + i * size,
+                             -84 + (j + 1) * size, 42 + (i + 1) * size)}
+            for i in range(rows) for j in range(columns)]
+    return geopandas.GeoDataFrame(data, crs="+init=epsg:4326")
+
+
+def test_rook_and_queen_graphs_from_df_in_one_pass():
+    graphs = RookAndQueenGraphs.from_df(lonlat_grid(), id_column='GEOID')
+    rook, queen = graphs.rook.graph, graphs.queen.graph
+
+    assert graphs.fips == '26'
+    assert set(rook.nodes) == set(queen.nodes)
+    assert rook.number_of_edges() == 12
+    assert queen.number_of_edges() == 20
+    assert set(rook.edges) <= set(queen.edges)
+    assert all(data['shared_perim'] > 0 for _, _, data in rook.edges(data=True))
+    assert rook.nodes['11'] == queen.nodes['11']
+    assert not rook.nodes['11']['boundary_node']
+    assert rook.nodes['00']['boundary_node']
+
+
+def example_graph():
+    graph = networkx.Graph([('a', 'b', {'shared_perim': 1.5}),
+                            ('b', 'c', {'shared_perim': 0.0})])
+    graph.graph['state'] = '26'
+    graph.nodes['a'].update({'boundary_node': True, 'boundary_perim': 2.0,
+                             'POP10': 10, 'NAME': 'A'})
+    graph.nodes['b'].update({'boundary_node': False, 'POP10': 20, 'NAME': 'B'})
+    graph.nodes['c'].update({'boundary_node': True, 'boundary_perim': 3.0,
+                             'POP10': 30, 'NAME': 'C', 'CD': [1, 2]})
+    graph.add_node('d')
+    return graph
+
+
+def test_binary_format_round_trip(tmpdir):
+    path = str(tmpdir.join('graph.npz'))
+    graph = example_graph()
+
+    Graph(graph).save(path)
+    loaded = Graph.load(path).graph
+
+    assert loaded.graph == graph.graph
+    assert dict(loaded.nodes(data=True)) == dict(graph.nodes(data=True))
+    assert networkx.utils.edges_equal(loaded.edges(data=True), graph.edges(data=True))
+    assert isinstance(loaded.nodes['a']['POP10'], int)
+
+
+def test_binary_arrays_are_memory_mapped(tmpdir):
+    path = str(tmpdir.join('graph.npz'))
+    save_binary(example_graph(), path)
+
+    arrays = memory_mapped_arrays(path)
+
+    assert isinstance(arrays['indices'], numpy.memmap)
+    assert arrays['indptr'].tolist() == [0, 1, 3, 4, 4]
+
+
+def test_binary_graphs_stay_in_their_arrays_until_needed(tmpdir):
+    path = str(tmpdir.join('graph.npz'))
+    save_binary(example_graph(), path)
+
+    graph = Graph.load(path)
+    graph.add_columns_from_df(pandas.DataFrame({'GEOID': ['a', 'b'], 'VAP': [1, 2]}),
+                              ['VAP'], 'GEOID')
+    selected = graph.select(['POP10', 'boundary_perim', 'VAP', 'missing'])
+
+    assert graph._graph is None
+    assert isinstance(graph.binary.indices, numpy.memmap)
+    assert graph.metadata['state'] == '26'
+    assert selected['POP10'].tolist()[:3] == [10, 20, 30]
+    assert pandas.isna(selected.loc['d', 'POP10'])
+    assert selected.loc['a', 'boundary_perim'] == 2.0
+    assert pandas.isna(selected.loc['b', 'boundary_perim'])
+    assert selected.loc['b', 'VAP'] == 2
+    assert selected['missing'].isna().all()
+
+    assert graph.graph.nodes['a'] == {'boundary_node': True, 'boundary_perim': 2.0,
+                                      'POP10': 10, 'NAME': 'A', 'VAP': 1}
+
+
+def test_load_detects_json(tmpdir):
+    path = str(tmpdir.join('graph.json'))
+    Graph(example_graph()).save(path)
+    assert Graph.load(path).graph.nodes['c']['CD'] == [1, 2]
+
+
+def test_paths_can_point_at_binary_files():
+    assert RookAndQueenGraphs.path('26', 'rook', 'binary').endswith('rook.npz')
+    assert RookAndQueenGraphs.path('26', 'queen').endswith('queen.json')
+
+
+def test_add_columns_from_df_is_visible_through_the_networkx_view():
+    graph = Graph(example_graph())
+    table = pandas.DataFrame({'GEOID': ['a', 'b', 'c', 'z'],
+                              'VAP': [1, 2, 3, 4], 'CD': ['01', '02', '02', '03']})
+
+    graph.add_columns_from_df(table, ['VAP', 'CD'], 'GEOID')
+
+    nodes = graph.graph.nodes
+    assert [nodes[node]['VAP'] for node in 'abc'] == [1, 2, 3]
+    assert isinstance(nodes['a']['VAP'], int)
+    assert nodes['c']['CD'] == '02'
+    assert 'VAP' not in nodes['d']
+
+
+def test_columns_follow_nodes_added_and_removed_later():
+    graph = Graph(example_graph())
+    graph.add_columns_from_df(pandas.DataFrame({'GEOID': ['a', 'b'], 'VAP': [1, 2]}),
+                              ['VAP'], 'GEOID')
+    graph.graph.add_node('z')
+    graph.graph.remove_node('d')
+
+    table = pandas.DataFrame({'GEOID': ['a', 'z'], 'CD': ['01', '03']})
+    graph.add_columns_from_df(table, ['CD'], 'GEOID')
+
+    nodes = graph.graph.nodes
+    assert nodes['z']['CD'] == '03' and nodes['a']['CD'] == '01'
+    assert isinstance(nodes['b']['VAP'], int) and 'VAP' not in nodes['z']
+    assert list(graph.select(['VAP']).index) == ['a', 'b', 'c', 'z']
+
+
+def test_select_returns_columns_in_node_order():
+    graph = Graph(example_graph())
+    table = pandas.DataFrame({'GEOID': ['c', 'a'], 'VAP': [3, 1]})
+    graph.add_columns_from_df(table, ['VAP'], 'GEOID')
+
+    selected = graph.select(['VAP', 'POP10'])
+
+    assert list(selected.index) == ['a', 'b', 'c', 'd']
+    assert selected.loc['a', 'VAP'] == 1 and selected.loc['c', 'POP10'] == 30
+    assert pandas.isna(selected.loc['b', 'VAP'])
@@ -0,0 +1,37 @@
+import numpy
+import pandas
+from graphmaker.integrate import aggregate, integrate_over_blocks_in_units
+
+
+def blocks():
+    return pandas.DataFrame({'VTD': ['1', '1', '2', '2', '3'],
+                             'CD': ['a', 'a', 'a', 'b', 'b'],
+                             'POP': [1, 2, 3, 4, 5],
+                             'VAP': [0.5, 1.5, None, 2.0, 1.0]},
+                            index=['w', 'x', 'y', 'z', 'q'])
+
+
+def test_aggregate_sums_every_column_for_every_unit():
+    totals = aggregate(blocks(), ['POP', 'VAP'], ['VTD', 'CD'])
+
+    assert totals['VTD']['POP'].to_dict() == {'1': 3, '2': 7, '3': 5}
+    assert totals['VTD']['VAP'].to_dict() == {'1': 2.0, '2': 2.0, '3': 1.0}
+    assert totals['CD']['POP'].to_dict() == {'a': 6, 'b': 9}
+    assert totals['CD']['POP'].dtype == numpy.int64
+
+
+def test_aggregate_agrees_with_groupby_for_custom_reducers():
+    df = blocks()
+    result = aggregate(df, ['POP', 'VAP'], 'CD', function=numpy.max)
+    expected = df.groupby('CD')[['POP', 'VAP']].aggregate(numpy.max)
+    pandas.testing.assert_frame_equal(result, expected)
+
+
+def test_integrate_over_blocks_in_units_does_not_mutate_blocks():
+    df = blocks()
+    series = pandas.Series({'w': 10, 'x': 20, 'y': 30, 'z': 40, 'q': 50})
+
+    totals = integrate_over_blocks_in_units(df, series, 'VTD')
+
+    assert totals.to_dict() == {'1': 30, '2': 70, '3': 50}
+    assert 'data' not in df.columns
@@ -0,0 +1,68 @@
+import geopandas
+import networkx
+import numpy
+import pytest
+from graphmaker.graph import Graph
+from graphmaker.interpolate import area_weights, interpolate
+from shapely.geometry import box
+
+
+def squares(boxes, crs='EPSG:26916'):
+    return geopandas.GeoDataFrame(geometry=[box(*b) for b in boxes], crs=crs)
+
+
+def sources():
+    # Two 2x1 precincts side by side
+    df = squares([(0, 0, 2, 1), (2, 0, 4, 1)])
+    df['votes'] = [10, 20]
+    df['turnout'] = [4, 0]
+    return df
+
+
+def targets():
+    # Three units: [0, 1], [1, 3] and [3, 4]
+    df = squares([(0, 0, 1, 1), (1, 0, 3, 1), (3, 0, 4, 1)])
+    df['GEOID'] = ['a', 'b', 'c']
+    return df
+
+
+def test_area_weights_are_fractions_of_source_areas():
+    weights = area_weights(sources(), targets().set_index('GEOID'))
+
+    assert numpy.allclose(weights.matrix.toarray(), [[0.5, 0.5, 0], [0, 0.5, 0.5]])
+
+
+def test_interpolate_splits_counts_by_area():
+    result = interpolate(sources(), targets(), ['votes', 'turnout'], id_column='GEOID')
+
+    assert result['votes'].to_dict() == pytest.approx({'a': 5, 'b': 15, 'c': 10})
+    assert result['turnout'].sum() == pytest.approx(4)
+
+
+def test_interpolate_reuses_cached_weights(tmpdir, monkeypatch):
+    path = str(tmpdir.join('weights.npz'))
+    interpolate(sources(), targets(), ['votes'], 'GEOID', weights_path=path)
+
+    monkeypatch.setattr('graphmaker.interpolate.area_weights', None)
+    result = interpolate(sources(), targets(), ['votes'], 'GEOID', weights_path=path)
+
+    assert result.loc['b', 'votes'] == pytest.approx(15)
+
+
+def test_cached_weights_are_recomputed_for_new_polygons_with_the_same_ids(tmpdir):
+    path = str(tmpdir.join('weights.npz'))
+    interpolate(sources(), targets(), ['votes'], 'GEOID', weights_path=path)
+
+    redrawn = sources()
+    redrawn.geometry = [box(0, 0, 1, 1), box(1, 0, 4, 1)]
+    result = interpolate(redrawn, targets(), ['votes'], 'GEOID', weights_path=path)
+
+    assert result['votes'].to_dict() == pytest.approx({'a': 10, 'b': 40 / 3, 'c': 20 / 3})
+
+
+def test_interpolated_columns_attach_to_graph():
+    graph = Graph(networkx.Graph([('a', 'b'), ('b', 'c')]))
+
+    graph.add_columns_from_interpolation(sources(), targets(), ['votes'], 'GEOID')
+
+    assert graph.graph.nodes['c']['votes'] == pytest.approx(10)
@@ -0,0 +1,164 @@
+from unittest.mock import patch
+
+import geopandas
+import networkx
+import pandas
+import pytest
+from graphmaker.graph.make_graph import (add_boundary_perimeters,
+                                         add_data_to_graph,
+                                         construct_graph_from_df,
+                                         graph_from_edges,
+                                         neighbors_with_shared_perimeters,
+                                         positional_pairs,
+                                         shared_perimeter_edges)
+from shapely.geometry import box
+
+
+def grid(rows=3, columns=3):
+    # Unit squares labelled by (row, column) in "r-c" form
+    data = [{'ID': f"{i}-{j}", 'geometry': box(j, i, j + 1, i + 1)}
+            for i in range(rows) for j in range(columns)]
+    return geopandas.GeoDataFrame(data).set_index('ID')
+
+
+def test_shared_perimeters_match_pairwise_intersections():
+    df = grid()
+    neighbors = {'0-0': ['0-1', '1-0', '1-1'],
+                 '0-1': ['0-0'], '1-0': ['0-0'], '1-1': ['0-0']}
+
+    result = neighbors_with_shared_perimeters(neighbors, df)
+
+    for shape in neighbors:
+        for neighbor in neighbors[shape]:
+            expected = df.loc[shape, 'geometry'].intersection(
+                df.loc[neighbor, 'geometry']).length
+            assert result[shape][neighbor]['shared_perim'] == expected
+
+
+def test_shared_perimeter_edges_computes_each_edge_once():
+    df = grid()
+    left, right, lengths = shared_perimeter_edges(df)
+
+    pairs = set(zip(left, right))
+    assert all(i < j for i, j in pairs)
+    assert len(pairs) == len(left)
+    # 12 rook edges with length 1 and 8 diagonal point contacts
+    assert sorted(lengths.tolist()) == [0.0] * 8 + [1.0] * 12
+
+
+def test_positional_pairs_raise_on_neighbors_missing_from_the_index():
+    index = pandas.Index(['a', 'b', 'c'])
+
+    left, right = positional_pairs({'a': ['b'], 'b': ['a', 'c']}, index)
+    assert list(zip(left, right)) == [(0, 1), (1, 2)]
+
+    with pytest.raises(KeyError, match="'q'"):
+        positional_pairs({'a': ['b', 'q'], 'b': ['a']}, index)
+
+
+def test_boundary_perimeters_from_edges_agree_with_union():
+    df = grid(4, 4)
+    # remove a unit in the middle to make an interior hole
+    df = df.drop('1-1')
+    left, right, lengths = shared_perimeter_edges(df)
+
+    by_topology = graph_from_edges(df.index, left, right, lengths)
+    by_union = graph_from_edges(df.index, left, right, lengths)
+    add_boundary_perimeters(by_topology, df.index, df, method='topology')
+    add_boundary_perimeters(by_union, df.index, df, method='union')
+
+    for node in df.index:
+        topology = by_topology.nodes[node].get('boundary_perim', 0)
+        union = by_union.nodes[node].get('boundary_perim', 0)
+        assert abs(topology - union) < 1e-9
+        assert by_topology.nodes[node]['boundary_node'] == (union > 0)
+    # '2-2' only touches the hole at a corner
+    assert not by_topology.nodes['2-2']['boundary_node']
+    assert by_topology.nodes['1-2']['boundary_perim'] == 1
+
+
+def lonlat_grid():
+    data = [{'GEOID': f"{i}{j}", 'geometry': box(-84 + j * 0.01, 42 + i * 0.01,
+                                                 -84 + (j + 1) * 0.01, 42 + (i + 1) * 0.01)}
+            for i in range(3) for j in range(3)]
+    return geopandas.GeoDataFrame(data, crs="epsg:4326")
+
+
+def test_graph_construction_projects_the_frame_once():
+    df = lonlat_grid()
+
+    with patch.object(geopandas.GeoDataFrame, 'to_crs', autospec=True,
+                      side_effect=geopandas.GeoDataFrame.to_crs) as to_crs:
+        graph = construct_graph_from_df(df, 'rook', geoid_col='GEOID',
+                                        adjacency_engine='sindex')
+
+    assert to_crs.call_count == 1
+    assert 9e5 < graph.nodes['00']['area'] < 9.5e5
+
+
+def test_graphs_see_columns_added_to_the_frame_between_builds():
+    df = lonlat_grid()
+    construct_graph_from_df(df, 'rook', geoid_col='GEOID', adjacency_engine='sindex')
+    df['POP'] = range(9)
+
+    graph = construct_graph_from_df(df, 'rook', geoid_col='GEOID', cols_to_add=['POP'],
+                                    adjacency_engine='sindex')
+
+    assert graph.nodes['22']['POP'] == 8
+
+
+def test_boundary_perimeters_use_the_union_by_default():
+    df = grid(4, 4).drop('1-1')
+    edges = shared_perimeter_edges(df)
+
+    by_default = graph_from_edges(df.index, *edges)
+    by_union = graph_from_edges(df.index, *edges)
+    add_boundary_perimeters(by_default, df.index, df)
+    add_boundary_perimeters(by_union, df.index, df, method='union')
+
+    assert dict(by_default.nodes(data=True)) == dict(by_union.nodes(data=True))
+    # Unlike with method='topology', a corner contact makes a boundary node
+    assert by_default.nodes['2-2']['boundary_node']
+
+
+def example_graph():
+    return networkx.Graph([('a', 'b'), ('b', 'c')])
+
+
+def test_add_data_to_graph_adds_every_column():
+    graph = example_graph()
+    df = pandas.DataFrame({'ID': ['a', 'b', 'c'], 'POP': [1, 2, 3],
+                           'NAME': ['x', 'y', 'z']})
+
+    report = add_data_to_graph(df, graph, ['POP', 'NAME'], id_col='ID')
+
+    assert dict(graph.nodes(data=True)) == {'a': {'POP': 1, 'NAME': 'x'},
+                                            'b': {'POP': 2, 'NAME': 'y'},
+                                            'c': {'POP': 3, 'NAME': 'z'}}
+    assert report == {'ids_not_in_graph': [], 'nodes_without_data': []}
+
+
+def test_add_data_to_graph_raises_before_writing_unmatched_ids():
+    graph = example_graph()
+    df = pandas.DataFrame({'ID': ['a', 'q'], 'POP': [1, 2]})
+
+    with pytest.raises(KeyError):
+        add_data_to_graph(df, graph, ['POP'], id_col='ID')
+    assert 'POP' not in graph.nodes['a']
+
+
+def test_add_data_to_graph_can_report_unmatched_ids():
+    graph = example_graph()
+    df = pandas.DataFrame({'ID': ['a', 'q'], 'POP': [1, 2]})
+
+    report = add_data_to_graph(df, graph, ['POP'], id_col='ID', unmatched='report')
+
+    assert graph.nodes['a']['POP'] == 1 and 'POP' not in graph.nodes['b']
+    assert report == {'ids_not_in_graph': ['q'], 'nodes_without_data': ['b', 'c']}
+
+
+def test_add_data_to_graph_uses_positions_without_id_column():
+    graph = networkx.path_graph(3)
+    df = pandas.DataFrame({'POP': [5, 6, 7]}, index=['x', 'y', 'z'])
+    add_data_to_graph(df, graph, ['POP'])
+    assert [graph.nodes[i]['POP'] for i in range(3)] == [5, 6, 7]
@@ -2,7 +2,8 @@ from unittest.mock import MagicMock, patch
 
 import networkx
 import pandas
-from graphmaker.match import map_units_to_parts_via_blocks
+from graphmaker.match import (map_units_to_parts_via_blocks, match_units_to_parts,
+                              patch_missing_values, propagate_labels)
 
 
 def imperfect_matching():
@@ -65,4 +66,70 @@ def test_match_na_nodes_using_their_neighbors():
 
     assert matching[1] == 2
 
+
+@patch('graphmaker.match.collect')
+def test_match_many_parts_at_once(mock_collect):
+    blocks = imperfect_matching()
+    blocks['house'] = ['a', 'b', 'b', None, None]
+
+    matching = match_units_to_parts(blocks, 'unit', ['district', 'house'])
+
+    assert matching['district'].to_dict() == {'1': 1, '2': 2}
+    assert matching.loc['1', 'house'] == 'b'
+    assert pandas.isna(matching.loc['2', 'house'])
+    assert mock_collect.call_count == 2
+
+
+@patch('graphmaker.match.collect')
+def test_match_breaks_ties_by_first_block(mock_collect):
+    blocks = pandas.DataFrame(data={'unit': ['1', '1', '1', '1'],
+                                    'district': ['b', 'a', 'a', 'b']})
+
+    matching = match_units_to_parts(blocks, 'unit', 'district')
+
+    assert matching.loc['1', 'district'] == 'b'
+    assert mock_collect.call_args[1]['percent_match'] == 0.5
+
+
+def test_propagation_fills_chains_of_missing_values():
+    series = pandas.Series({1: 'a', 2: None, 3: None, 4: None, 5: 'b'})
+    graph = networkx.path_graph([1, 2, 3, 4, 5])
+
+    filled = propagate_labels(series, graph)
+
+    # 3 is reached by both labels in the same round; ties go to the smallest
+    assert filled.to_dict() == {1: 'a', 2: 'a', 3: 'a', 4: 'b', 5: 'b'}
+
+
+def test_propagation_ignores_neighbors_that_are_still_missing():
+    series = pandas.Series({1: 'a', 2: None, 3: None, 4: None})
+    graph = networkx.Graph([(1, 2), (2, 3), (2, 4), (3, 4)])
+
+    filled = propagate_labels(series, graph)
+
+    assert set(filled.values) == {'a'}
+
+
+def test_propagation_can_weight_votes_by_shared_perimeter():
+    series = pandas.Series({1: 'a', 2: 'b', 3: 'b', 4: None})
+    graph = networkx.Graph()
+    graph.add_edge(1, 4, shared_perim=10)
+    graph.add_edge(2, 4, shared_perim=1)
+    graph.add_edge(3, 4, shared_perim=1)
+
+    assert propagate_labels(series, graph)[4] == 'b'
+    assert propagate_labels(series, graph, weight='shared_perim')[4] == 'a'
+
+
+def test_patching_fills_from_neighbors_unless_propagation_is_asked_for():
+    matching = pandas.DataFrame({'CD': ['a', 'b', 'b', None]}, index=[1, 2, 3, 4])
+    graph = networkx.Graph()
+    graph.add_edge(1, 4, shared_perim=10)
+    graph.add_edge(2, 4, shared_perim=1)
+    graph.add_edge(3, 4, shared_perim=1)
+
+    assert patch_missing_values(matching, graph).loc[4, 'CD'] == 'b'
+    assert patch_missing_values(matching, graph, method='propagate',
+                                weight='shared_perim').loc[4, 'CD'] == 'a'
+
 # TODO: Cool graph generator-based tests
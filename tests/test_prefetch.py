@@ -0,0 +1,108 @@
+import pytest
+from graphmaker.batch import run_for_every_state
+from graphmaker.download import Downloader
+from graphmaker.prefetch import Prefetcher, plan
+from graphmaker.resources import BlockAssignmentFile, Tiger, VTDShapefile
+from graphmaker.store import Store
+
+from .test_download import Handler, server, zipped  # noqa: F401
+
+BLOCKS = 'BLOCKID,COUNTYFP,DISTRICT\n260010001001000,001,000010\n'
+
+
+@pytest.fixture
+def block_assignments(server, tmpdir, monkeypatch):  # noqa: F811
+    monkeypatch.setattr(BlockAssignmentFile, 'base_path', str(tmpdir))
+    monkeypatch.setattr(BlockAssignmentFile, 'url',
+                        lambda self: f"{server}/BlockAssign_ST{self.fips}.zip")
+    for fips, abbrev in [('26', 'MI'), ('27', 'MN')]:
+        Handler.files[f"/BlockAssign_ST{fips}.zip"] = zipped(
+            f"BlockAssign_ST{fips}_{abbrev}_VTD.txt", BLOCKS)
+    return tmpdir
+
+
+def count_blocks(fips):
+    assert len(BlockAssignmentFile(fips).table('VTD')) == 1
+
+
+def test_plan_resolves_every_archive_in_pipeline_order(tmpdir):
+    tract = Tiger(2016).tract
+
+    fetches = plan(['26', '27'], [(VTDShapefile, {'year': '2016'}), tract],
+                   tiger_target=str(tmpdir))
+
+    assert [fetch.key for fetch in fetches] == [
+        ('VTDShapefile', '26'), ('Tiger2016.tract', '26'),
+        ('VTDShapefile', '27'), ('Tiger2016.tract', '27')]
+    assert fetches[0].url.endswith('TIGER2016/VTD/tl_2016_26_vtd10.zip')
+    assert fetches[1].target == str(tmpdir.join('26'))
+    assert [fetch.vintage for fetch in fetches[:2]] == ['2016', '2016']
+    assert fetches[1].unzip and not fetches[0].unzip
+
+
+def test_plan_rejects_unknown_resources():
+    with pytest.raises(TypeError):
+        plan(['26'], [object])
+
+
+def test_stages_get_their_resources_as_they_arrive(block_assignments):
+    with Prefetcher(['26', '27'], [BlockAssignmentFile],
+                    downloader=Downloader(retries=0)) as prefetcher:
+        resource = prefetcher.get(BlockAssignmentFile, '27')
+        ready = dict(prefetcher.ready())
+
+    assert resource.path('VTD').startswith('zip://')
+    assert list(resource.as_df('VTD')['BLOCKID']) == ['260010001001000']
+    assert ready == {'26': None, '27': None}
+
+
+def test_failed_downloads_are_raised_by_get(block_assignments):
+    with Prefetcher(['26', '28'], [BlockAssignmentFile],
+                    downloader=Downloader(retries=0)) as prefetcher:
+        prefetcher.wait('26')
+        with pytest.raises(Exception):
+            prefetcher.get(BlockAssignmentFile, '28')
+
+
+def test_states_are_not_run_when_their_downloads_fail(block_assignments):
+    summary = run_for_every_state(count_blocks, ['26', '28', '27'], workers=1,
+                                  resources=[BlockAssignmentFile])
+
+    assert summary['26']['succeeded'] and summary['27']['succeeded']
+    assert not summary['28']['succeeded']
+    assert '404' in summary['28']['error']
+
+
+# The store of each worker process, which is kept across the states it runs
+worker_stores = dict()
+
+
+class CountBlocksInWorker:
+    """Like `count_blocks`, for spawned workers, which do not see the test's
+    monkeypatching: the resource is pointed at the test's store and server."""
+
+    def __init__(self, store_root, base_path, base_url):
+        self.store_root = store_root
+        self.base_path = base_path
+        self.base_url = base_url
+
+    def __call__(self, fips):
+        resource = BlockAssignmentFile(fips)
+        resource.store = worker_stores.setdefault(self.store_root, Store(self.store_root))
+        resource.base_path = self.base_path
+        resource.url = lambda: f"{self.base_url}/BlockAssign_ST{fips}.zip"
+        assert len(resource.table('VTD')) == 1
+
+
+def test_states_run_in_spawned_workers_while_prefetching(
+        block_assignments, server, resource_store):  # noqa: F811
+    # Michigan's worker reads the manifest before Minnesota's archive is stored
+    Handler.failures['/BlockAssign_ST27.zip'] = [503, 3]
+    function = CountBlocksInWorker(resource_store.root, str(block_assignments), server)
+
+    summary = run_for_every_state(function, ['26', '28', '27'], workers=2,
+                                  resources=[BlockAssignmentFile])
+
+    assert summary['26']['succeeded'], summary['26']['error']
+    assert summary['27']['succeeded'], summary['27']['error']
+    assert not summary['28']['succeeded']
@@ -1,6 +1,11 @@
+import zipfile
+
+import geopandas
 import pytest
-from graphmaker.resources import (BlockAssignmentFile, CensusShapefileResource,
-                                  VTDShapefile, ZippedCensusResource)
+from graphmaker.resources import (BlockAssignmentFile, BlockPopulationShapefile,
+                                  CensusShapefileResource, VTDShapefile,
+                                  ZippedCensusResource)
+from shapely.geometry import Point
 
 
 def test_shapefiles_implement_path():
@@ -47,3 +52,109 @@ def test_zipped_census_resource_raises_when_url_not_implemented():
     resource = ZippedCensusResource('12')
     with pytest.raises(NotImplementedError):
         resource.url()
+
+
+def write_block_assignments(tmpdir):
+    folder = tmpdir.mkdir('26')
+    folder.join('BlockAssign_ST26_MI_VTD.txt').write(
+        'BLOCKID,COUNTYFP,DISTRICT\n'
+        '260010001001000,001,000010\n'
+        '260010001001001,001,000010\n'
+        '260010001001002,003,000020\n')
+    return folder
+
+
+def test_block_assignments_are_converted_to_parquet(tmpdir, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.setattr(BlockAssignmentFile, 'base_path', str(tmpdir))
+    folder = write_block_assignments(tmpdir)
+    resource = BlockAssignmentFile('26')
+
+    df = resource.read('VTD')
+
+    assert folder.join('BlockAssign_ST26_MI_VTD.parquet').exists()
+    assert df['VTD'].dtype == 'category'
+    assert list(df['VTD']) == ['26001000010', '26001000010', '26003000020']
+
+
+def test_block_assignment_reads_project_columns_from_parquet(tmpdir, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.setattr(BlockAssignmentFile, 'base_path', str(tmpdir))
+    write_block_assignments(tmpdir)
+    resource = BlockAssignmentFile('26')
+    resource.convert('VTD')
+
+    df = resource.read('VTD', columns=['VTD'])
+
+    assert list(df.columns) == ['VTD']
+    assert df.index.name == 'BLOCKID'
+    assert df.index[0] == '260010001001000'
+
+
+def write_block_populations(tmpdir):
+    df = geopandas.GeoDataFrame({'BLOCKID10': ['260010001001000', '260010001001001'],
+                                 'POP10': [10, 20], 'HOUSING10': [4, 8]},
+                                geometry=[Point(0, 0), Point(1, 1)])
+    df.to_file(str(tmpdir.mkdir('26').join('tabblock2010_26_pophu.shp')))
+
+
+def test_block_populations_can_be_read_without_geometry(tmpdir, monkeypatch):
+    monkeypatch.setattr(BlockPopulationShapefile, 'base_path', str(tmpdir))
+    write_block_populations(tmpdir)
+
+    df = BlockPopulationShapefile('26').as_df(columns=['POP10'], geometry=False)
+
+    assert not isinstance(df, geopandas.GeoDataFrame)
+    assert list(df.columns) == ['POP10']
+    assert df.loc['260010001001001', 'POP10'] == 20
+
+
+def test_attribute_reads_use_the_parquet_copy(tmpdir, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.setattr(BlockPopulationShapefile, 'base_path', str(tmpdir))
+    write_block_populations(tmpdir)
+    resource = BlockPopulationShapefile('26')
+    resource.read()
+
+    df = resource.read(columns=['POP10'], geometry=False)
+
+    assert tmpdir.join('26', 'tabblock2010_26_pophu.parquet').exists()
+    assert list(df.columns) == ['POP10']
+    assert df.index.name == 'BLOCKID10'
+
+
+def zip_folder(folder, archive):
+    paths = folder.listdir()
+    with zipfile.ZipFile(str(archive), 'w') as z:
+        for path in paths:
+            z.write(str(path), path.basename)
+            path.remove()
+
+
+def test_block_assignments_are_read_from_the_archive(tmpdir, monkeypatch):
+    monkeypatch.setattr(BlockAssignmentFile, 'base_path', str(tmpdir))
+    folder = write_block_assignments(tmpdir)
+    zip_folder(folder, folder.join('BlockAssign_ST26_MI.zip'))
+    resource = BlockAssignmentFile('26')
+
+    df = resource.read_text('VTD')
+
+    assert resource.path('VTD').startswith('zip://')
+    assert resource.exists('VTD')
+    assert list(df['VTD']) == ['26001000010', '26001000010', '26003000020']
+    assert not folder.join('BlockAssign_ST26_MI_VTD.txt').exists()
+
+
+def test_shapefiles_are_read_from_the_archive(tmpdir, monkeypatch):
+    monkeypatch.setattr(BlockPopulationShapefile, 'base_path', str(tmpdir))
+    write_block_populations(tmpdir)
+    folder = tmpdir.join('26')
+    zip_folder(folder, folder.join('tabblock2010_26_pophu.zip'))
+    resource = BlockPopulationShapefile('26')
+
+    df = resource.as_df(columns=['POP10'], geometry=False)
+    shapes = resource.read()
+
+    assert list(df['POP10']) == [10, 20]
+    assert len(shapes) == 2 and shapes.geometry.notna().all()
+    assert not folder.join('tabblock2010_26_pophu.shp').exists()
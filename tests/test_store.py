@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import time
+
+from graphmaker.crosswalk import crosswalk
+from graphmaker.download import Downloader
+from graphmaker.resources import BlockAssignmentFile
+from graphmaker.store import Store
+
+from .test_download import Handler, server, zipped  # noqa: F401
+
+
+def test_fetch_records_the_archive_in_the_manifest(server, tmpdir):  # noqa: F811
+    Handler.files['/a.zip'] = b'abc'
+    store = Store(str(tmpdir))
+
+    path = store.fetch(server + '/a.zip', vintage='2010')
+
+    digest = hashlib.sha256(b'abc').hexdigest()
+    assert path == str(tmpdir.join('objects', digest[:2], digest + '.zip'))
+    entry = json.loads(tmpdir.join('manifest.json').read())[server + '/a.zip']
+    assert entry['sha256'] == digest and entry['size'] == 3
+    assert entry['vintage'] == '2010'
+    assert Store(str(tmpdir)).fetch(server + '/a.zip') == path
+    assert len(Handler.requests) == 1
+
+
+def test_archives_stored_by_other_processes_are_found(server, tmpdir):  # noqa: F811
+    Handler.files['/a.zip'] = b'abc'
+    Handler.files['/b.zip'] = b'def'
+    worker, prefetcher = Store(str(tmpdir)), Store(str(tmpdir))
+    prefetcher.fetch(server + '/a.zip')
+    assert worker.path(server + '/a.zip') is not None
+
+    path = prefetcher.fetch(server + '/b.zip')
+
+    assert worker.path(server + '/b.zip') == path
+    assert server + '/b.zip' in worker.entries()
+
+
+def test_damaged_archives_are_downloaded_again(server, tmpdir):  # noqa: F811
+    Handler.files['/a.zip'] = b'abc'
+    store = Store(str(tmpdir))
+    path = store.fetch(server + '/a.zip')
+
+    with open(path, 'wb') as f:
+        f.write(b'ab')
+    assert store.path(server + '/a.zip') is None
+
+    assert open(store.fetch(server + '/a.zip'), 'rb').read() == b'abc'
+    assert len(Handler.requests) == 2
+
+
+def test_modified_archives_are_checked_against_their_digest(server, tmpdir):  # noqa: F811
+    Handler.files['/a.zip'] = b'abc'
+    store = Store(str(tmpdir))
+    path = store.fetch(server + '/a.zip')
+
+    with open(path, 'wb') as f:
+        f.write(b'xyz')
+    os.utime(path, (time.time() + 10, time.time() + 10))
+
+    assert store.path(server + '/a.zip') is None
+    assert not os.path.exists(path)
+
+
+def test_least_recently_used_archives_are_evicted(server, tmpdir):  # noqa: F811
+    for name in 'abc':
+        Handler.files[f"/{name}.zip"] = name.encode() * 10
+    store = Store(str(tmpdir), max_bytes=20, touch_interval=0)
+
+    store.fetch(server + '/a.zip')
+    store.fetch(server + '/b.zip')
+    store.path(server + '/a.zip')
+    store.fetch(server + '/c.zip')
+
+    assert server + '/a.zip' in store and server + '/c.zip' in store
+    assert server + '/b.zip' not in store
+    assert store.size() == 20
+
+
+def test_manifest_keeps_the_entries_of_other_stores(server, tmpdir):  # noqa: F811
+    Handler.files['/a.zip'] = b'a'
+    Handler.files['/b.zip'] = b'b'
+    first, second = Store(str(tmpdir)), Store(str(tmpdir))
+    first.entries(), second.entries()
+
+    first.fetch(server + '/a.zip')
+    second.fetch(server + '/b.zip')
+
+    assert set(Store(str(tmpdir)).entries()) == {server + '/a.zip', server + '/b.zip'}
+
+
+def test_resources_are_read_from_the_store(server, tmpdir, monkeypatch,  # noqa: F811
+                                           resource_store):
+    monkeypatch.setattr(BlockAssignmentFile, 'base_path', str(tmpdir))
+    monkeypatch.setattr(BlockAssignmentFile, 'url',
+                        lambda self: f"{server}/BlockAssign_ST{self.fips}.zip")
+    Handler.files['/BlockAssign_ST26.zip'] = zipped(
+        'BlockAssign_ST26_MI_VTD.txt', 'BLOCKID,COUNTYFP,DISTRICT\n260010001001000,001,000010\n')
+    resource = BlockAssignmentFile('26')
+
+    resource.download(unzip=False, downloader=Downloader(retries=0))
+
+    assert resource.path('VTD').startswith('zip://' + os.path.join(resource_store.root, 'objects'))
+    assert list(resource.as_df('VTD')['VTD']) == ['26001000010']
+    assert resource.table('VTD', ['DISTRICT']).loc['260010001001000', 'DISTRICT'] == '000010'
+    assert list(crosswalk('26', 'VTD').units) == ['26001000010']
+    assert resource_store.entries()[resource.url()]['vintage'] == '2010'
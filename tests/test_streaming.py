@@ -0,0 +1,52 @@
+import io
+import json
+
+import networkx
+from graphmaker.graph.streaming import (JSONStream, read_adjacency_json,
+                                        write_adjacency_json)
+from networkx.readwrite.json_graph import adjacency_data
+
+
+def example_graph():
+    graph = networkx.Graph()
+    graph.graph['state'] = '26'
+    graph.add_node('a', POP10=10, boundary_node=True)
+    graph.add_node('b', POP10=20, boundary_node=False)
+    graph.add_node('c')
+    graph.add_edge('a', 'b', shared_perim=1.25)
+    graph.add_edge('b', 'c', shared_perim=12345678901234567890)
+    return graph
+
+
+def test_writer_matches_adjacency_data():
+    for graph in (example_graph(), example_graph().to_directed(),
+                  networkx.MultiGraph(example_graph()), networkx.Graph()):
+        f = io.StringIO()
+        write_adjacency_json(graph, f)
+        assert f.getvalue() == json.dumps(adjacency_data(graph))
+
+
+def test_round_trip_with_tiny_chunks():
+    graph = example_graph()
+    f = io.StringIO()
+    write_adjacency_json(graph, f)
+    f.seek(0)
+
+    loaded = read_adjacency_json(f, chunk_size=4)
+
+    assert loaded.graph == graph.graph
+    assert dict(loaded.nodes(data=True)) == dict(graph.nodes(data=True))
+    assert networkx.utils.edges_equal(loaded.edges(data=True), graph.edges(data=True))
+
+
+def test_json_stream_reads_values_split_across_chunks():
+    stream = JSONStream(io.StringIO('[12345, {"a": [1, 2]}, "xyz"]'), chunk_size=3)
+    assert list(stream.items()) == [12345, {'a': [1, 2]}, 'xyz']
+
+
+def test_reader_agrees_with_adjacency_graph_for_multigraphs():
+    graph = networkx.MultiGraph([(1, 2), (1, 2), (2, 3)])
+    f = io.StringIO(json.dumps(adjacency_data(graph)))
+    loaded = read_adjacency_json(f)
+    assert loaded.is_multigraph()
+    assert sorted(loaded.edges(keys=True)) == sorted(graph.edges(keys=True))
@@ -0,0 +1,82 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import geopandas
+import networkx
+from graphmaker.graph import Graph, RookAndQueenGraphs, tiles
+from graphmaker.graph.make_graph import construct_graph_from_df
+from graphmaker.graph.tiles import bounded_map, construct_tiled_graph_from_df, tile_options
+from shapely.geometry import box
+
+
+def grid(rows=6, columns=6, size=0.01):
+    data = [{'GEOID': f"{i}{j}", 'COUNTY': str(j // 2 + 3 * (i // 3)),
+             'geometry': box(-84 + j * size, 42 + i * size,
+                             -84 + (j + 1) * size, 42 + (i + 1) * size)}
+            for i in range(rows) for j in range(columns)]
+    return geopandas.GeoDataFrame(data, crs="+init=epsg:4326")
+
+
+def assert_identical(graph, other):
+    assert dict(graph.nodes(data=True)) == dict(other.nodes(data=True))
+    assert networkx.utils.edges_equal(graph.edges(data=True), other.edges(data=True))
+
+
+def test_tiled_build_by_county_is_identical_to_monolithic_build():
+    df = grid()
+    for adjacency_type in ('rook', 'queen'):
+        monolithic = construct_graph_from_df(
+            df, adjacency_type, geoid_col='GEOID', adjacency_engine='sindex',
+            boundary_method='topology')
+        tiled = construct_tiled_graph_from_df(
+            df, adjacency_type, geoid_col='GEOID', tile_by='COUNTY', workers=2)
+        assert_identical(tiled, monolithic)
+
+
+def test_tiled_build_on_a_grid_is_identical_to_monolithic_build():
+    df = grid(8, 9)
+    monolithic = construct_graph_from_df(
+        df, 'queen', geoid_col='GEOID', adjacency_engine='sindex',
+        boundary_method='topology')
+    # tiles of about 1 to 2.5 units on a side, so that seams cut through units
+    for tile_size in (700, 1500, 2000):
+        tiled = construct_tiled_graph_from_df(
+            df, 'queen', geoid_col='GEOID', tile_size=tile_size, workers=1)
+        assert_identical(tiled, monolithic)
+
+
+def test_tiles_option_takes_a_column_or_a_tile_size():
+    assert tile_options('COUNTYFP10') == {'tile_by': 'COUNTYFP10'}
+    assert tile_options(2000) == {'tile_size': 2000}
+    assert tile_options('2000') == {'tile_size': 2000.0}
+
+
+def test_graphs_are_built_in_tiles_when_asked_to():
+    df = grid()
+    tiled = construct_tiled_graph_from_df(df, 'rook', geoid_col='GEOID',
+                                          tile_by='COUNTY', workers=1)
+
+    graph = Graph.from_df(df, 'rook', id_column='GEOID', tiles='COUNTY', workers=1)
+    graphs = RookAndQueenGraphs.from_df(df, id_column='GEOID', tiles=2000, workers=1)
+
+    assert networkx.utils.edges_equal(graph.graph.edges(data=True), tiled.edges(data=True))
+    assert graph.graph.graph['type'] == 'rook'
+    assert networkx.utils.edges_equal(graphs.rook.graph.edges(data=True),
+                                      tiled.edges(data=True))
+    assert graphs.queen.graph.number_of_edges() > graphs.rook.graph.number_of_edges()
+    assert dict(graphs.rook.graph.nodes(data=True)) == dict(graphs.queen.graph.nodes(data=True))
+
+
+def test_bounded_map_keeps_few_tiles_in_flight(monkeypatch):
+    monkeypatch.setattr(tiles, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    submitted = []
+
+    def jobs():
+        for number in range(20):
+            submitted.append(number)
+            yield (number,)
+
+    results = bounded_map(lambda number: number * 2, jobs(), workers=2)
+
+    first = next(results)
+    assert len(submitted) <= 4
+    assert sorted([first] + list(results)) == [2 * number for number in range(20)]
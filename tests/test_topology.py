@@ -0,0 +1,52 @@
+import geopandas
+from graphmaker.graph.make_graph import (construct_graph_from_df,
+                                         shared_perimeter_edges)
+from graphmaker.graph.topology import ArcTable
+from shapely.geometry import box
+
+
+def grid(rows=3, columns=3, size=1, crs=None):
+    data = [{'ID': f"{i}-{j}", 'geometry': box(-84 + j * size, 42 + i * size,
+                                               -84 + (j + 1) * size,
+                                               42 + (i + 1) * size)}
+            for i in range(rows) for j in range(columns)]
+    return geopandas.GeoDataFrame(data, crs=crs)
+
+
+def as_dict(left, right, lengths):
+    return {(i, j): length for i, j, length in zip(left, right, lengths)}
+
+
+def test_arc_table_agrees_with_the_spatial_index():
+    df = grid(4, 5)
+    arcs = ArcTable(df.geometry.values)
+
+    expected = as_dict(*shared_perimeter_edges(df))
+
+    assert as_dict(*arcs.edges('queen')) == expected
+    assert as_dict(*arcs.edges('rook')) == {
+        pair: length for pair, length in expected.items() if length > 0}
+
+
+def test_arc_table_exterior_perimeters():
+    df = grid(3, 3)
+    exterior = ArcTable(df.geometry.values).exterior_perimeters()
+    # corners have two exterior sides, the center has none
+    assert exterior.tolist() == [2, 1, 2, 1, 0, 1, 2, 1, 2]
+
+
+def test_topology_engine_builds_the_same_graph_as_the_sindex_engine():
+    df = grid(3, 4, size=0.01, crs="+init=epsg:4326")
+
+    for adjacency_type in ('rook', 'queen'):
+        by_topology = construct_graph_from_df(
+            df, adjacency_type, geoid_col='ID', adjacency_engine='topology')
+        by_sindex = construct_graph_from_df(
+            df, adjacency_type, geoid_col='ID', adjacency_engine='sindex')
+
+        assert set(by_topology.edges) == set(by_sindex.edges)
+        for node in by_sindex.nodes:
+            topology, sindex = by_topology.nodes[node], by_sindex.nodes[node]
+            assert topology['boundary_node'] == sindex['boundary_node']
+            assert abs(topology.get('boundary_perim', 0) -
+                       sindex.get('boundary_perim', 0)) < 1e-6